@@ -9,7 +9,6 @@ This agent uses a greedy-then-random policy:
 Usage
 -----
 1. Start the server:
-   export SDL_VIDEODRIVER=dummy
    python3 Server.py
 2. Run an agent:
    python3 Agent.py
@@ -23,11 +22,8 @@ import time
 import logging
 import os
 
-# Make sure pygame runs headless when Game module imports pygame
-os.environ.setdefault('SDL_VIDEODRIVER', os.environ.get('SDL_VIDEODRIVER', 'dummy'))
-
-from Network import Network
-from Game import Card
+from Network import Network, NewGame
+from Game import CARD_NAMES, DISCARD_PILE, GOAL_PILE, HAND_PILE
 
 logger = logging.getLogger("Agent")
 # Allow DEBUG/INFO/WARNING via environment variable LOGLEVEL; default INFO
@@ -40,89 +36,69 @@ logging.basicConfig(level=level, format="%(asctime)s - %(levelname)s - %(message
 
 
 class Agent:
-    def __init__(self, policy='greedy', retry_delay=0.05, max_retries=20):
-        self.n = Network(max_retries=max_retries, retry_delay=retry_delay)
+    def __init__(self, policy='greedy', retry_delay=0.05, max_retries=20, server="127.0.0.1", port=5550):
+        self.n = Network(max_retries=max_retries, retry_delay=retry_delay, server=server, port=port)
         self.player_id = self.n.getId()
         self.policy = policy
         logger.info(f"Agent connected as player {self.player_id}")
 
+    def new_game(self, signal):
+        """The server seated us in a new game after a drop: play on from the seat we have now."""
+        self.player_id = signal.playerId
+        logger.info(f"Agent reseated as player {self.player_id} in a new game")
+        return signal.board
+
     def get_board(self):
         try:
-            return self.n.send("get")
+            return self.n.sync()
+        except NewGame as signal:
+            return self.new_game(signal)
         except Exception as e:
             logger.error(f"Error requesting board: {e}")
             return None
 
-    def ranks_index(self, rank, deck):
+    def wait_board(self, timeout=10.0):
+        """Long-poll until the board changes (e.g. the opponent moves) instead of re-polling."""
         try:
-            return deck.ranks.index(rank)
-        except Exception:
-            return -1
+            return self.n.wait(timeout)
+        except NewGame as signal:
+            return self.new_game(signal)
+        except Exception as e:
+            logger.error(f"Error waiting for board: {e}")
+            return None
 
     def find_moves(self, board):
-        """Return list of (action, value, location) legal moves based on current board state.
-        We try to simulate the move validation logic in `Game.Board.move` and `playCard`.
+        """Return list of (action, value, location, source) legal moves based on current board state.
+        The moves come from `Game.Board.legal_moves`, the same rules the server checks plays against.
+        source is 'goal', 'hand' or 'discard_N', where the card comes from.
         """
         moves = []
-        # Shortcuts
         my_player_id = int(self.player_id) if self.player_id is not None else 0
-        deck = board.deck
-
-        # Determine our personal player object
-        player = board.playerOne if my_player_id == 0 else board.playerTwo
-
-        # Helper to append move
-        def append_move(act, card, loc, source=None):
-            # attach source metadata (goal/hand/discard_N) so we can log and prefer it in pick_move
-            moves.append((act, str(card), str(loc), source))
-
-        # For each field location, check if card can be moved
-        # Candidate order: check goal pile first, then hand, then each discard pile
-        for field_idx, field_pile in enumerate(board.field):
-            sources = [('goal', player.goal), ('hand', player.hand)] + [(f'discard_{i}', player.discard[i]) for i in range(len(player.discard))]
-            for card_source, source_list in sources:
-                src_cards = source_list
-                if not src_cards:
-                    continue
 
-                # Goal and discard piles: only top-most card is playable; hand: any card
-                # Note: Game stores the top-of-goal as index 0; discard piles use the last element as top
-                if card_source == 'goal':
-                    # Goal top card is the first item in the list
-                    candidates = [src_cards[0]]
-                elif card_source.startswith('discard_'):
-                    # Discard top card is the last item in the list
-                    candidates = [src_cards[-1]]
-                else:
-                    candidates = list(src_cards)
-
-                for card in candidates:
-                    if len(field_pile) == 0:
-                        # Empty pile, only Ace or King can start the pile
-                        if card.rank == 'Ace' or card.rank == 'King':
-                            append_move('move', card, field_idx, source=card_source if card_source is not None else 'hand')
-                    else:
-                        # need to check top card value; Board.move uses deck.ranks index and counts
-                        top_count = len(field_pile) - 1
-                        # Board.move determines if ranks.index(card.rank) - cardCount == 1 or King
-                        if card.rank == 'King' or deck.ranks.index(card.rank) - top_count == 1:
-                            append_move('move', card, field_idx, source=card_source if card_source is not None else 'hand')
-
-        # If no moves, consider discarding a hand card to any discard pile (0..3)
-        if len(player.hand) > 0:
-            for card in player.hand:
-                for d in range(4):
-                    append_move('discard', card, d, source='hand')
-                    # Prefer lower-numbered discard pile; break to avoid flooding
-                    break
+        discard = None
+        for move in board.legal_moves(my_player_id):
+            if move.action == 'move':
+                moves.append((move.action, CARD_NAMES[move.card], str(move.location), self.source_name(move, my_player_id)))
+            else:
+                # Discards come last: offer only the first hand card to pile 0, to avoid flooding the choice
+                discard = move
                 break
+        if discard is not None:
+            moves.append((discard.action, CARD_NAMES[discard.card], str(discard.location), 'hand'))
 
         # If no moves at all, consider 'deal' to draw cards if allowed
         if len(moves) == 0:
-            append_move('deal', '', 0, source=None)
+            moves.append(('deal', '', '0', None))
 
         return moves
 
+    def source_name(self, move, player_id):
+        if move.source == HAND_PILE[player_id]:
+            return 'hand'
+        if move.source == GOAL_PILE[player_id]:
+            return 'goal'
+        return f'discard_{move.source - DISCARD_PILE[player_id]}'
+
     def pick_move(self, moves, board):
         if not moves:
             return None
@@ -170,6 +146,8 @@ class Agent:
         try:
             board = self.n.send(data)
             return board
+        except NewGame as signal:
+            return self.new_game(signal)
         except Exception as e:
             logger.error(f"Error sending move: {e}")
             return None
@@ -189,15 +167,13 @@ class Agent:
 
                 # It's our turn? board.currentTurn == my id
                 my_id = int(self.player_id) if self.player_id is not None else 0
-                # If not connected maybe board.ready is False
+                # The server deals the game once an opponent takes the other seat
                 if not getattr(board, 'ready', False):
-                    # If game isn't started yet and we have no start, call start
-                    board = self.send_move('start', '', 0)
-                    time.sleep(loop_delay)
+                    self.wait_board()
                     continue
 
                 if getattr(board, 'currentTurn', 0) != my_id:
-                    time.sleep(loop_delay)
+                    self.wait_board()
                     continue
 
                 # Find available moves
@@ -221,6 +197,9 @@ def main():
     parser.add_argument('--policy', default='greedy', choices=['greedy', 'random'], help='Policy for making moves')
     parser.add_argument('--delay', default=0.3, type=float, help='Loop delay (seconds) between board polls')
     parser.add_argument('--loglevel', default=None, help='Set log level (DEBUG, INFO, WARNING, ERROR)')
+    parser.add_argument('--server', default='127.0.0.1',
+                        help='Server address, or unix:PATH for a server on this host started with --unix PATH')
+    parser.add_argument('--port', default=5550, type=int, help='Server TCP port (default 5550)')
     args = parser.parse_args()
 
     # Allow setting logging level via CLI argument (overrides LOGLEVEL env var)
@@ -228,7 +207,7 @@ def main():
         level = getattr(logging, args.loglevel.upper(), logging.INFO)
         logging.getLogger().setLevel(level)
 
-    agent = Agent(policy=args.policy)
+    agent = Agent(policy=args.policy, server=args.server, port=args.port)
     agent.play_loop(loop_delay=args.delay)
 
 
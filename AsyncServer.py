@@ -0,0 +1,249 @@
+import asyncio
+import collections
+import contextlib
+import logging
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from Lobby import Session
+from Protocol import enable_keepalive, unix_listener
+from Workers import worker_loop
+
+logger = logging.getLogger("GameServer")
+
+# Threads for hellos that may block in batched matchmaking; enough for a large batch to fill
+HELLO_THREADS = 256
+_helloExecutor = None
+
+
+def hello_executor():
+    global _helloExecutor
+    if _helloExecutor is None:
+        _helloExecutor = ThreadPoolExecutor(max_workers=HELLO_THREADS, thread_name_prefix="hello")
+    return _helloExecutor
+
+
+async def wait_for_change(session, version, timeout):
+    """Hold a "wait:" long-poll until the board moves past version or timeout runs out."""
+    loop = asyncio.get_running_loop()
+    changed = asyncio.Event()
+    wake = lambda origin: loop.call_soon_threadsafe(changed.set)
+    room = session.room
+    room.watch(wake)
+    deadline = loop.time() + timeout
+    try:
+        # A notify can be for a change we already have, so re-check until the deadline
+        while not session.changedSince(version):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+            changed.clear()
+    finally:
+        room.unwatch(wake)
+
+
+# Bytes a spectator's transport may have queued before pushes to it are skipped
+SPECTATOR_BUFFER = 64 * 1024
+
+class SpectatorFeed:
+    '''
+    Spectator pushes from the Broadcaster thread to a transport owned by the event loop.
+
+    The transport is only touched on the loop: each write runs there and
+    records whether the transport is closing or holds more than
+    SPECTATOR_BUFFER, and offer() (on the Broadcaster thread) reads just
+    those flags. A feed found busy has the loop look again, so the next
+    offer sees whether the client has caught up.
+    '''
+    def __init__(self, loop, transport):
+        self.loop = loop
+        self.transport = transport
+        self.busy = False
+        self.closed = False
+
+    def offer(self, frame):
+        """Queue frame for the loop to write: False if the client isn't keeping up."""
+        if self.closed:
+            raise ConnectionResetError("spectator connection closed")
+        if self.busy:
+            self.loop.call_soon_threadsafe(self._check)
+            return False
+        self.loop.call_soon_threadsafe(self._write, frame)
+        return True
+
+    def _write(self, frame):
+        if not self.transport.is_closing():
+            self.transport.write(frame)
+        self._check()
+
+    def _check(self):
+        self.closed = self.transport.is_closing()
+        self.busy = self.transport.get_write_buffer_size() > SPECTATOR_BUFFER
+
+
+class LoopPush:
+    '''
+    A connection's Session.push on the event loop, callable from any thread.
+
+    On the loop a frame is written straight away. Other threads (the Reaper
+    freeing a held seat wakes the room's subscribers) must not touch the
+    transport, so their frames queue for the loop instead. write(), which
+    handle_client sends every reply through, sends the queue first, so the
+    client gets frames in the order they were encoded.
+    '''
+    def __init__(self, loop, writer):
+        self.loop = loop
+        self.writer = writer
+        self.thread = threading.get_ident()
+        self.queued = collections.deque()
+
+    def __call__(self, frame):
+        if threading.get_ident() == self.thread:
+            self.write(frame)
+        else:
+            self.queued.append(frame)
+            self.loop.call_soon_threadsafe(self.flush)
+
+    def flush(self):
+        while self.queued:
+            self.writer.write(self.queued.popleft())
+
+    def write(self, frame):
+        """Write frame, on the loop, after whatever other threads pushed before it."""
+        self.flush()
+        self.writer.write(frame)
+
+
+async def handle_client(reader, writer, lobby, session=None):
+    '''
+    Serve one player on the event loop.
+
+    Speaks the same protocol as Server.threaded_client: framed messages, a
+    hello/greeting handshake, then each command gets the encoded board back.
+    Pushes to subscribers are written on this loop (see LoopPush).
+    Workers pass in a session whose hello they have already answered.
+    '''
+    addr = writer.get_extra_info('peername')
+    logger.info(f"Connected to: {addr}")
+
+    if session is None:
+        session = Session(lobby)
+        enable_keepalive(writer.get_extra_info('socket'))
+    loop = asyncio.get_running_loop()
+    session.push = push = LoopPush(loop, writer)
+    session.kick = lambda: loop.call_soon_threadsafe(writer.transport.abort)
+    session.offer = SpectatorFeed(loop, writer.transport).offer
+    try:
+        closing = False
+        while not closing:
+            if lobby.readTimeout:
+                try:
+                    data = await asyncio.wait_for(reader.read(65536), lobby.readTimeout)
+                except asyncio.TimeoutError:
+                    logger.info(f"Closing connection silent for {lobby.readTimeout}s")
+                    break
+            else:
+                data = await reader.read(65536)
+            if not data:
+                break
+
+            # A single read may complete several pipelined frames; answer them with one write
+            for command in session.receive(data):
+                delay = session.throttle(command)
+                if delay:
+                    # Over its rate limit: slow this connection down without holding up the loop
+                    await writer.drain()
+                    await asyncio.sleep(delay)
+                wait = session.waitRequest(command)
+                if wait is not None:
+                    await writer.drain()
+                    await wait_for_change(session, *wait)
+                if session.gameId is None and lobby.matchmaker.blocking:
+                    # Batched matchmaking holds the hello until the batch pairs; don't block the loop
+                    reply = await loop.run_in_executor(hello_executor(), session.respond, command)
+                    if reply is None:
+                        closing = True
+                        break
+                    push.write(reply)
+                    continue
+                with session.sendLock:
+                    reply = session.respond(command)
+                    if reply is None:
+                        closing = True
+                        break
+                    push.write(reply)
+            session.publish()
+            await writer.drain()
+    except Exception as error:
+        logger.error(f"An error occurred: {error}")
+
+    logger.info("Lost connection")
+    session.close()
+    writer.close()
+
+
+def count_tasks(lobby):
+    """Expose the number of tasks on the running loop (one per connected client) as a gauge."""
+    if lobby.metrics is not None:
+        loop = asyncio.get_running_loop()
+        lobby.metrics.gauge("cards_asyncio_tasks", "Tasks on the server's event loop", lambda: len(asyncio.all_tasks(loop)))
+
+
+async def serve(host, port, lobby, backlog=128, unix_path=None):
+    """Listen on host:port (and unix_path, if given) and run every session on the current event loop."""
+    count_tasks(lobby)
+    try:
+        server = await asyncio.start_server(lambda r, w: handle_client(r, w, lobby),
+                                            host, port, backlog=backlog, reuse_address=True)
+    except OSError as e:
+        logger.error(f"Socket binding error: {e}")
+        sys.exit()
+    async with contextlib.AsyncExitStack() as listeners:
+        await listeners.enter_async_context(server)
+        servers = [server]
+        if unix_path:
+            try:
+                sock = unix_listener(unix_path, backlog)
+            except OSError as e:
+                logger.error(f"Unix socket binding error on {unix_path}: {e}")
+                sys.exit()
+            unix_server = await asyncio.start_unix_server(lambda r, w: handle_client(r, w, lobby), sock=sock)
+            servers.append(await listeners.enter_async_context(unix_server))
+            logger.info(f"Listening on unix:{unix_path}")
+        logger.info("Waiting for a connection, Server Started (asyncio)")
+        # When either stops (or serve is cancelled) the stack closes both listeners
+        await asyncio.gather(*(listener.serve_forever() for listener in servers))
+
+
+def run(host, port, lobby, backlog=128, unix_path=None):
+    """Blocking entry point used by `Server.py --mode asyncio`."""
+    asyncio.run(serve(host, port, lobby, backlog=backlog, unix_path=unix_path))
+
+
+async def adopt(conn, lobby, session):
+    reader, writer = await asyncio.open_connection(sock=conn)
+    await handle_client(reader, writer, lobby, session)
+
+
+def run_worker(channel, lobby):
+    """Entry point of a `--workers` child: serve handed over connections on one event loop."""
+    async def main():
+        loop = asyncio.get_running_loop()
+        count_tasks(lobby)
+        # The loop only holds weak references to tasks; keep each client's alive until it finishes
+        clients = set()
+
+        def start(conn, addr, session):
+            client = asyncio.run_coroutine_threadsafe(adopt(conn, lobby, session), loop)
+            clients.add(client)
+            client.add_done_callback(clients.discard)
+
+        # Descriptors arrive on a blocking channel, so receive them off the loop
+        await loop.run_in_executor(None, worker_loop, channel, lobby, start)
+
+    asyncio.run(main())
@@ -1,8 +1,9 @@
 import pygame
 import logging
 from enum import Enum, auto
-from Network import Network
+from Network import Network, NewGame
 from Game import *
+from Layout import layout, play_card
 import sys,os
 
 # Create the window
@@ -127,7 +128,7 @@ class Display:
 
     def __init__(self):
         self.window = window
-        self.game = Board(0)
+        self.game = Board(0).view()
         pygame.init()
         pygame.mixer.init()
         pygame.display.set_caption("Spite and Malice")
@@ -198,11 +199,18 @@ class Display:
     # Drawling Game Helper Methods
     ########################################
 
-    def deal(self):
-        self.game.play("deal::", 0)
+    def show(self, board):
+        """Put board on screen: a view of it with every card placed (see Layout.layout)."""
+        self.game = layout(board.view()) if board is not None else None
 
-    def play(self):
-        self.game.play("deal::", 1)
+    def update(self, request, *args):
+        """Show the board the network request returns, taking our new seat if the server moved us to a new game."""
+        try:
+            self.show(request(*args))
+        except NewGame as signal:
+            logger.info(f"Reseated as player {signal.playerId} in a new game")
+            self.playerId = int(signal.playerId)
+            self.show(signal.board)
 
     def drawCard(self, card , rotate=0):
         image = self.cardImages[str(card)]
@@ -477,10 +485,12 @@ class Display:
     def handleConnecting(self):
         self.network = Network()
         self.playerId = int(self.network.getId())
+        # The server pushes every change from here on; each frame just applies what arrived
+        self.update(self.network.subscribe)
 
         while self.state == GameState.CONNECTING:
 
-            self.game = self.network.send("get")
+            self.update(self.network.poll)
             
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
@@ -518,10 +528,10 @@ class Display:
             clock.tick(60)
 
             if self.game == None:
-                self.game = self.network.send("get")
+                self.update(self.network.sync)
 
             if self.game.currentTurn != self.playerId and self.game.winner == None:
-                self.game = self.network.send("get")
+                self.update(self.network.poll)
 
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
@@ -591,12 +601,12 @@ class Display:
 
     def handle_mouse_up(self):
         if self.activeCard and self.game.currentTurn == self.playerId:
-            data = self.game.playCard(self.activeCard)
+            data = play_card(self.game, self.activeCard)
 
             if data:
-                self.game = self.network.send(data)
+                self.update(self.network.send, data)
             else:
-                self.activeCard.move(self.orgX, self.orgY)
+                self.activeCard.rect.topleft = (self.orgX, self.orgY)
 
             self.activeCard = None
             self.cardDrop.play()
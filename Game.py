@@ -1,26 +1,263 @@
 import random
-import pygame
+import struct
 import logging
 from os.path import isfile, join
 
+# Every card pile on a Board, in the order used by Board.piles() and BoardDelta ops
+PILE_NAMES = ["deck", "dump", "field0", "field1", "field2", "field3",
+              "one.hand", "one.goal", "one.discard0", "one.discard1", "one.discard2", "one.discard3",
+              "two.hand", "two.goal", "two.discard0", "two.discard1", "two.discard2", "two.discard3"]
+# Where piles start in PILE_NAMES: the four field piles, then by player id each hand, goal and four discard piles
+FIELD_PILE = 2
+HAND_PILE = (6, 12)
+GOAL_PILE = (7, 13)
+DISCARD_PILE = (8, 14)
+# A field pile this long goes to the dump, and a deck shorter than this gets the dump shuffled back in (checkField)
+FIELD_FULL = 12
+RESHUFFLE_BELOW = 10
+
+# How many committed versions a Board remembers for delta sync
+DELTA_HISTORY = 64
+
+# Shuffles Board.rng replays to rebuild its generator before the board reseeds instead
+MAX_REPLAYED_SHUFFLES = 16
+
+# BoardDelta pile operations
+OP_REPLACE = 0   # payload: the full new pile (bytes of card codes)
+OP_APPEND = 1    # payload: card codes added to the end of the pile
+OP_TRUNCATE = 2  # payload: the new (shorter) length of the pile
+
+# A card is one byte: copy * 52 + suit index * 13 + rank index, so the two
+# decks of a game are codes 0-103 and every pile is a bytearray of codes
+SUITS = ("Hearts", "Diamonds", "Clubs", "Spades")
+RANKS = ("Ace", "2", "3", "4", "5", "6", "7", "8", "9", "10", "Jack", "Queen", "King")
+DECK_SIZE = len(SUITS) * len(RANKS)
+KING = RANKS.index("King")
+# A face-down card in a public view (see public_board): spectators see how many cards, not which
+HIDDEN_SUIT, HIDDEN_RANK = "Hidden", "Card"
+HIDDEN_CODE = 0xFF
+# How commands name each code ("Ace of Hearts"), whichever deck the card came from
+CARD_NAMES = tuple(f"{RANKS[code % len(RANKS)]} of {SUITS[code % DECK_SIZE // len(RANKS)]}" for code in range(HIDDEN_CODE)) + \
+             (f"{HIDDEN_RANK} of {HIDDEN_SUIT}",)
+# And back: commands name a card, the rules look for its face, the code in the first deck
+NAME_CODES = {CARD_NAMES[code]: code for code in range(DECK_SIZE)}
+_FACE_CODES = bytes(code % DECK_SIZE if code != HIDDEN_CODE else code for code in range(256))
+
+# Binary wire format (see encode_board / encode_delta); bump WIRE_VERSION on any layout change.
+# On the wire a card is its code in the first deck: the copy is the server's business
+WIRE_VERSION = 1
+_WIRE_CODES = _FACE_CODES
+
+_HEADER = struct.Struct(">cBIIBB")  # kind, wire version, board id (snapshot) or base version (delta), version, flags, winner
+_LENGTH = struct.Struct(">H")
+_OP = struct.Struct(">BBH")          # pile index, op, card count (or new length for OP_TRUNCATE)
+
+def card_code(suit, rank, copy=0):
+    """The code of a card from its face; copy picks which of a game's decks it is from."""
+    if (suit, rank) == (HIDDEN_SUIT, HIDDEN_RANK):
+        return HIDDEN_CODE
+    return copy * DECK_SIZE + SUITS.index(suit) * len(RANKS) + RANKS.index(rank)
+
+def rank_of(code):
+    """Index into RANKS of a card code."""
+    return code % len(RANKS)
+
+def fits(card, pile):
+    """Whether a card code may go on a field pile: an Ace starts a pile, then ranks go up by one; Kings are wild."""
+    rank = card % len(RANKS)
+    return rank == KING or rank == len(pile)
+
 class Board:
-    def __init__(self, id):
+    __slots__ = ("id", "decks", "seed", "_shuffled", "_rng", "ready", "currentTurn", "winner", "playerOne", "playerTwo", "deck",
+                 "field", "dump", "version", "_deltas", "_state", "_flags")
+
+    # Server-side bookkeeping, not shipped to clients or copied
+    _TRANSIENT = ("_rng", "_deltas", "_state", "_flags")
+
+    def __init__(self, id, decks=2, seed=None):
         #Game State
         self.id = id
+        # How many decks every deal of this board (startGame after reset()) is shuffled from
+        self.decks = decks
+        # Every shuffle draws from this board's own generator, so the seed plus the
+        # commands applied since (see Journal.py) replay to exactly the same cards
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self._shuffled = ()
+        self._rng = None
         self.ready = False
         self.currentTurn = 0 # either zero or one 
         self.winner = None
 
-        self.displayedCard = []
+        #Game Objects
+        self.playerOne = Player("One")
+        self.playerTwo = Player("Two")
+        self.deck = Deck(decks)
+        self.field = [bytearray() for _ in range(4)]
+        self.dump = bytearray()
+
+        #State versioning, bumped by commit() whenever the board changes
+        self.version = 0
+        self._resetHistory()
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name not in self._TRANSIENT}
+
+    def __setstate__(self, state):
+        self.seed, self._shuffled, self.decks = None, (), 2
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._rng = None
+        self._resetHistory()
+
+    def copy(self):
+        """Return an independent copy of the board's state (without its delta history)."""
+        board = Board.__new__(Board)
+        board.id, board.decks, board.seed, board._shuffled, board.version = \
+            self.id, self.decks, self.seed, self._shuffled, self.version
+        board.ready, board.currentTurn, board.winner = self.ready, self.currentTurn, self.winner
+        board.playerOne, board.playerTwo = self.playerOne.copy(), self.playerTwo.copy()
+        board.deck = Deck(0)
+        board.deck.cards = self.deck.cards[:]
+        board.field = [pile[:] for pile in self.field]
+        board.dump = self.dump[:]
+        board._rng = None
+        board._resetHistory()
+        return board
+
+    def view(self):
+        """Return a BoardView of this board: its piles as lists of Card objects, for the GUI."""
+        return BoardView(self)
+
+    @property
+    def rng(self):
+        '''
+        The board's random.Random: seeded from seed and advanced past every shuffle drawn from it so far.
+
+        A generator's state is 2.5KB, more than the rest of the board, so
+        _shuffle lets go of it afterwards and it is rebuilt here from the
+        length of each shuffle (which is all a shuffle's draws depend on).
+        Draw from it for anything else only right before reseed().
+        '''
+        if self._rng is None:
+            self._rng = random.Random(self.seed)
+            for length in self._shuffled:
+                self._rng.shuffle(bytearray(length))
+        return self._rng
+
+    def reseed(self, seed):
+        """Carry on drawing from a generator seeded with seed."""
+        self.seed = seed
+        self._shuffled = ()
+        self._rng = None
+
+    def _shuffle(self, cards):
+        rng = self.rng
+        rng.shuffle(cards)
+        if len(self._shuffled) < MAX_REPLAYED_SHUFFLES:
+            self._shuffled += (len(cards),)
+        else:
+            # Keep rebuilding cheap in a room reset over and over; replays reseed the same way
+            self.reseed(rng.getrandbits(32))
+        self._rng = None
+
+    def _resetHistory(self):
+        # A list rather than a deque(maxlen): a deque allocates 64 slots up front for every board
+        self._deltas = []
+        self._state = self._pileState()
+        self._flags = self._flagState()
+
+    def _pileState(self):
+        return [bytes(pile) for pile in self.piles()]
+
+    def _flagState(self):
+        return (self.ready, self.currentTurn, self.winner)
+
+    def _pile(self, index):
+        # piles()[index] without building the list
+        if index >= HAND_PILE[1]:
+            player, index = self.playerTwo, index - HAND_PILE[1]
+        elif index >= HAND_PILE[0]:
+            player, index = self.playerOne, index - HAND_PILE[0]
+        elif index >= FIELD_PILE:
+            return self.field[index - FIELD_PILE]
+        else:
+            return self.dump if index else self.deck.cards
+        return player.hand if index == 0 else player.goal if index == 1 else player.discard[index - 2]
+
+    def piles(self):
+        """Return the live card lists of this board in PILE_NAMES order."""
+        return ([self.deck.cards, self.dump] + self.field +
+                [self.playerOne.hand, self.playerOne.goal] + self.playerOne.discard +
+                [self.playerTwo.hand, self.playerTwo.goal] + self.playerTwo.discard)
+
+    def commit(self):
+        """Record the current state as a new version if anything changed since the last commit."""
+        state = self._state
+        flags = self._flagState()
+        ops = []
+        # Live piles compare against the last committed bytes directly; only changed ones are copied
+        for index, pile in enumerate(self.piles()):
+            old = state[index]
+            if pile == old:
+                continue
+            new = state[index] = bytes(pile)
+            if new[:len(old)] == old:
+                ops.append((index, OP_APPEND, new[len(old):]))
+            elif old[:len(new)] == new:
+                ops.append((index, OP_TRUNCATE, len(new)))
+            else:
+                ops.append((index, OP_REPLACE, new))
+
+        if ops or flags != self._flags:
+            self.version += 1
+            self._deltas.append((self.version, ops))
+            if len(self._deltas) > DELTA_HISTORY:
+                del self._deltas[0]
+            self._flags = flags
+        return self.version
+
+    def delta_since(self, version):
+        """Return a BoardDelta from version to now, or None if a full snapshot is needed."""
+        if version == self.version:
+            return BoardDelta(version, self.version, [], self._flagState())
+        if not self._deltas or version > self.version or version < self._deltas[0][0] - 1:
+            return None
+
+        ops = [op for v, vops in self._deltas if v > version for op in vops]
+        return BoardDelta(version, self.version, ops, self._flagState())
+
+    def apply_delta(self, delta):
+        """Bring a client-side copy of the board forward by a BoardDelta from the server."""
+        if delta.base != self.version:
+            raise ValueError(f"delta is based on version {delta.base} but board is at {self.version}")
+
+        piles = self.piles()
+        for index, op, payload in delta.ops:
+            pile = piles[index]
+            if op == OP_APPEND:
+                pile.extend(payload)
+            elif op == OP_TRUNCATE:
+                del pile[payload:]
+            else:
+                pile[:] = payload
 
-        self.activeCard = None
+        self.ready, self.currentTurn, self.winner = delta.flags
+        self.version = delta.version
 
-        #Game Objects
+    def reset(self):
+        """Throw away the current game and deal a fresh one (if both players are seated)."""
+        ready = self.ready
+        self.currentTurn = 0
+        self.winner = None
+        self.ready = False
         self.playerOne = Player("One")
         self.playerTwo = Player("Two")
-        self.deck = Deck(2)
-        self.field = [[],[],[],[]]
-        self.dump = []
+        self.deck = Deck(self.decks)
+        self.field = [bytearray() for _ in range(4)]
+        self.dump = bytearray()
+        if ready:
+            self.startGame()
+        self.commit()
 
 
     def connected(self):
@@ -35,21 +272,86 @@ class Board:
 
         action, value, location = data.split(':')
 
-        if action == "deal":
-            self.dealPlayer(playerId)
-        if action == "start":
-            self.startGame()
-        if action == "discard":
-            self.discard(value, location, playerId)
-            self.currentTurn = (self.currentTurn + 1) % 2
-            self.dealPlayer(self.currentTurn)
         if action == "move":
             self.move(value, location, playerId)
             self.checkField()
+        elif action == "discard":
+            self.discard(value, location, playerId)
+            self.currentTurn = (self.currentTurn + 1) % 2
+            self.dealPlayer(self.currentTurn)
+        elif action == "deal":
+            self.dealPlayer(playerId)
+        elif action == "start":
+            self.startGame()
+
+        self.commit()
+
+    def apply(self, move):
+        '''
+        Make move (one of legal_moves(currentTurn)) and return a record for undo() to take it back.
+
+        The rules are play()'s: checkField after a move, the turn passing and
+        the next player dealt after a discard. There is no command to parse and
+        no commit(), so the version and delta history stay put and a search can
+        explore from one board instead of copying it for every node. If a deal
+        finds the deck empty the board is put back before IndexError is raised.
+        '''
+        source, target = self._pile(move.source), self._pile(move.target)
+        position = source.index(move.card)
+        turn = self.currentTurn
+        moving = move.action == "move"
+        # Whose hand the rules may deal to: the mover's after a move, the next player's after a discard
+        player = self.playerTwo if (turn if moving else (turn + 1) % 2) else self.playerOne
+        # What the rules below can't give back: a field pile cleared to the dump, and the dump's order once
+        # it has been reshuffled (only a deck that can drop below RESHUFFLE_BELOW after a deal reshuffles)
+        field = bytes(target) if moving and len(target) == FIELD_FULL - 1 else None
+        dump = bytes(self.dump) if moving and len(self.deck.cards) < RESHUFFLE_BELOW + 5 else None
+        record = [move, position, 0, turn, self.winner, self.seed, self._shuffled, len(self.deck.cards), field, dump]
+
+        target.append(move.card)
+        del source[position]
+        held = len(player.hand)
+        try:
+            if moving:
+                self.checkField()
+            else:
+                self.currentTurn = (turn + 1) % 2
+                self.dealPlayer(self.currentTurn)
+        except IndexError:
+            record[2] = len(player.hand) - held
+            self.undo(tuple(record))
+            raise
+        record[2] = len(player.hand) - held
+        return tuple(record)
+
+    def undo(self, record):
+        """Take back the apply() that returned record; records go back newest first."""
+        move, position, dealt, turn, winner, seed, shuffled, length, field, dump = record
+        player = self.playerTwo if (turn if move.action == "move" else (turn + 1) % 2) else self.playerOne
+        deck = self.deck.cards
+        # Every shuffle makes a new _shuffled tuple (or reseeds), even one of an empty dump
+        reshuffled = shuffled is not self._shuffled or seed != self.seed
+        if reshuffled:
+            del deck[length - dealt:]
+            self.dump[:] = dump
+            self.seed, self._shuffled, self._rng = seed, shuffled, None
+        if dealt:
+            deck.extend(reversed(player.hand[-dealt:]))
+            del player.hand[-dealt:]
+        target = self._pile(move.target)
+        if field is not None and not target:
+            # The move filled the pile and checkField cleared it, top card first, to the dump
+            target[:] = field
+            if not reshuffled:
+                del self.dump[-FIELD_FULL:]
+        else:
+            del target[-1]
+        self._pile(move.source).insert(position, move.card)
+        self.currentTurn, self.winner = turn, winner
 
     def checkField(self):
         for pile in self.field:
-            if len(pile) == 12:
+            if len(pile) == FIELD_FULL:
                 while len(pile) != 0:
                     self.dump.append(pile.pop())
 
@@ -59,8 +361,8 @@ class Board:
             if self.currentTurn == 1 and len(self.playerTwo.hand) == 0:
                     self.dealPlayer(1)
 
-        if len(self.deck.cards) < 10:
-            random.shuffle(self.dump)
+        if len(self.deck.cards) < RESHUFFLE_BELOW:
+            self._shuffle(self.dump)
             self.deck.cards = self.deck.cards + self.dump
             self.dump.clear()
             logging.getLogger("Game").info("We have reshuffled")
@@ -72,18 +374,11 @@ class Board:
             self.winner = 2
                 
     def startGame(self):
-        self.deck.shuffle()
+        self._shuffle(self.deck.cards)
 
         for i in range(0,2):
             self.playerOne.goal.append(self.deck.deal())
-            index = len(self.playerOne.goal) - 1
-            self.playerOne.goal[index].rect.x = 25
-            self.playerOne.goal[index].rect.y = 50
-
             self.playerTwo.goal.append(self.deck.deal())
-            index = len(self.playerTwo.goal) - 1
-            self.playerTwo.goal[index].rect.x = 25
-            self.playerTwo.goal[index].rect.y = 470
 
         if self.deck.compare(self.playerOne.goal[0], self.playerTwo.goal[0]):
             self.currentTurn = 0
@@ -93,215 +388,419 @@ class Board:
         self.dealPlayer(self.currentTurn)
 
         self.ready = True
+        self.commit()
 
     def dealPlayer(self, playerId):
         if playerId == 0 and self.winner == None:
             while len(self.playerOne.hand) != 5:
                 self.playerOne.hand.append(self.deck.deal())
-
-            for num, card in enumerate(self.playerOne.hand):
-                index = num
-                x = 140 + (81 * index)
-                y = 50
-                card.rect.x = x
-                card.rect.y = y
         if playerId == 1 and self.winner == None:
             while len(self.playerTwo.hand) != 5:
                 self.playerTwo.hand.append(self.deck.deal())
 
-            for num, card in enumerate(self.playerTwo.hand):
-                index = num
-                x = 140 + (81 * index)
-                y = 470
-                card.rect.x = x
-                card.rect.y = y
+    def _playable(self, value, playerId, handOnly=False):
+        '''
+        Find the card named value that playerId may play: the first one in
+        their hand or, unless handOnly, the top of their goal, then of the
+        first discard pile it tops. Returns (source, pile, position), where
+        source is the pile's index into PILE_NAMES, or None.
+
+        The name is looked up once and the piles searched by face code (the
+        hand in C), so no card is named along the way.
+        '''
+        code = NAME_CODES.get(value)
+        if code is None or playerId not in (0, 1):
+            return None
+        player = self.playerTwo if playerId else self.playerOne
+        position = player.hand.translate(_FACE_CODES).find(code)
+        if position >= 0:
+            return HAND_PILE[playerId], player.hand, position
+        if handOnly:
+            return None
+        if player.goal and player.goal[0] % DECK_SIZE == code:
+            return GOAL_PILE[playerId], player.goal, 0
+        for number, pile in enumerate(player.discard):
+            if pile and pile[-1] % DECK_SIZE == code:
+                return DISCARD_PILE[playerId] + number, pile, len(pile) - 1
+        return None
+
+    def legal_moves(self, playerId):
+        '''
+        Yield every Move playerId's cards allow on the board as it stands.
+
+        Field moves come first, from the goal top, the hand, then the discard
+        tops; then every discard of a hand card. A card with the same face
+        as one before it is left out, as its command would play the other:
+        each Move is a distinct command. Moves are made as they are asked
+        for, so a caller that wants the first one only pays for that.
+        There are none once the game is won; whose turn it is is the caller's
+        business (legal() checks it).
+        '''
+        if playerId not in (0, 1) or self.winner is not None:
+            return
+        player = self.playerTwo if playerId else self.playerOne
+        handPile = HAND_PILE[playerId]
+        sources, seen = [], set()
+        for card in player.hand:
+            face = card % DECK_SIZE
+            if face not in seen:
+                seen.add(face)
+                sources.append((handPile, card))
+        hand = sources[:]
+        if player.goal:
+            face = player.goal[0] % DECK_SIZE
+            if face not in seen:
+                seen.add(face)
+                sources.insert(0, (GOAL_PILE[playerId], player.goal[0]))
+            else:
+                # The goal's command plays the hand's copy: still the first one to try
+                first = next(index for index, (_, card) in enumerate(sources) if card % DECK_SIZE == face)
+                sources.insert(0, sources.pop(first))
+        for number, pile in enumerate(player.discard):
+            if pile and pile[-1] % DECK_SIZE not in seen:
+                seen.add(pile[-1] % DECK_SIZE)
+                sources.append((DISCARD_PILE[playerId] + number, pile[-1]))
+
+        # The field piles each rank can go on: the ones as long as its index (see fits), and any for a King
+        targets = {}
+        for number, pile in enumerate(self.field):
+            targets.setdefault(len(pile), []).append(FIELD_PILE + number)
+        targets[KING] = range(FIELD_PILE, FIELD_PILE + len(self.field))
+        for source, card in sources:
+            for target in targets.get(card % len(RANKS), ()):
+                yield Move("move", card, source, target)
+
+        discardPile = DISCARD_PILE[playerId]
+        for source, card in hand:
+            for number in range(4):
+                yield Move("discard", card, source, discardPile + number)
+
+    def legal(self, data, playerId):
+        '''
+        Return the Move a "move" or "discard" command from playerId makes, or None if it isn't legal now.
+
+        It has to be the player's turn in a game still going, and the card is
+        the one play() would take for the command, checked against the same
+        rules as legal_moves().
+        '''
+        try:
+            playerId = int(playerId)
+            action, value, location = data.split(':')
+            number = int(location)
+        except ValueError:
+            return None
+        if action not in ("move", "discard") or not 0 <= number < 4:
+            return None
+        if not self.ready or self.winner is not None or playerId != self.currentTurn:
+            return None
+        found = self._playable(value, playerId, handOnly=action == "discard")
+        if found is None:
+            return None
+        source, pile, position = found
+        card = pile[position]
+        if action == "discard":
+            return Move(action, card, source, DISCARD_PILE[playerId] + number)
+        if not fits(card, self.field[number]):
+            return None
+        return Move(action, card, source, FIELD_PILE + number)
+
+    def allows(self, data, playerId):
+        '''
+        Whether command data from playerId may change the board now: the check for everything play() and reset() do.
+
+        A move or discard has to be legal(). "start" is never a player's to
+        send: the lobby deals the game once both seats are filled. "deal"
+        refills the hand of the player whose turn it is once they have played
+        every card in it; "reset" throws a game away only if none is under
+        way (not dealt yet, or already won).
+        '''
+        action = data.split(':')[0]
+        if action in ("move", "discard"):
+            return self.legal(data, playerId) is not None
+        if data == "reset":
+            return not self.ready or self.winner is not None
+        try:
+            playerId = int(playerId)
+        except ValueError:
+            return False
+        if action == "deal":
+            player = self.playerTwo if playerId else self.playerOne
+            return self.ready and self.winner is None and playerId == self.currentTurn and not player.hand
+        return False
 
     def discard(self, value, location , playerId):
-        if playerId == 0:
-            x = 80
-            y = 155
-        for card in self.playerOne.hand:
-                if str(card) == value:
-                    x += 91 * (int(location)+1)
-                    card.move(x,y)
-                    self.playerOne.discard[int(location)].append(card)
-                    self.playerOne.hand.remove(card)
-        if playerId == 1:
-            x = 80
-            y = 365
-            for card in self.playerTwo.hand:
-                if str(card) == value:
-                    x += 91 * (int(location)+1)
-                    card.move(x,y)
-                    self.playerTwo.discard[int(location)].append(card)
-                    self.playerTwo.hand.remove(card)
+        found = self._playable(value, playerId, handOnly=True)
+        if found is not None:
+            _, hand, position = found
+            player = self.playerTwo if playerId else self.playerOne
+            player.discard[int(location)].append(hand[position])
+            del hand[position]
 
     def move(self, value, location, playerId):
-        if playerId == 0:
-            x = 50
-            y = 260
-            for card in self.playerOne.hand:
-                if str(card) == value:
-                    x += 91 * (int(location)+1)
-                    card.move(x,y)
-                    self.field[int(location)].append(card)
-                    self.playerOne.hand.remove(card)
-                    
-            x = 50        
-            if str(self.playerOne.goal[0]) == value:
-                card = self.playerOne.goal[0]
-                x += 91 * (int(location)+1)
-                card.move(x,y)
-                self.field[int(location)].append(card)
-                self.playerOne.goal.remove(card)
-
-            x = 50
-            for discardPile in self.playerOne.discard:
-                if len(discardPile) > 0:
-                        card = discardPile[len(discardPile)-1]
-                        if str(card) == value:
-                            x += 91 * (int(location)+1)
-                            card.move(x,y)
-                            self.field[int(location)].append(card)
-                            discardPile.remove(card)
-                        
-        if playerId == 1:
-            x = 50
-            y = 260
-            for card in self.playerTwo.hand:
-                if str(card) == value:
-                    x += 91 * (int(location)+1)
-                    card.move(x,y)
-                    self.field[int(location)].append(card)
-                    self.playerTwo.hand.remove(card)
-
-            x = 50
-            if str(self.playerTwo.goal[0]) == value:
-                card = self.playerTwo.goal[0]
-                x += 91 * (int(location)+1)
-                card.move(x,y)
-                self.field[int(location)].append(card)
-                self.playerTwo.goal.remove(card)
-
-            x = 50
-            for discardPile in self.playerTwo.discard:
-                if len(discardPile) > 0:
-                        card = discardPile[len(discardPile)-1]
-                        if str(card) == value:
-                            x += 91 * (int(location)+1)
-                            card.move(x,y)
-                            self.field[int(location)].append(card)
-                            discardPile.remove(card)
-
-    def playCard(self, card):
-
-        #STEP: than check the field
-        fieldY = 260
-        x = 50
-
-        for num, field in enumerate(self.field):
-            x += 20+71
-            if len(field) == 0:
-                if pygame.Rect(x,fieldY,71,94).colliderect(card.rect):
-                    if card.rank == "King" or card.rank == "Ace":
-                        return "move:"+ str(card)+":"+str(num)
-            else:
-                if field[0].rect.colliderect(card.rect):
-                    cardCount = len(field)-1
-                    if self.deck.ranks.index(card.rank) - cardCount == 1 or card.rank == "King":
-                        return "move:"+ str(card)+":"+str(num)        
-
-        #STEP: Check for first player
-        if self.currentTurn == 0:
-            #STEP: First check to see if we discarded a card
-            #Check: we can only discard a card from our hand
-            if card in  self.playerOne.hand:
-                discardY = 155
-                x = 80
-                for num, discardPile in enumerate(self.playerOne.discard):
-                    x += 20 + 71 
-                    if len(discardPile) == 0:
-                        if pygame.Rect(x,discardY, 71,94).colliderect(card.rect):
-                            return "discard:"+ str(card)+":"+str(num)
-                    else:
-                        if discardPile[0].rect.colliderect(card.rect):
-                            return "discard:"+ str(card)+":"+str(num)
-                    
-                        
-        if self.currentTurn == 1:
-            #STEP: First check to see if we discarded a card
-            #Check: we can only discard a card from our hand
-            if card in  self.playerTwo.hand:
-                discardY = 365
-                x = 80
-                for num, discardPile in enumerate(self.playerTwo.discard):
-                    x += 20 + 71 
-                    if len(discardPile) == 0:
-                        if pygame.Rect(x,discardY, 71,94).colliderect(card.rect):
-                            return "discard:"+ str(card)+":"+str(num)
-                    else:
-                        if discardPile[0].rect.colliderect(card.rect):
-                            return "discard:"+ str(card)+":"+str(num)
-                    
-        return None
-    
+        found = self._playable(value, playerId)
+        if found is not None:
+            _, pile, position = found
+            self.field[int(location)].append(pile[position])
+            del pile[position]
 
     def __str__(self):
         return str(self.playerOne) + "\n " + str(self.playerTwo)
     
+def public_board(board):
+    '''
+    Return a copy of board for spectators, with every card only the players may see face down.
+
+    Hands and the deck are all hidden and each goal pile shows only its top
+    card; the field, the discard piles and the dump are public anyway. Pile
+    sizes are kept, so a client can still draw the card backs.
+    '''
+    view = Board(board.id, decks=0, seed=0)
+    view.ready, view.currentTurn, view.winner, view.version = board.ready, board.currentTurn, board.winner, board.version
+    hidden = lambda cards: bytearray([HIDDEN_CODE]) * len(cards)
+    view.deck.cards = hidden(board.deck.cards)
+    view.dump = board.dump[:]
+    view.field = [pile[:] for pile in board.field]
+    for source, target in ((board.playerOne, view.playerOne), (board.playerTwo, view.playerTwo)):
+        target.hand = hidden(source.hand)
+        target.goal = source.goal[:1] + hidden(source.goal[1:])
+        target.discard = [pile[:] for pile in source.discard]
+    view._resetHistory()
+    return view
+
+class Move:
+    '''
+    One play a player can make (see Board.legal_moves and Board.legal).
+
+    card (a code) goes from the source pile to the target pile, both
+    indexes into PILE_NAMES. action is "move" for a field pile and
+    "discard" for one of the player's discard piles; str(move) is the
+    command that plays it.
+    '''
+    __slots__ = ("action", "card", "source", "target")
+
+    def __init__(self, action, card, source, target):
+        self.action = action
+        self.card = card
+        self.source = source
+        self.target = target
+
+    @property
+    def location(self):
+        """The target's number among the field or the player's discard piles, as the command gives it."""
+        if self.action == "move":
+            return self.target - FIELD_PILE
+        return self.target - DISCARD_PILE[0 if self.target < HAND_PILE[1] else 1]
+
+    def __eq__(self, other):
+        return isinstance(other, Move) and (self.action, self.card, self.source, self.target) == \
+               (other.action, other.card, other.source, other.target)
+
+    def __hash__(self):
+        return hash((self.action, self.card, self.source, self.target))
+
+    def __str__(self):
+        return f"{self.action}:{CARD_NAMES[self.card]}:{self.location}"
+
+    def __repr__(self):
+        return f"<Move {self} from {PILE_NAMES[self.source]}>"
+
+class BoardDelta:
+    '''
+    The changes between two versions of a Board.
+
+    ops is a list of (pile index, OP_*, payload) applied in order; pile
+    indexes follow PILE_NAMES. flags is (ready, currentTurn, winner).
+    '''
+    __slots__ = ("base", "version", "ops", "flags")
+
+    def __init__(self, base, version, ops, flags):
+        self.base = base
+        self.version = version
+        self.ops = ops
+        self.flags = flags
+
+    def __reduce__(self):
+        # Pickle as constructor arguments, without the attribute names
+        return BoardDelta, (self.base, self.version, self.ops, self.flags)
+
+def _packFlags(ready, currentTurn, winner):
+    return (1 if ready else 0) | (2 if currentTurn == 1 else 0), winner or 0
+
+def _packCards(cards):
+    return cards.translate(_WIRE_CODES)
+
+def encode_board(board):
+    '''
+    Encode a full Board snapshot in the binary wire format.
+
+    Layout: header (kind b"S", WIRE_VERSION, id, version, flags, winner)
+    followed by every pile in PILE_NAMES order as a uint16 length and one
+    byte per card. flags bit 0 is ready, bit 1 is currentTurn.
+    '''
+    flags, winner = _packFlags(board.ready, board.currentTurn, board.winner)
+    parts = [_HEADER.pack(b"S", WIRE_VERSION, board.id, board.version, flags, winner)]
+    for pile in board.piles():
+        parts.append(_LENGTH.pack(len(pile)))
+        parts.append(_packCards(pile))
+    return b"".join(parts)
+
+def encode_delta(delta):
+    """Encode a BoardDelta: header (kind b"D", base version) then a uint16 op count and the ops."""
+    flags, winner = _packFlags(*delta.flags)
+    parts = [_HEADER.pack(b"D", WIRE_VERSION, delta.base, delta.version, flags, winner),
+             _LENGTH.pack(len(delta.ops))]
+    for index, op, payload in delta.ops:
+        if op == OP_TRUNCATE:
+            parts.append(_OP.pack(index, op, payload))
+        else:
+            parts.append(_OP.pack(index, op, len(payload)))
+            parts.append(_packCards(payload))
+    return b"".join(parts)
+
+def encode_state(state):
+    """Encode a Board or BoardDelta for the wire."""
+    if isinstance(state, BoardDelta):
+        return encode_delta(state)
+    return encode_board(state)
+
+def decode_state(data):
+    """Decode bytes from encode_state back into a Board or a BoardDelta."""
+    kind, wire, ident, version, flags, winner = _HEADER.unpack_from(data)
+    if wire != WIRE_VERSION:
+        raise ValueError(f"unsupported wire version {wire}")
+    offset = _HEADER.size
+
+    if kind == b"S":
+        board = Board(ident, decks=0)
+        for pile in board.piles():
+            (count,) = _LENGTH.unpack_from(data, offset)
+            offset += _LENGTH.size
+            pile.extend(data[offset:offset + count])
+            offset += count
+        # Every card of the game is in some pile, so a reset (e.g. replaying the journal) deals as many decks
+        board.decks = sum(len(pile) for pile in board.piles()) // DECK_SIZE
+        board.ready, board.currentTurn, board.winner = bool(flags & 1), (flags >> 1) & 1, winner or None
+        board.version = version
+        board._resetHistory()
+        return board
+
+    if kind == b"D":
+        (count,) = _LENGTH.unpack_from(data, offset)
+        offset += _LENGTH.size
+        ops = []
+        for _ in range(count):
+            index, op, length = _OP.unpack_from(data, offset)
+            offset += _OP.size
+            if op == OP_TRUNCATE:
+                ops.append((index, op, length))
+            else:
+                ops.append((index, op, bytes(data[offset:offset + length])))
+                offset += length
+        return BoardDelta(ident, version, ops, (bool(flags & 1), (flags >> 1) & 1, winner or None))
+
+    raise ValueError(f"unknown state kind {kind!r}")
+
 class Player:
+    __slots__ = ("name", "hand", "discard", "goal")
+
     def __init__(self, name):
         self.name = name
-        self.hand = []
-        self.discard = [[],[],[],[]]
-        self.goal = []
-    
+        self.hand = bytearray()
+        self.discard = [bytearray() for _ in range(4)]
+        self.goal = bytearray()
+
+    def copy(self):
+        player = Player.__new__(Player)
+        player.name = self.name
+        player.hand = self.hand[:]
+        player.discard = [pile[:] for pile in self.discard]
+        player.goal = self.goal[:]
+        return player
+
     def __str__(self):
-        playerInfo = "Player: {}\nCurrent Goal: {}\nCards left: {}\n".format(self.name, self.goal[0], len(self.goal))
+        playerInfo = "Player: {}\nCurrent Goal: {}\nCards left: {}\n".format(self.name, CARD_NAMES[self.goal[0]], len(self.goal))
 
         handInfo = "Hand: \n"
         for card in self.hand:
-            handInfo += str(card) + "\n"
+            handInfo += CARD_NAMES[card] + "\n"
 
         return playerInfo + handInfo
 
 class Deck:
-    def __init__(self, decks =1):
-        self.cards = []
-        self.suits = ["Hearts", "Diamonds", "Clubs", "Spades"]
-        self.ranks = ["Ace", "2", "3", "4", "5", "6", "7", "8", "9", "10", "Jack", "Queen", "King"]
+    __slots__ = ("cards",)
+
+    suits = SUITS
+    ranks = RANKS
 
-        for deck in range(0,decks):
-            for suit in self.suits:
-                for rank in self.ranks:
-                    self.cards.append(Card(suit, rank))
+    def __init__(self, decks =1):
+        # Deck by deck, suit by suit, rank by rank: the codes in order
+        self.cards = bytearray(range(decks * DECK_SIZE))
 
-    def shuffle(self):
-        random.shuffle(self.cards)
+    def shuffle(self, rng=random):
+        rng.shuffle(self.cards)
 
     def deal(self):
         return self.cards.pop()
     
     def compare(self, cardOne, cardTwo):
-        if self.ranks.index(cardOne.rank) < self.ranks.index(cardTwo.rank):
+        if rank_of(cardOne) < rank_of(cardTwo):
             return True
         return False
 
 class Card():
     '''
-    A card size is 71 X 94
+    A card as an object, for code that deals in faces rather than codes (the GUI, tests).
+
+    Piles hold codes; Card wraps one. It can stand in for its code anywhere
+    an int is taken (pile.append(card), card in pile, bytearray([card])).
+    Where it is drawn is up to the client (see Layout.py).
     '''
-    def __init__(self, suit, rank):
-        super().__init__()
-        self.suit = suit
-        self.rank = rank
+    def __init__(self, suit, rank, copy=0):
+        self.code = card_code(suit, rank, copy)
+
+    @classmethod
+    def of(cls, code):
+        card = cls.__new__(cls)
+        card.code = code
+        return card
+
+    @property
+    def suit(self):
+        return HIDDEN_SUIT if self.code == HIDDEN_CODE else SUITS[self.code % DECK_SIZE // len(RANKS)]
+
+    @property
+    def rank(self):
+        return HIDDEN_RANK if self.code == HIDDEN_CODE else RANKS[rank_of(self.code)]
+
+    def __index__(self):
+        return self.code
 
-        self.rect = pygame.Rect(0,0,71,94)
-  
     def __str__(self):
-        return f"{self.rank} of {self.suit}"
-    
-    def move(self, x, y):
-        self.rect.x = x
-        self.rect.y = y
-    
\ No newline at end of file
+        return CARD_NAMES[self.code]
+
+def cards(pile):
+    """A pile of codes as a list of new Card objects."""
+    return [Card.of(code) for code in pile]
+
+class PlayerView:
+    def __init__(self, player):
+        self.name = player.name
+        self.hand = cards(player.hand)
+        self.discard = [cards(pile) for pile in player.discard]
+        self.goal = cards(player.goal)
+
+class BoardView:
+    '''
+    A Board's state with every pile as a list of Card objects (see Board.view).
+
+    For the GUI, which hangs a rect on each card it draws. It is a copy:
+    changing it doesn't change the board.
+    '''
+    def __init__(self, board):
+        self.id, self.version = board.id, board.version
+        self.ready, self.currentTurn, self.winner = board.ready, board.currentTurn, board.winner
+        self.playerOne = PlayerView(board.playerOne)
+        self.playerTwo = PlayerView(board.playerTwo)
+        self.deck = cards(board.deck.cards)
+        self.field = [cards(pile) for pile in board.field]
+        self.dump = cards(board.dump)
@@ -0,0 +1,279 @@
+import logging
+import os
+import pickle
+import re
+import struct
+import threading
+import zlib
+
+from Game import Board, decode_state, encode_board
+
+logger = logging.getLogger("GameServer")
+
+# Journal record operations
+OP_NEW = 0      # payload: the board's shuffle seed
+OP_START = 1    # both seats filled: Board.startGame()
+OP_PLAY = 2     # payload: player id byte + the "action:value:location" command
+OP_RESET = 3    # a player asked for a fresh game
+OP_ABANDON = 4  # a player left mid-game: the board is reset and waits for a new opponent
+OP_CLOSE = 5    # the game is gone
+OP_RESEED = 6   # payload: a new shuffle seed, drawn when the game was snapshotted
+
+_RECORD = struct.Struct(">IH")   # crc32 of the body, body length
+_BODY = struct.Struct(">IIB")    # gameId, per-game sequence number, op
+_SEED = struct.Struct(">Q")
+
+_SEGMENT = re.compile(r"journal-(\d+)\.log$")
+_SNAPSHOT = re.compile(r"snapshot-(\d+)\.bin$")
+
+
+def pack_seed(seed):
+    return _SEED.pack(seed)
+
+
+def pack_play(playerId, command):
+    return bytes([int(playerId)]) + command.encode()
+
+
+def encode_record(gameId, seq, op, payload=b""):
+    body = _BODY.pack(gameId, seq, op) + payload
+    return _RECORD.pack(zlib.crc32(body), len(body)) + body
+
+
+def read_records(path):
+    """Yield (gameId, seq, op, payload) from a segment, stopping at a torn or corrupt tail."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    offset = 0
+    while offset < len(data):
+        if len(data) - offset < _RECORD.size:
+            break
+        crc, length = _RECORD.unpack_from(data, offset)
+        body = data[offset + _RECORD.size:offset + _RECORD.size + length]
+        if len(body) != length or zlib.crc32(body) != crc:
+            break
+        gameId, seq, op = _BODY.unpack_from(body)
+        yield gameId, seq, op, body[_BODY.size:]
+        offset += _RECORD.size + length
+    if offset < len(data):
+        # Only the last write before a crash can be partial; everything before it is intact
+        logger.warning(f"Ignoring {len(data) - offset} bytes of torn journal at the end of {path}")
+
+
+def apply_record(board, op, payload):
+    """Redo one journaled change on board exactly as the server first applied it."""
+    if op == OP_START:
+        board.startGame()
+    elif op == OP_PLAY:
+        board.play(payload[1:].decode(), payload[0])
+    elif op == OP_RESET:
+        board.reset()
+    elif op == OP_ABANDON:
+        board.ready = False
+        board.reset()
+    elif op == OP_RESEED:
+        board.reseed(_SEED.unpack(payload)[0])
+
+
+def restore_board(seed, encoded):
+    """Rebuild a Board from a snapshot entry (see Lobby.capture)."""
+    board = decode_state(encoded)
+    board.reseed(seed)
+    return board
+
+
+def capture_board(room):
+    '''
+    Return the snapshot entry (gameId, seq, seed, encoded board) for a room. Call with its lock held.
+
+    The generator's full state is ~2.5KB, so instead the board draws a
+    fresh seed from it and carries on from that; the reseed is journaled
+    like any other change so replays that skip this snapshot agree.
+    '''
+    board = room.board
+    seed = board.rng.getrandbits(64)
+    board.reseed(seed)
+    room.record(OP_RESEED, _SEED.pack(seed))
+    return board.id, room.seq, seed, encode_board(board)
+
+
+class Journal:
+    '''
+    Append-only log of every change to every live game, for crash recovery.
+
+    Each game's changes are recorded in order with a per-game sequence
+    number: its creation with the shuffle seed, the start, every play()
+    command and resets. Because a Board draws all randomness from its seed,
+    replaying the records rebuilds exactly the same cards.
+
+    Records are buffered and a background thread writes and fsyncs them
+    every flushInterval seconds, so one fsync covers every move in that
+    window; a crash can lose at most the last window. flushInterval=0
+    writes and fsyncs each record before record() returns.
+
+    To bound replay time, snapshot() switches to a new segment file, writes
+    the compact state of every live game (see capture_board) and deletes
+    the older segments and snapshots. recover() loads the latest snapshot
+    and replays the segments from it onwards, skipping records the
+    snapshot already contains by their sequence number.
+    '''
+    def __init__(self, directory, flushInterval=0.05):
+        self.directory = directory
+        self.flushInterval = flushInterval
+        os.makedirs(directory, exist_ok=True)
+        # lock guards buffer and file; writeLock serialises writers with segment switches
+        self.lock = threading.Lock()
+        self.writeLock = threading.Lock()
+        self.buffer = []
+        self.file = None
+        self.segment = None
+        self.records = 0
+        self.syncs = 0
+        self._stop = threading.Event()
+
+    def _indexes(self, pattern):
+        found = (pattern.match(name) for name in os.listdir(self.directory))
+        return sorted(int(match.group(1)) for match in found if match)
+
+    def _path(self, kind, index):
+        return os.path.join(self.directory, f"{kind}-{index:08d}.{'log' if kind == 'journal' else 'bin'}")
+
+    def recover(self):
+        """Rebuild the live games on disk; returns {gameId: (board, seq)} and opens a fresh segment."""
+        games = {}
+        first = 0
+        for index in reversed(self._indexes(_SNAPSHOT)):
+            try:
+                with open(self._path("snapshot", index), 'rb') as f:
+                    entries = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError) as error:
+                logger.warning(f"Skipping unreadable snapshot {index}: {error}")
+                continue
+            for gameId, seq, seed, encoded in entries:
+                games[gameId] = (restore_board(seed, encoded), seq)
+            first = index
+            break
+
+        segments = self._indexes(_SEGMENT)
+        replayed = 0
+        for index in segments:
+            if index < first:
+                continue
+            for gameId, seq, op, payload in read_records(self._path("journal", index)):
+                if op == OP_NEW:
+                    if gameId not in games:
+                        games[gameId] = (Board(gameId, seed=_SEED.unpack(payload)[0]), seq)
+                    continue
+                game = games.get(gameId)
+                if game is None or seq <= game[1]:
+                    # Closed before the snapshot, or already part of it
+                    continue
+                if op == OP_CLOSE:
+                    del games[gameId]
+                    continue
+                apply_record(game[0], op, payload)
+                games[gameId] = (game[0], seq)
+                replayed += 1
+
+        self._open(self._nextIndex())
+        logger.info(f"Recovered {len(games)} games from {self.directory} ({replayed} records replayed)")
+        return games
+
+    def _nextIndex(self):
+        return max(self._indexes(_SEGMENT) + self._indexes(_SNAPSHOT) + [0]) + 1
+
+    def _open(self, index):
+        self.segment = index
+        self.file = open(self._path("journal", index), 'ab')
+
+    def _ensureOpen(self):
+        # Without a recover() first, start a segment after whatever is already on disk
+        if self.file is None:
+            self._open(self._nextIndex())
+
+    def record(self, gameId, seq, op, payload=b""):
+        """Append one change; durable after the next flush (immediately if flushInterval is 0)."""
+        data = encode_record(gameId, seq, op, payload)
+        with self.lock:
+            self.buffer.append(data)
+            self.records += 1
+        if self.flushInterval == 0:
+            self.flush()
+
+    def flush(self):
+        """Write and fsync everything recorded so far."""
+        with self.writeLock:
+            with self.lock:
+                self._ensureOpen()
+                pending, self.buffer = self.buffer, []
+                file = self.file
+            if pending and file is not None:
+                file.write(b"".join(pending))
+                file.flush()
+                os.fsync(file.fileno())
+                self.syncs += 1
+
+    def snapshot(self, capture):
+        """Start a new segment, save capture()'s game states, then drop the files the snapshot replaces."""
+        with self.writeLock:
+            with self.lock:
+                self._ensureOpen()
+                pending, self.buffer = self.buffer, []
+                old = self.file
+                index = self.segment + 1
+                self._open(index)
+            # Records made before the switch belong to the old segment
+            old.write(b"".join(pending))
+            old.flush()
+            os.fsync(old.fileno())
+            old.close()
+
+        entries = capture()
+        path = self._path("snapshot", index)
+        with open(path + ".tmp", 'wb') as f:
+            pickle.dump(entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        self._syncDirectory()
+
+        for pattern, kind in ((_SEGMENT, "journal"), (_SNAPSHOT, "snapshot")):
+            for older in self._indexes(pattern):
+                if older < index:
+                    os.remove(self._path(kind, older))
+        logger.info(f"Journal snapshot {index}: {len(entries)} games")
+
+    def _syncDirectory(self):
+        # Make the rename itself durable
+        try:
+            fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def start(self, capture, snapshotEvery=60.0):
+        """Run the flusher and (if snapshotEvery > 0) periodic snapshots on daemon threads."""
+        if self.flushInterval > 0:
+            threading.Thread(target=self._every, args=(self.flushInterval, self.flush),
+                             name="journal-flush", daemon=True).start()
+        if snapshotEvery > 0:
+            threading.Thread(target=self._every, args=(snapshotEvery, lambda: self.snapshot(capture)),
+                             name="journal-snapshot", daemon=True).start()
+
+    def _every(self, interval, action):
+        while not self._stop.wait(interval):
+            try:
+                action()
+            except OSError as error:
+                logger.error(f"Journal error: {error}")
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+        with self.writeLock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
@@ -0,0 +1,84 @@
+import pygame
+
+from Game import fits
+
+# Screen geometry of the client: where each pile of a Board is drawn and which
+# pile a dragged card was dropped on. The rules in Game.py know nothing of this,
+# so the server and agents never import pygame.
+
+# Every card image is 71 x 94
+CARD_WIDTH, CARD_HEIGHT = 71, 94
+
+# (hand and goal y, discard pile y) for player one (top) and player two (bottom)
+PLAYER_ROWS = ((50, 155), (470, 365))
+FIELD_Y = 260
+GOAL_X = 25
+
+
+def hand_x(index):
+    return 140 + 81 * index
+
+def discard_x(num):
+    return 80 + 91 * (num + 1)
+
+def field_x(num):
+    return 50 + 91 * (num + 1)
+
+
+def place(card, x, y):
+    """Give card a rect at (x, y), reusing the one it has."""
+    rect = getattr(card, "rect", None)
+    if rect is None:
+        card.rect = pygame.Rect(x, y, CARD_WIDTH, CARD_HEIGHT)
+    else:
+        rect.topleft = (x, y)
+
+
+def layout(board):
+    """Position a rect on every visible card of a BoardView from the pile it is in; returns the view."""
+    for player, (y, discardY) in zip((board.playerOne, board.playerTwo), PLAYER_ROWS):
+        for index, card in enumerate(player.hand):
+            place(card, hand_x(index), y)
+        for card in player.goal:
+            place(card, GOAL_X, y)
+        for num, pile in enumerate(player.discard):
+            for card in pile:
+                place(card, discard_x(num), discardY)
+
+    for num, pile in enumerate(board.field):
+        for card in pile:
+            place(card, field_x(num), FIELD_Y)
+    return board
+
+
+def play_card(board, card):
+    '''
+    Turn a card of a laid out BoardView dropped at card.rect into the command to send, or None.
+
+    A card dropped on a field pile it can go on is a "move"; a card from
+    the hand of the player whose turn it is dropped on one of their discard
+    piles is a "discard". The server checks the move again either way.
+    '''
+    for num, field in enumerate(board.field):
+        if len(field) == 0:
+            if pygame.Rect(field_x(num), FIELD_Y, CARD_WIDTH, CARD_HEIGHT).colliderect(card.rect):
+                if fits(card.code, field):
+                    return "move:" + str(card) + ":" + str(num)
+        else:
+            if field[0].rect.colliderect(card.rect):
+                if fits(card.code, field):
+                    return "move:" + str(card) + ":" + str(num)
+
+    #Check: we can only discard a card from our hand
+    player = board.playerOne if board.currentTurn == 0 else board.playerTwo
+    discardY = PLAYER_ROWS[board.currentTurn][1]
+    if card in player.hand:
+        for num, discardPile in enumerate(player.discard):
+            if len(discardPile) == 0:
+                if pygame.Rect(discard_x(num), discardY, CARD_WIDTH, CARD_HEIGHT).colliderect(card.rect):
+                    return "discard:" + str(card) + ":" + str(num)
+            else:
+                if discardPile[0].rect.colliderect(card.rect):
+                    return "discard:" + str(card) + ":" + str(num)
+
+    return None
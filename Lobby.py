@@ -0,0 +1,744 @@
+import itertools
+import logging
+import secrets
+import threading
+import time
+
+from Game import Board, public_board
+from Journal import (OP_ABANDON, OP_CLOSE, OP_NEW, OP_PLAY, OP_RESET, OP_START, capture_board, pack_play,
+                     pack_seed)
+from Matchmaker import Matchmaker
+from Metrics import command_name
+from Registry import GameRegistry
+from Spectators import Broadcaster
+from Protocol import (DEFAULT_FORMAT, FLAG_PUSH, FrameDecoder, encode_reply, make_greeting, negotiate,
+                      pack_frame, parse_hello)
+
+logger = logging.getLogger("GameServer")
+
+# Longest a "wait:<version>:<seconds>" long-poll may hold a reply back
+MAX_WAIT = 30.0
+
+
+class GameRoom:
+    '''
+    A live Board plus the callbacks watching it for changes.
+
+    lock must be held to mutate or encode the board, so both players of a
+    game are serialised and every snapshot or delta is taken between
+    moves. Each game has its own lock; different games never contend.
+
+    Watchers are called as callback(origin) after every change, where
+    origin is the Session that caused it (or None).
+
+    snapshot() keeps the encoded board for the current version (one per
+    wire format) so repeated reads of an unchanged board aren't
+    re-encoded; hits and misses count how often that paid off.
+
+    With a Journal, every change is also passed to record() (with lock
+    held) so the game can be rebuilt after a crash; seq numbers them.
+
+    lastActive is the monotonic time of the last command, for the Reaper;
+    members are the sessions connected to the game, so it can kick them.
+    buckets are the game's RateLimiter budgets, made on first use.
+
+    spectators are the sessions the Broadcaster pushes the game's public
+    view to; fanout is its watcher while there are any.
+
+    tokens maps each seat to its resume token (see Lobby.claim).
+    '''
+    def __init__(self, board, cache=True, journal=None, seq=0):
+        self.board = board
+        self.journal = journal
+        self.seq = seq
+        self.lastActive = time.monotonic()
+        self.members = set()
+        self.buckets = None
+        self.spectators = set()
+        self.fanout = None
+        self.tokens = {}
+        self._public = {}
+        self._publicVersion = None
+        self.lock = threading.Lock()
+        self.watchers = []
+        self.watchLock = threading.Lock()
+        # Seats (0/1) currently held by a connected player; guarded by the lobby lock
+        self.seats = set()
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+        self._snapshots = {}
+        self._snapshotVersion = None
+
+    def snapshot(self, wire_format):
+        """Return the full board encoded in wire_format. Call with lock held."""
+        if not self.cache:
+            self.misses += 1
+            return encode_reply(self.board, wire_format)
+        if self._snapshotVersion != self.board.version:
+            self._snapshots = {}
+            self._snapshotVersion = self.board.version
+        data = self._snapshots.get(wire_format)
+        if data is None:
+            self.misses += 1
+            data = self._snapshots[wire_format] = encode_reply(self.board, wire_format)
+        else:
+            self.hits += 1
+        return data
+
+    def publicView(self, wire_format):
+        """Return the spectators' redacted board (see public_board) encoded in wire_format. Call with lock held.
+
+        Always cached per version, whatever the snapshot cache setting: one
+        encode serves every spectator.
+        """
+        if self._publicVersion != self.board.version:
+            self._public = {}
+            self._publicVersion = self.board.version
+        data = self._public.get(wire_format)
+        if data is None:
+            data = self._public[wire_format] = encode_reply(public_board(self.board), wire_format)
+        return data
+
+    def record(self, op, payload=b""):
+        """Journal one change to the board, if journaling is on. Call with lock held."""
+        if self.journal is not None:
+            self.seq += 1
+            self.journal.record(self.board.id, self.seq, op, payload)
+
+    def watch(self, callback):
+        with self.watchLock:
+            self.watchers.append(callback)
+
+    def unwatch(self, callback):
+        with self.watchLock:
+            if callback in self.watchers:
+                self.watchers.remove(callback)
+
+    def enter(self, session):
+        with self.watchLock:
+            self.members.add(session)
+
+    def exit(self, session):
+        with self.watchLock:
+            self.members.discard(session)
+
+    def kick(self):
+        """Disconnect every session still connected to this game."""
+        with self.watchLock:
+            members = list(self.members)
+        for session in members:
+            session.kick()
+
+    def notify(self, origin=None):
+        with self.watchLock:
+            watchers = list(self.watchers)
+        for callback in watchers:
+            callback(origin)
+
+
+class Seat:
+    '''
+    A seat a resume token was issued for: the session holding it, or, while
+    its player is away, the monotonic time the seat is given up at.
+    '''
+    __slots__ = ("gameId", "p", "session", "deadline")
+
+    def __init__(self, gameId, p, session):
+        self.gameId = gameId
+        self.p = p
+        self.session = session
+        self.deadline = None
+
+
+class Lobby:
+    '''
+    Game bookkeeping shared by the threaded and asyncio servers.
+
+    The lobby seats incoming connections where its Matchmaker says and owns
+    the live game rooms in a sharded GameRegistry; each connection talks to
+    it through a Session. The lobby lock only covers seating and leaving.
+
+    snapshotCache=False makes every room encode each full-board reply
+    afresh (see GameRoom.snapshot). With a Metrics instance, sessions time
+    every command and the lobby exposes its games, seats, matchmaking queue
+    and cache counters as gauges; metrics=None skips all of that.
+
+    With a Journal, recover() reopens the games that were live when the
+    server last stopped and every later change is journaled.
+
+    A Reaper, when one is attached, evicts idle and finished games through
+    evict(). readTimeout is how long the servers let a connection go
+    without sending anything (0 = forever).
+
+    With a RateLimiter, sessions hold back commands sent faster than its
+    budgets allow (see Session.throttle).
+
+    moveLogEvery=N logs only every Nth move across all games (0 = none),
+    for servers where a line per move is more than the log can take.
+
+    Up to maxSpectators read-only spectators may watch each game (see
+    Session.spectate); their pushes go out through one Broadcaster.
+
+    With resumeGrace > 0 every player is given a resume token in the
+    greeting. A player whose connection drops mid-game keeps the seat for
+    resumeGrace seconds; a hello with resume=<token> in that time takes it
+    back, same Board and all. Seats nobody came back for are freed by
+    expireSeats(), which the Reaper calls on every pass.
+
+    With a Compressor, clients whose hello asks for compress=zlib get their
+    larger replies and pushes compressed; without one the request is
+    declined and every client gets plain frames.
+    '''
+    def __init__(self, snapshotCache=True, matchmaker=None, metrics=None, journal=None, readTimeout=0, limiter=None,
+                 moveLogEvery=1, maxSpectators=1000, spectatorDropAfter=10.0, resumeGrace=0.0, compressor=None):
+        self.games = GameRegistry()
+        self.matchmaker = matchmaker if matchmaker is not None else Matchmaker()
+        self.metrics = metrics
+        self.journal = journal
+        self.reaper = None
+        self.readTimeout = readTimeout
+        self.limiter = limiter
+        self.moveLogEvery = moveLogEvery
+        self._moves = itertools.count()
+        self.maxSpectators = maxSpectators
+        self.broadcaster = Broadcaster(dropAfter=spectatorDropAfter)
+        self.resumeGrace = resumeGrace
+        # Resume token -> Seat for every seat of a live game that was issued one; guarded by lock
+        self.resumable = {}
+        self.resumed = 0
+        # Plays refused by Board.allows; guarded by lock
+        self.rejected = 0
+        self.compressor = compressor
+        self.lock = threading.Lock()
+        self.snapshotCache = snapshotCache
+        # Snapshot cache counters of rooms that have already closed
+        self._closedHits = 0
+        self._closedMisses = 0
+        if metrics is not None:
+            self._registerGauges(metrics)
+
+    def _registerGauges(self, metrics):
+        metrics.gauge("cards_active_games", "Games currently open", lambda: len(self.games))
+        metrics.gauge("cards_connected_seats", "Seats held by a connected player",
+                      lambda: sum(len(room.seats) for room in self.games.rooms()))
+        metrics.gauge("cards_matchmaking_queue_depth", "Open seats and batched players waiting for a match",
+                      self.matchmaker.queueDepth)
+        metrics.gauge("cards_matches_total", "Players paired by the matchmaker",
+                      lambda: self.matchmaker.stats()["matches"], kind="counter")
+        metrics.gauge("cards_snapshot_cache_hits_total", "Full-board replies served from the snapshot cache",
+                      lambda: self.snapshotStats()[0], kind="counter")
+        metrics.gauge("cards_snapshot_cache_misses_total", "Full-board replies that had to be encoded",
+                      lambda: self.snapshotStats()[1], kind="counter")
+        if self.limiter is not None:
+            metrics.gauge("cards_rate_limited_reads_total", "Reads held back for going over a rate limit",
+                          lambda: self.limiter.stats()["limited_reads"], kind="counter")
+            metrics.gauge("cards_rate_limited_mutations_total", "Moves held back for going over a rate limit",
+                          lambda: self.limiter.stats()["limited_mutations"], kind="counter")
+            metrics.gauge("cards_rate_limit_delay_seconds_total", "Time commands were held back by rate limits",
+                          lambda: self.limiter.stats()["delay_seconds"], kind="counter")
+        metrics.gauge("cards_spectators", "Spectators subscribed to a game",
+                      lambda: sum(len(room.spectators) for room in self.games.rooms()))
+        metrics.gauge("cards_spectator_pushes_total", "Public-view frames pushed to spectators",
+                      lambda: self.broadcaster.sent, kind="counter")
+        metrics.gauge("cards_spectator_skipped_total", "Spectator pushes skipped because the connection was busy",
+                      lambda: self.broadcaster.skipped, kind="counter")
+        metrics.gauge("cards_spectators_dropped_total", "Spectators disconnected for falling behind",
+                      lambda: self.broadcaster.dropped, kind="counter")
+        if self.compressor is not None:
+            metrics.gauge("cards_compression_bytes_saved_total", "Reply bytes saved by compression",
+                          lambda: self.compressor.stats()["bytes_saved"], kind="counter")
+            metrics.gauge("cards_compression_seconds_total", "CPU time spent compressing replies",
+                          lambda: self.compressor.stats()["cpu_seconds"], kind="counter")
+        metrics.gauge("cards_held_seats", "Seats kept for a dropped player to resume",
+                      lambda: sum(1 for seat in list(self.resumable.values()) if seat.session is None))
+        metrics.gauge("cards_resumed_total", "Players who reconnected to their seat with a resume token",
+                      lambda: self.resumed, kind="counter")
+        metrics.gauge("cards_rejected_plays_total", "Plays refused as illegal or out of turn",
+                      lambda: self.rejected, kind="counter")
+
+    def logMove(self):
+        """True if this move should be logged (see moveLogEvery)."""
+        every = self.moveLogEvery
+        # next() on a count is atomic under the GIL, so the sampling needs no lock
+        return every == 1 or (every > 0 and next(self._moves) % every == 0)
+
+    def _newRoom(self, gameId):
+        room = GameRoom(Board(gameId), cache=self.snapshotCache, journal=self.journal)
+        room.record(OP_NEW, pack_seed(room.board.seed))
+        if self.reaper is not None:
+            self.reaper.track(room)
+        return room
+
+    def join(self, rating=None):
+        """Seat a new connection and return its (playerId, gameId); the second seat filled starts the game."""
+        p, gameId = self.matchmaker.join(rating)
+        with self.lock:
+            room = self.games.setdefault(gameId, lambda: self._newRoom(gameId))
+            room.seats.add(p)
+            room.lastActive = time.monotonic()
+            full = len(room.seats) == 2
+        if full:
+            self._start(room, gameId)
+        else:
+            logger.info(f"Player {p} waiting for an opponent in game {gameId}")
+        return p, gameId
+
+    def _start(self, room, gameId):
+        """Both seats are filled: deal the game, unless it is already under way. True if it was dealt."""
+        with room.lock:
+            # A game recovered from the journal carries on where it was
+            resumed = room.board.ready
+            if not resumed:
+                room.board.startGame()
+                room.record(OP_START)
+        logger.info(f"Game {gameId} {'resumed' if resumed else 'is now ready'}")
+        return not resumed
+
+    def leave(self, gameId, p):
+        """Free seat p. An empty game is closed; otherwise it is reset and the seat requeued."""
+        with self.lock:
+            room = self.games.get(gameId)
+            if room is not None:
+                room.seats.discard(p)
+                self.resumable.pop(room.tokens.pop(p, None), None)
+            if self.matchmaker.leave(gameId, p):
+                room = self.games.pop(gameId)
+                closed = True
+                if room is not None:
+                    with room.lock:
+                        room.record(OP_CLOSE)
+            else:
+                closed = False
+                if room is not None:
+                    with room.lock:
+                        # Abandoned mid-game: the remaining player waits for a new opponent
+                        room.board.ready = False
+                        room.board.reset()
+                        room.record(OP_ABANDON)
+        if room is None:
+            return
+        if closed:
+            with self.lock:
+                self._closedHits += room.hits
+                self._closedMisses += room.misses
+            logger.info(f"Closing Game {gameId}")
+        else:
+            logger.info(f"Player {p} left game {gameId}; seat requeued")
+        # Wake long-polls and subscribers so they notice the game is gone or reset
+        room.notify()
+        if closed:
+            # Only spectators can still be connected
+            room.kick()
+
+    def claim(self, gameId, p, session):
+        """Issue the resume token for seat p of gameId, now held by session."""
+        # The game id up front lets the --workers dispatcher route a resume to the right worker
+        token = f"{gameId}.{secrets.token_hex(16)}"
+        with self.lock:
+            room = self.games.get(gameId)
+            if room is not None:
+                room.tokens[p] = token
+                self.resumable[token] = Seat(gameId, p, session)
+        return token
+
+    def hold(self, token, session):
+        """session's connection dropped: keep its seat for resumeGrace seconds if its game is under way."""
+        with self.lock:
+            seat = self.resumable.get(token)
+            if seat is None or seat.session is not session:
+                # Gone already, or taken back by a newer connection of the same player
+                return
+            room = self.games.get(seat.gameId)
+            held = room is not None and room.board.ready
+            if held:
+                room.seats.discard(seat.p)
+                seat.session = None
+                seat.deadline = time.monotonic() + self.resumeGrace
+        if held:
+            logger.info(f"Player {seat.p} dropped from game {seat.gameId}; holding the seat for {self.resumeGrace}s")
+        else:
+            self.leave(seat.gameId, seat.p)
+
+    def resume(self, token, session):
+        """Give session the seat token was issued for and return (playerId, gameId), or None if it has expired."""
+        with self.lock:
+            seat = self.resumable.get(token)
+            room = self.games.get(seat.gameId) if seat is not None else None
+            if room is None:
+                return None
+            previous, seat.session, seat.deadline = seat.session, session, None
+            room.seats.add(seat.p)
+            room.lastActive = time.monotonic()
+            self.resumed += 1
+            full = len(room.seats) == 2
+        if previous is not None:
+            # The old connection is half-open and hasn't noticed yet; its close() no longer frees the seat
+            previous.kick()
+        # The other seat may have been given up and refilled while we were away, leaving a game not dealt yet
+        if full and self._start(room, seat.gameId):
+            room.notify()
+        return seat.p, seat.gameId
+
+    def expireSeats(self, now=None):
+        """Free the held seats whose players didn't come back in time; returns how many."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            expired = [(token, seat) for token, seat in self.resumable.items()
+                       if seat.deadline is not None and seat.deadline <= now]
+            # Off the table before leave(), so a resume racing with it can't take a seat being freed
+            for token, _ in expired:
+                del self.resumable[token]
+        for _, seat in expired:
+            logger.info(f"Player {seat.p} did not come back to game {seat.gameId} within {self.resumeGrace}s")
+            self.leave(seat.gameId, seat.p)
+        return len(expired)
+
+    def evict(self, gameId, reason):
+        """Close a game the Reaper gave up on and disconnect its players; False if it is already gone."""
+        with self.lock:
+            room = self.games.pop(gameId)
+            if room is None:
+                return False
+            self.matchmaker.forget(gameId)
+            room.seats.clear()
+            for token in room.tokens.values():
+                self.resumable.pop(token, None)
+            with room.lock:
+                room.record(OP_CLOSE)
+            self._closedHits += room.hits
+            self._closedMisses += room.misses
+        logger.info(f"Evicting {reason} game {gameId}")
+        room.notify()
+        room.kick()
+        return True
+
+    def recover(self):
+        """Reopen the games in the journal; their seats are offered to the next players to arrive."""
+        games = self.journal.recover()
+        for gameId, (board, seq) in games.items():
+            self.games.setdefault(gameId, lambda: GameRoom(board, cache=self.snapshotCache,
+                                                           journal=self.journal, seq=seq))
+        self.matchmaker.restore(sorted(games))
+        return len(games)
+
+    def capture(self):
+        """Journal snapshot entries for every live game (see Journal.capture_board)."""
+        entries = []
+        for room in self.games.rooms():
+            with room.lock:
+                entries.append(capture_board(room))
+        return entries
+
+    def snapshotStats(self):
+        """Return (hits, misses) of the snapshot cache across all games so far."""
+        rooms = self.games.rooms()
+        with self.lock:
+            hits, misses = self._closedHits, self._closedMisses
+        return hits + sum(room.hits for room in rooms), misses + sum(room.misses for room in rooms)
+
+
+class Session:
+    '''
+    One client connection: its frame decoder, negotiated options and seat.
+
+    The server passes every chunk it reads to receive() and each command
+    that returns to respond(), sending back the framed replies while
+    holding sendLock. Afterwards (with sendLock released) it calls
+    publish() so other sessions watching the game hear about any change.
+    The first command must be the hello.
+
+    After "subscribe:<version>:" the session pushes FLAG_PUSH frames
+    through self.push, which the server sets to a function that writes a
+    frame to the connection.
+
+    With the lobby's resumeGrace on, the greeting carries a resume token
+    (token=...) and a hello with resume=<token> takes the seat back after a
+    dropped connection instead of joining a new game.
+
+    A hello with spectate=<gameId> makes a read-only spectator instead of
+    a player: it takes no seat, every reply is the game's public view (no
+    hands, see public_board) and its pushes come from the lobby's
+    Broadcaster through self.offer.
+
+    Locks are always taken in the order sendLock, then the room's lock.
+    '''
+    def __init__(self, lobby):
+        self.lobby = lobby
+        self.decoder = FrameDecoder()
+        self.p = None
+        self.gameId = None
+        self.room = None
+        self.format = DEFAULT_FORMAT
+        # Whether replies to this client may be compressed (negotiated in the hello)
+        self.compress = False
+        # Board version the client has after the last reply or push we sent
+        self.sentVersion = -1
+        self.subscribed = False
+        self.push = None
+        # Set by the server to a function that drops the connection (see Lobby.evict)
+        self.kick = lambda: None
+        # This connection's RateLimiter budgets, and how many of its commands they held back
+        self.buckets = None
+        self.throttled = 0
+        # Resume token for this session's seat, when the lobby issues them
+        self.token = None
+        self.spectator = False
+        # When the Broadcaster first had to skip this spectator, while it is behind
+        self.behindSince = None
+        self.sendLock = threading.Lock()
+        self._changed = False
+        # Set by _apply when it refuses a play; counted once room.lock is released
+        self._refused = False
+
+    def receive(self, data):
+        """Decode a chunk read from the socket into the commands it completes."""
+        return [payload.decode() for _, payload in self.decoder.feed(data)]
+
+    def respond(self, command):
+        """Return the framed reply to one command, or None if the connection should close."""
+        metrics = self.lobby.metrics
+        if metrics is None:
+            return self._respond(command)
+        start = time.perf_counter()
+        frame = self._respond(command)
+        metrics.observe(command_name(command), time.perf_counter() - start, len(frame) if frame else 0)
+        return frame
+
+    def _respond(self, command):
+        if self.gameId is None:
+            reply = self.hello(command)
+            if reply is None:
+                logger.warning(f"Closing connection: expected a hello, got {command[:32]!r}")
+            return pack_frame(reply) if reply is not None else None
+        reply = self.handle(command)
+        return self.frame(reply) if reply is not None else None
+
+    def frame(self, payload, flags=0):
+        """Frame a reply or push, compressed if this client negotiated it."""
+        if self.compress:
+            return self.lobby.compressor.pack(payload, flags)
+        return pack_frame(payload, flags)
+
+    def offer(self, frame):
+        """Push a spectator frame without blocking; False if the connection can't take it right now.
+
+        The servers replace this with a non-blocking write; by default it is push().
+        """
+        self.push(frame)
+        return True
+
+    def publish(self):
+        """Tell the game's other watchers about changes made by this session's last commands."""
+        if self._changed and self.room is not None:
+            self._changed = False
+            self.room.notify(self)
+
+    def hello(self, data):
+        """Negotiate options, seat the client and return the greeting, or None if data isn't a hello."""
+        requested = parse_hello(data)
+        if requested is None:
+            return None
+
+        accepted = negotiate(requested, compression=self.lobby.compressor is not None)
+        self.format = accepted["format"]
+        self.compress = "compress" in accepted
+        if "spectate" in requested:
+            return self.spectate(requested["spectate"], accepted)
+        if "resume" in requested and self.lobby.resumeGrace > 0:
+            greeting = self.resume(requested["resume"], accepted)
+            if greeting is not None:
+                return greeting
+        try:
+            rating = int(requested["rating"])
+        except (KeyError, ValueError):
+            rating = None
+        self.p, self.gameId = self.lobby.join(rating)
+        self.room = self.lobby.games.get(self.gameId)
+        self.room.enter(self)
+        if self.lobby.resumeGrace > 0:
+            self.token = accepted["token"] = self.lobby.claim(self.gameId, self.p, self)
+        # Filling the second seat starts the game; tell whoever is watching
+        self._changed = self.room.board.ready
+        logger.info(f"Player {self.p} connected to game {self.gameId} ({self.format})")
+        return make_greeting(self.p, accepted).encode()
+
+    def resume(self, token, accepted):
+        """Take back a held seat and return the greeting, or None if the token has expired."""
+        seat = self.lobby.resume(token, self)
+        if seat is None:
+            logger.info("Resume token expired or unknown; seating as a new player")
+            return None
+        self.p, self.gameId = seat
+        self.room = self.lobby.games.get(self.gameId)
+        self.room.enter(self)
+        self.token = accepted["token"] = token
+        # The client syncs from the version it has, so it is only sent what it missed
+        logger.info(f"Player {self.p} resumed game {self.gameId} ({self.format})")
+        return make_greeting(self.p, accepted).encode()
+
+    def spectate(self, gameId, accepted):
+        """Attach to a live game as a spectator and return the greeting, or None if that isn't possible."""
+        try:
+            room = self.lobby.games.get(int(gameId))
+        except ValueError:
+            room = None
+        if room is None:
+            logger.warning(f"Closing connection: no game {gameId!r} to spectate")
+            return None
+        with room.watchLock:
+            watching = sum(1 for member in room.members if member.spectator)
+        if watching >= self.lobby.maxSpectators:
+            logger.warning(f"Closing connection: game {room.board.id} already has {watching} spectators")
+            return None
+        self.spectator = True
+        self.gameId = room.board.id
+        self.room = room
+        room.enter(self)
+        accepted["spectate"] = str(self.gameId)
+        logger.info(f"Spectator connected to game {self.gameId} ({self.format})")
+        return make_greeting("spectator", accepted).encode()
+
+    def handle(self, data):
+        """Apply one command and return the encoded reply, or None if the game is gone."""
+        room = self.lobby.games.get(self.gameId)
+        if room is None:
+            return None
+        if self.spectator:
+            return self._watch(room, data)
+
+        room.lastActive = time.monotonic()
+        if data.startswith("subscribe:"):
+            self.subscribe(room)
+        elif data.startswith("unsubscribe:"):
+            self.unsubscribe()
+        with room.lock:
+            reply = self._apply(room, data)
+        if self._refused:
+            # Under the lobby's lock, which mustn't be taken while holding a room's
+            self._refused = False
+            with self.lobby.lock:
+                self.lobby.rejected += 1
+        return reply
+
+    def _watch(self, room, data):
+        """A spectator's command: any read gets the whole public view; plays are refused."""
+        if not data.startswith(("get", "sync:", "wait:", "subscribe:", "unsubscribe:")):
+            logger.warning(f"Spectator of game {self.gameId} tried to play {data[:32]!r}")
+        with room.lock:
+            self.sentVersion = room.board.version
+            reply = room.publicView(self.format)
+        if data.startswith("subscribe:") and not self.subscribed:
+            self.subscribed = True
+            self.lobby.broadcaster.add(room, self)
+        elif data.startswith("unsubscribe:"):
+            self.unsubscribe()
+        return reply
+
+    def _apply(self, room, data):
+        gameId, p, board = self.gameId, self.p, room.board
+        if data.startswith(("sync:", "wait:", "subscribe:")):
+            # "sync:<version>:" - reply with only what changed since the client's version
+            return self._encode(room, board.delta_since(self._parseVersion(data)))
+
+        if data == "get" or data.startswith("unsubscribe:"):
+            return self._encode(room)
+        if not board.allows(data, p):
+            # Out of turn, a card the player can't reach or that doesn't fit where it was put,
+            # or a start, deal or reset the game as it stands doesn't allow
+            self._refused = True
+            logger.warning(f"Game {gameId}: Player {p} tried an illegal play {data[:48]!r}")
+        elif data == "reset":
+            board.reset()
+            room.record(OP_RESET)
+            self._changed = True
+            logger.info(f"Game {gameId} reset by Player {p}")
+        else:
+            version = board.version
+            board.play(data, p)
+            if board.version != version:
+                # A play that changed nothing drew nothing from the board's generator either
+                room.record(OP_PLAY, pack_play(p, data))
+                self._changed = True
+            if self.lobby.logMove():
+                logger.info(f"Game {gameId}: Player {p} played {data}")
+
+        return self._encode(room)
+
+    def _encode(self, room, delta=None):
+        """Encode delta, or the whole board (from the room's snapshot cache) when there is none."""
+        self.sentVersion = room.board.version
+        if delta is None:
+            return room.snapshot(self.format)
+        return encode_reply(delta, self.format)
+
+    @staticmethod
+    def _parseVersion(data):
+        try:
+            return int(data.split(':')[1])
+        except (IndexError, ValueError):
+            return -1
+
+    def throttle(self, command):
+        """Seconds the server should hold command back to keep within the rate limits (0 when within them)."""
+        if self.lobby.limiter is None or self.room is None:
+            return 0.0
+        return self.lobby.limiter.throttle(self, self.room, command)
+
+    def waitRequest(self, command):
+        """Return (version, timeout) if command is a "wait:<version>:<seconds>" long-poll, else None."""
+        if not command.startswith("wait:"):
+            return None
+        try:
+            timeout = min(float(command.split(':')[2]), MAX_WAIT)
+        except (IndexError, ValueError):
+            timeout = MAX_WAIT
+        return self._parseVersion(command), max(timeout, 0.0)
+
+    def changedSince(self, version):
+        """True once the board is past version (or the game is gone), ending a long-poll."""
+        room = self.lobby.games.get(self.gameId)
+        return room is None or room.board.version != version
+
+    def subscribe(self, room):
+        if not self.subscribed:
+            self.subscribed = True
+            room.watch(self.onChange)
+
+    def unsubscribe(self):
+        if self.subscribed:
+            self.subscribed = False
+            if self.spectator:
+                self.lobby.broadcaster.remove(self.room, self)
+            else:
+                self.room.unwatch(self.onChange)
+
+    def onChange(self, origin):
+        """Room watcher: push the client whatever changed since the last state it was sent."""
+        if origin is self or self.push is None:
+            return
+        with self.sendLock:
+            room = self.lobby.games.get(self.gameId)
+            if room is None:
+                return
+            with room.lock:
+                if room.board.version == self.sentVersion:
+                    return
+                frame = self.frame(self._encode(room, room.board.delta_since(self.sentVersion)), FLAG_PUSH)
+            try:
+                self.push(frame)
+                if self.lobby.metrics is not None:
+                    self.lobby.metrics.sent("push", len(frame))
+            except OSError as error:
+                logger.warning(f"Push to Player {self.p} of game {self.gameId} failed: {error}")
+
+    def close(self):
+        if self.throttled:
+            logger.info(f"Player {self.p} of game {self.gameId} was rate limited {self.throttled} times")
+        if self.room is not None:
+            self.unsubscribe()
+            self.room.exit(self)
+        if self.token is not None:
+            self.lobby.hold(self.token, self)
+        elif self.gameId is not None and not self.spectator:
+            self.lobby.leave(self.gameId, self.p)
@@ -0,0 +1,178 @@
+import logging
+import os
+import sys
+import threading
+from collections import deque
+
+
+class QueueLogHandler(logging.Handler):
+    '''
+    Logging handler that only appends the record to a bounded in-memory
+    queue; a LogWriter thread formats and writes it later.
+
+    emit() never touches a file or stdout, so a stalled disk or a slow
+    `docker logs` reader cannot hold up the thread that logged. When the
+    queue already holds capacity records the new one is dropped and
+    counted rather than growing memory or blocking. flush() (which
+    logging.shutdown() calls) has the writer write out the queue.
+    '''
+    def __init__(self, capacity=10000):
+        super().__init__()
+        self.capacity = capacity
+        self.records = deque()
+        self.dropped = 0
+        self.writer = None
+
+    def handle(self, record):
+        # Handler.handle takes the handler's lock around emit(); deque.append is atomic already
+        if self.filter(record):
+            self.emit(record)
+        return record
+
+    def emit(self, record):
+        if len(self.records) >= self.capacity:
+            self.dropped += 1
+            return
+        self.records.append(record)
+
+    def flush(self):
+        if self.writer is not None:
+            self.writer.drain()
+
+
+class RotatingFile:
+    '''
+    Append-only log file that rolls over to path.1, path.2, ... when it
+    would grow past maxBytes (0 = never), keeping backups old files.
+
+    Several processes (see --workers) may share the path: before each write
+    the file is stat-ed, and reopened if another process rotated it away.
+    '''
+    def __init__(self, path, maxBytes=0, backups=3):
+        self.path = path
+        self.maxBytes = maxBytes
+        self.backups = backups
+        self.file = None
+        self._open()
+
+    def _open(self):
+        if self.file is not None:
+            self.file.close()
+        self.file = open(self.path, 'a', encoding='utf-8')
+        self.inode = os.fstat(self.file.fileno()).st_ino
+
+    def _rotate(self):
+        self.file.close()
+        self.file = None
+        for index in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def write(self, text):
+        try:
+            st = os.stat(self.path)
+            if self.file is None or st.st_ino != self.inode:
+                self._open()
+            elif self.maxBytes and st.st_size > 0 and st.st_size + len(text) > self.maxBytes:
+                self._rotate()
+        except FileNotFoundError:
+            self._open()
+        self.file.write(text)
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class LogWriter:
+    '''
+    Background thread that drains a QueueLogHandler every interval seconds
+    and writes each batch with one write and flush per output.
+
+    outputs are objects with write(text) (and optionally flush()), e.g. a
+    RotatingFile and sys.stdout. A record is at most interval seconds late;
+    stop() writes whatever is still queued. Threads do not survive fork(),
+    so forked workers start their own writer (see start()).
+    '''
+    def __init__(self, handler, outputs, formatter, interval=0.05, batch=1000):
+        self.handler = handler
+        self.outputs = outputs
+        self.formatter = formatter
+        self.interval = interval
+        self.batch = batch
+        self.batches = 0
+        self.written = 0
+        # Keeps batches in order when flush() drains from another thread
+        self.lock = threading.Lock()
+        handler.writer = self
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._afterFork)
+        return self
+
+    def _afterFork(self):
+        if self._stop.is_set():
+            return
+        # The parent's queued records were copied into the child too; the parent writes them
+        self.handler.records.clear()
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.drain()
+        self.drain()
+
+    def drain(self):
+        """Format and write everything queued so far, batch records per write."""
+        with self.lock:
+            self._drain(self.handler.records)
+
+    def _drain(self, records):
+        while records:
+            lines = []
+            while records and len(lines) < self.batch:
+                record = records.popleft()
+                try:
+                    lines.append(self.formatter.format(record) + "\n")
+                except Exception:
+                    self.handler.handleError(record)
+            text = "".join(lines)
+            for output in self.outputs:
+                try:
+                    output.write(text)
+                    if hasattr(output, 'flush'):
+                        output.flush()
+                except Exception as error:
+                    # Never let a bad output kill the writer thread; the next batch tries again
+                    sys.stderr.write(f"Log write failed: {error}\n")
+            self.batches += 1
+            self.written += len(lines)
+
+    def stats(self):
+        return {"written": self.written, "batches": self.batches, "queued": len(self.handler.records),
+                "dropped": self.handler.dropped}
+
+    def stop(self):
+        """Stop the thread after writing out whatever is queued."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        for output in self.outputs:
+            if isinstance(output, RotatingFile):
+                output.close()
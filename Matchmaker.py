@@ -0,0 +1,208 @@
+import threading
+import time
+from collections import deque
+
+# How many recent time-to-match samples stats() summarises
+MATCH_SAMPLES = 1000
+
+
+class Vacancy:
+    '''An open seat: seat p of game gameId, waiting since `since` for a player in `bucket`.'''
+    def __init__(self, gameId, p, bucket):
+        self.gameId = gameId
+        self.p = p
+        self.bucket = bucket
+        self.since = time.monotonic()
+
+
+class Ticket:
+    '''A player waiting in a batch; seat is set to (p, gameId) when the batch is paired.'''
+    def __init__(self, rating, bucket):
+        self.rating = rating
+        self.bucket = bucket
+        self.since = time.monotonic()
+        self.seat = None
+
+
+class Matchmaker:
+    '''
+    Decides which game and seat every arriving player gets.
+
+    The queue holds vacancies: open seats in games where one player is
+    already waiting. An arrival takes the oldest vacancy in its rating
+    bucket, or opens a new game (taking seat 0 and queueing seat 1). When
+    a player leaves a game whose opponent is still connected, their seat
+    goes back on the queue instead of the game being torn down.
+
+    Rating buckets (bucketWidth > 0) only pair players whose hello carried
+    a rating in the same band of bucketWidth points; a vacancy that has
+    waited longer than widenAfter seconds also accepts the neighbouring
+    bands. Players without a rating share bucket 0.
+
+    With batchSize > 1, arrivals are held until batchSize players are
+    waiting or the oldest has waited batchWindow seconds, then paired in
+    rating order. join() blocks meanwhile, so this suits agent swarms
+    rather than interactive clients. A leftover odd player goes through
+    the normal queue.
+
+    Seats stay assigned until leave(); gameIds are firstId, firstId +
+    idStride, ... so worker processes never hand out the same id.
+    '''
+    def __init__(self, bucketWidth=0, widenAfter=10.0, batchSize=1, batchWindow=1.0, firstId=0, idStride=1):
+        self.bucketWidth = bucketWidth
+        self.widenAfter = widenAfter
+        self.batchSize = batchSize
+        self.batchWindow = batchWindow
+        self.nextId = firstId
+        self.idStride = idStride
+        self.lock = threading.Lock()
+        self.batchReady = threading.Condition(self.lock)
+        # bucket -> deque of Vacancy, oldest first
+        self.vacancies = {}
+        self.pending = []
+        # gameId -> {seat: bucket} for every seat currently held by a player
+        self.seats = {}
+        self.matches = 0
+        self.requeued = 0
+        self.waits = deque(maxlen=MATCH_SAMPLES)
+
+    @property
+    def blocking(self):
+        """True if join() may block until a batch is paired."""
+        return self.batchSize > 1
+
+    def bucket(self, rating):
+        if not self.bucketWidth or rating is None:
+            return 0
+        return int(rating) // self.bucketWidth
+
+    def join(self, rating=None):
+        """Return (p, gameId) for a new player."""
+        bucket = self.bucket(rating)
+        if self.blocking:
+            return self._joinBatch(rating, bucket)
+        with self.lock:
+            return self._joinNow(bucket)
+
+    def leave(self, gameId, p):
+        """Release seat p of gameId. Returns True if the game is now empty and should be closed."""
+        with self.lock:
+            seats = self.seats.get(gameId)
+            if seats is None:
+                return True
+            seats.pop(p, None)
+            if not seats:
+                del self.seats[gameId]
+                self._cancel(gameId)
+                return True
+            # The opponent is still connected: offer the abandoned seat to the next arrival
+            remaining = next(iter(seats.values()))
+            self._enqueue(Vacancy(gameId, p, remaining))
+            self.requeued += 1
+            return False
+
+    def restore(self, gameIds):
+        """Offer both seats of games recovered after a restart, and never reuse their ids."""
+        with self.lock:
+            for gameId in gameIds:
+                self.seats[gameId] = {}
+                self._enqueue(Vacancy(gameId, 0, 0))
+                self._enqueue(Vacancy(gameId, 1, 0))
+                while self.nextId <= gameId:
+                    self.nextId += self.idStride
+
+    def forget(self, gameId):
+        """Drop a game closed from outside (e.g. evicted): its seats and any vacancies in it."""
+        with self.lock:
+            self.seats.pop(gameId, None)
+            self._cancel(gameId)
+
+    def queueDepth(self):
+        with self.lock:
+            return self._depth()
+
+    def stats(self):
+        """Queue depth, match counters and time-to-match percentiles (seconds) over recent matches."""
+        with self.lock:
+            waits = sorted(self.waits)
+            stats = {"queue_depth": self._depth(), "matches": self.matches, "requeued": self.requeued}
+        if waits:
+            stats.update(match_p50=waits[len(waits) // 2], match_p99=waits[min(len(waits) - 1, len(waits) * 99 // 100)],
+                         match_max=waits[-1], match_mean=sum(waits) / len(waits))
+        return stats
+
+    def _depth(self):
+        return sum(len(queue) for queue in self.vacancies.values()) + len(self.pending)
+
+    def _newGame(self):
+        gameId = self.nextId
+        self.nextId += self.idStride
+        self.seats[gameId] = {}
+        return gameId
+
+    def _take(self, gameId, p, bucket):
+        self.seats[gameId][p] = bucket
+        return p, gameId
+
+    def _matched(self, *since):
+        """Count one match and the time each of its waiting players spent in the queue."""
+        self.matches += 1
+        now = time.monotonic()
+        self.waits.extend(now - start for start in since)
+
+    def _enqueue(self, vacancy):
+        self.vacancies.setdefault(vacancy.bucket, deque()).append(vacancy)
+
+    def _cancel(self, gameId):
+        for queue in self.vacancies.values():
+            for vacancy in [v for v in queue if v.gameId == gameId]:
+                queue.remove(vacancy)
+
+    def _findVacancy(self, bucket):
+        queue = self.vacancies.get(bucket)
+        if queue:
+            return queue.popleft()
+        # Widen the search to neighbouring bands whose oldest vacancy has waited long enough
+        now = time.monotonic()
+        for other in (bucket - 1, bucket + 1):
+            queue = self.vacancies.get(other)
+            if queue and now - queue[0].since >= self.widenAfter:
+                return queue.popleft()
+        return None
+
+    def _joinNow(self, bucket):
+        vacancy = self._findVacancy(bucket)
+        if vacancy is not None:
+            self._matched(vacancy.since)
+            return self._take(vacancy.gameId, vacancy.p, bucket)
+        gameId = self._newGame()
+        self._enqueue(Vacancy(gameId, 1, bucket))
+        return self._take(gameId, 0, bucket)
+
+    def _joinBatch(self, rating, bucket):
+        ticket = Ticket(rating, bucket)
+        with self.batchReady:
+            self.pending.append(ticket)
+            if len(self.pending) >= self.batchSize:
+                self._flush()
+            while ticket.seat is None:
+                remaining = self.pending[0].since + self.batchWindow - time.monotonic()
+                if remaining <= 0:
+                    self._flush()
+                else:
+                    self.batchReady.wait(remaining)
+        return ticket.seat
+
+    def _flush(self):
+        """Pair every pending ticket in rating order; an odd one out joins the normal queue."""
+        # Unrated players sort after rated ones
+        tickets = sorted(self.pending, key=lambda ticket: (ticket.rating is None, ticket.rating or 0))
+        self.pending = []
+        for first, second in zip(tickets[0::2], tickets[1::2]):
+            gameId = self._newGame()
+            first.seat = self._take(gameId, 0, first.bucket)
+            second.seat = self._take(gameId, 1, second.bucket)
+            self._matched(first.since, second.since)
+        if len(tickets) % 2:
+            tickets[-1].seat = self._joinNow(tickets[-1].bucket)
+        self.batchReady.notify_all()
@@ -0,0 +1,145 @@
+import logging
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("GameServer")
+
+# Upper bounds (seconds) of the command latency histogram buckets
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+# Label values for commands; anything else is counted as "other" so a client can't grow the label set
+COMMANDS = frozenset(("hello", "get", "sync", "wait", "subscribe", "unsubscribe", "reset",
+                      "move", "discard", "deal", "start"))
+
+
+def command_name(command):
+    """Return the metrics label for a command: its action ("move:5 of Hearts:2" -> "move")."""
+    name = command.partition(':')[0]
+    return name if name in COMMANDS else "other"
+
+
+class Series:
+    '''Latency histogram plus frame counters for one command label.'''
+    __slots__ = ("counts", "sum", "replies", "bytes")
+
+    def __init__(self, buckets=len(LATENCY_BUCKETS)):
+        # counts[i] is the number of samples <= LATENCY_BUCKETS[i] and above the previous bound; the last slot is +Inf
+        self.counts = [0] * (buckets + 1)
+        self.sum = 0.0
+        self.replies = 0
+        self.bytes = 0
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+
+class Metrics:
+    '''
+    Counters and latency histograms for one server process.
+
+    Session.respond calls observe() for every command with the time it took
+    and the size of the framed reply; pushes are counted with sent(). Each
+    only bumps a few numbers under one lock, so the hot path stays cheap
+    (see benchmarks/bench_metrics.py).
+
+    Point-in-time values (active games, seats, threads, ...) are registered
+    with gauge() as callbacks and only evaluated when render() builds the
+    Prometheus text exposition for a scrape.
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        # command label -> Series
+        self.series = {}
+        # name -> (type, help, callback)
+        self.gauges = {}
+        self.gauge("cards_threads", "Live threads in the server process", threading.active_count)
+
+    def _series(self, kind):
+        with self.lock:
+            return self.series.setdefault(kind, Series())
+
+    def observe(self, command, seconds, size):
+        """Record one handled command: its label, handling time and reply size in bytes."""
+        series = self.series.get(command) or self._series(command)
+        index = bisect_left(LATENCY_BUCKETS, seconds)
+        # Plain acquire/release: this runs for every command and `with` costs measurably more
+        self.lock.acquire()
+        series.counts[index] += 1
+        series.sum += seconds
+        series.replies += 1
+        series.bytes += size
+        self.lock.release()
+
+    def sent(self, kind, size):
+        """Count a frame sent outside a request/reply, e.g. kind="push"."""
+        series = self.series.get(kind) or self._series(kind)
+        with self.lock:
+            series.replies += 1
+            series.bytes += size
+
+    def gauge(self, name, help, callback, kind="gauge"):
+        """Expose callback() as metric name on every scrape; kind="counter" for running totals."""
+        self.gauges[name] = (kind, help, callback)
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        with self.lock:
+            series = {kind: (list(one.counts), one.sum, one.replies, one.bytes) for kind, one in self.series.items()}
+
+        lines = ["# HELP cards_command_duration_seconds Time to handle one command and encode its reply",
+                 "# TYPE cards_command_duration_seconds histogram"]
+        for command, (counts, total, _, _) in sorted(series.items()):
+            if not any(counts):
+                # Pushes are only counted, not timed
+                continue
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f'cards_command_duration_seconds_bucket{{command="{command}",le="{bound}"}} {cumulative}')
+            lines.append(f'cards_command_duration_seconds_sum{{command="{command}"}} {total}')
+            lines.append(f'cards_command_duration_seconds_count{{command="{command}"}} {cumulative}')
+
+        lines += ["# HELP cards_replies_total Frames sent, by command (push = unrequested updates)",
+                  "# TYPE cards_replies_total counter"]
+        lines += [f'cards_replies_total{{command="{kind}"}} {one[2]}' for kind, one in sorted(series.items())]
+        lines += ["# HELP cards_reply_bytes_total Bytes sent in frames, by command",
+                  "# TYPE cards_reply_bytes_total counter"]
+        lines += [f'cards_reply_bytes_total{{command="{kind}"}} {one[3]}' for kind, one in sorted(series.items())]
+
+        for name, (kind, help, callback) in sorted(self.gauges.items()):
+            try:
+                value = callback()
+            except Exception as error:
+                logger.warning(f"Metric {name} failed: {error}")
+                continue
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would drown the game log
+        pass
+
+
+def serve_metrics(host, port, metrics):
+    """Serve metrics.render() at http://host:port/metrics from a daemon thread; returns the HTTP server."""
+    httpd = ThreadingHTTPServer((host, port), _MetricsHandler)
+    httpd.daemon_threads = True
+    httpd.metrics = metrics
+    threading.Thread(target=httpd.serve_forever, name="metrics", daemon=True).start()
+    logger.info(f"Metrics at http://{host}:{httpd.server_address[1]}/metrics")
+    return httpd
@@ -1,21 +1,61 @@
 import socket
-import pickle
 import logging
 import time
+from collections import deque
+
+from Game import Board, BoardDelta
+from Protocol import FLAG_PUSH, FrameDecoder, ProtocolError, decode_reply, make_hello, pack_frame, parse_greeting
 
 # Configure logger
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("Network")
 
+
+class NewGame(ConnectionError):
+    """
+    The connection dropped and the server no longer held our seat, so it seated us in a new game.
+
+    playerId is the seat we have now (getId() returns it too) and board the
+    new game's board; anything remembered about the old game is stale.
+    """
+    def __init__(self, playerId, board):
+        super().__init__(f"could not resume; seated as player {playerId} in a new game")
+        self.playerId = playerId
+        self.board = board
+
+
 class Network:
-    def __init__(self, max_retries=5, retry_delay=2):
-        self.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server = "127.0.0.1"  # inside
+    def __init__(self, max_retries=5, retry_delay=2, server="127.0.0.1", port=5550, wire_format="binary", rating=None,
+                 spectate=None, compress=False):
+        self.server = server  # "127.0.0.1" inside
         #self.server = "136.62.155.123" #outside 
-        self.port = 5550
-        self.addr = (self.server, self.port)
+        self.port = port
+        if server.startswith("unix:"):
+            # A server on this host started with --unix PATH: skips the loopback TCP stack
+            self.family, self.addr = socket.AF_UNIX, server[len("unix:"):]
+            self.where = server
+        else:
+            self.family, self.addr = socket.AF_INET, (self.server, self.port)
+            self.where = f"{self.server}:{self.port}"
+        self.client = socket.socket(self.family, socket.SOCK_STREAM)
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        # Last board received from the server; sync() keeps it current with deltas
+        self.board = None
+        # Reply format we ask for in the hello; the server's greeting says what it accepted
+        self.options = {"format": wire_format}
+        if rating is not None:
+            # Lets a server running with --rating-bucket pair us with players of similar strength
+            self.options["rating"] = str(rating)
+        if spectate is not None:
+            # Watch game `spectate` read-only instead of taking a seat; every board is its public view
+            self.options["spectate"] = str(spectate)
+        if compress:
+            # Worth it over slow or metered links; on the same host it only costs CPU on both ends
+            self.options["compress"] = "zlib"
+        # Resume token from the server's greeting: reconnecting with it gets our seat back after a drop
+        self.token = None
+        self.subscribed = False
         self.playerId = self.connect()
 
     def getId(self):
@@ -25,10 +65,19 @@ class Network:
         retries = 0
         while retries < self.max_retries:
             try:
-                self.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)  # Reset socket
+                self.client = socket.socket(self.family, socket.SOCK_STREAM)  # Reset socket
+                self.decoder = FrameDecoder()
+                self.pending = deque()
                 self.client.connect(self.addr)
-                logger.info(f"Connected to server {self.server}:{self.port}")
-                return self.client.recv(2048).decode()
+                logger.info(f"Connected to server {self.where}")
+                hello = dict(self.options)
+                if self.token is not None:
+                    hello["resume"] = self.token
+                self.client.sendall(pack_frame(make_hello(hello)))
+                playerId, accepted = parse_greeting(self.receive().decode())
+                self.token = accepted.pop("token", None)
+                self.options.update(accepted)
+                return playerId
             except Exception as e:
                 retries += 1
                 logger.warning(f"Connection attempt {retries}/{self.max_retries} failed. Retrying in {self.retry_delay} seconds...")
@@ -37,17 +86,145 @@ class Network:
         logger.error("Max retries reached. Failed to connect to server.")
         return None
 
+    def receive(self):
+        """Block until the next complete frame arrives and return its payload."""
+        return self._receiveFrame()[1]
+
+    def _receiveFrame(self):
+        while not self.pending:
+            data = self.client.recv(65536)
+            if not data:
+                raise ConnectionError("server closed the connection")
+            self.pending.extend(self.decoder.feed(data))
+        return self.pending.popleft()
+
     def send(self, data):
-        # Send all data in one go
-        self.client.sendall(str.encode(data))
-        # Receive full response before unpickling
-        response = self.client.recv(4096*2)
-        if response:
-        # Deserialize the complete data only once
+        """Send one command and return the resulting board.
+
+        If the connection has dropped, reconnects with the resume token and
+        returns the current board instead: check it to see whether a move
+        went through before sending it again. Raises NewGame if the seat
+        was not held for us.
+        """
+        try:
+            self.client.sendall(pack_frame(data))
+        except OSError as e:
+            return self._resume(e)
+        return self._readState(resume=True)
+
+    def send_many(self, commands):
+        """Pipeline several commands in a single write and return their replies in order."""
+        self.client.sendall(b"".join(pack_frame(command) for command in commands))
+        return [self._readState() for _ in commands]
+
+    def _readState(self, resume=False):
+        """Read up to the next reply, applying any pushes that arrive ahead of it."""
+        while True:
+            try:
+                flags, payload = self._receiveFrame()
+                response = decode_reply(payload, self.options.get("format"))
+            except OSError as e:
+                if resume:
+                    return self._resume(e)
+                logger.error(f"Failed to receive data: {e}")
+                return None
+            except ProtocolError as e:
+                logger.error(f"Failed to receive data: {e}")
+                return None
+            except Exception as e:
+                logger.error(f"Failed to decode data: {e}")
+                return None
+
+            if flags & FLAG_PUSH:
+                self._apply(response)
+                continue
+
+            board = self._apply(response)
+            if board is None and isinstance(response, BoardDelta):
+                # Only safe to ask again when no pipelined replies are still queued ahead of it
+                return self.send("get") if not self.pending else None
+            return board
+
+    def _apply(self, response):
+        """Fold a Board or BoardDelta into self.board and return the result."""
+        if isinstance(response, BoardDelta):
             try:
-                response = pickle.loads(response)
-                return response
-            except (pickle.UnpicklingError, EOFError) as e:
-                logger.error(f"Failed to unpickle data: {e}")
+                self.board.apply_delta(response)
+            except (AttributeError, ValueError) as e:
+                logger.warning(f"Could not apply delta ({e}); requesting a full board")
+                self.board = None
                 return None
+            return self.board
+
+        if isinstance(response, Board):
+            self.board = response
+        return response
+
+    def sync(self):
+        """Return the current board, transferring only what changed since the last reply."""
+        return self.send(f"sync:{self._version()}:")
+
+    def subscribe(self):
+        """Ask the server to push every change from now on; returns the current board."""
+        self.subscribed = True
+        return self.send(f"subscribe:{self._version()}:")
+
+    def wait(self, timeout=10.0):
+        """Long-poll: return the board once it changes from ours, or after timeout seconds."""
+        return self.send(f"wait:{self._version()}:{timeout}")
+
+    def poll(self):
+        """Apply whatever pushes have arrived without blocking and return the current board."""
+        self.client.setblocking(False)
+        try:
+            while True:
+                data = self.client.recv(65536)
+                if not data:
+                    raise ConnectionError("server closed the connection")
+                self.pending.extend(self.decoder.feed(data))
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError as e:
+            return self._resume(e)
+        finally:
+            self.client.setblocking(True)
+        while self.pending:
+            flags, payload = self.pending.popleft()
+            self._apply(decode_reply(payload, self.options.get("format")))
+        return self.board
+
+    def _resume(self, error):
+        """
+        The connection dropped: reconnect, taking our seat back if the server still holds it.
+
+        Returns the current board, or raises NewGame when the server seated
+        us in a new game instead, maybe in the other seat.
+        """
+        if self.token is None:
+            logger.error(f"Connection lost: {error}")
+            return None
+        logger.warning(f"Connection lost ({error}); reconnecting to resume the game")
+        token = self.token
+        self.client.close()
+        self.playerId = self.connect()
+        if self.playerId is None:
+            return None
+        resumed = self.token == token
+        if not resumed:
+            # The seat was given up: this is a new game, so versions of the old board mean nothing
+            logger.warning(f"Could not resume; seated as player {self.playerId} in a new game")
+            self.board = None
+        # Only what changed while we were away is sent (no resume here, so a second drop can't loop)
+        command = "subscribe" if self.subscribed else "sync"
+        try:
+            self.client.sendall(pack_frame(f"{command}:{self._version()}:"))
+        except OSError as e:
+            logger.error(f"Failed to resync after reconnecting: {e}")
+            return None
+        board = self._readState()
+        if not resumed:
+            raise NewGame(self.playerId, board)
+        return board
 
+    def _version(self):
+        return self.board.version if self.board is not None else -1
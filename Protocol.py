@@ -0,0 +1,256 @@
+'''
+Wire protocol helpers shared by Network (client) and the servers.
+
+Handshake: the client speaks first with "hello:<options>:" where options is
+a comma separated list of key=value pairs, e.g. "hello:format=binary:".
+The server answers with "<playerId>:<accepted options>", e.g.
+"0:format=binary". Every later reply is a state encoded in the negotiated
+format: "pickle" (a pickled Board/BoardDelta) or "binary" (Game.encode_state).
+When the server holds seats for reconnects the greeting also carries
+"token=<resume token>", and a later "hello:...,resume=<token>:" takes the
+same seat back (see Lobby.resume). A client asking for "compress=zlib" gets
+it echoed back if the server will compress its replies (see Compressor).
+
+Framing: every message in both directions is a frame - a FRAME_HEADER
+(uint32 payload length, uint8 flags) followed by the payload. Flag bit 0
+(FLAG_PUSH) marks a state the server pushed to a subscribed client rather
+than a reply to one of its requests; bit 1 (FLAG_COMPRESSED) marks a
+zlib-compressed payload; other bits are reserved. FrameDecoder reassembles frames from
+whatever chunks recv() returns, so several requests can be pipelined in
+one write and large replies can span many TCP segments.
+'''
+import errno
+import pickle
+import os
+import socket
+import stat
+import struct
+import threading
+import time
+import zlib
+
+from Game import encode_state, decode_state
+
+FORMATS = ("pickle", "binary")
+DEFAULT_FORMAT = "pickle"
+
+FRAME_HEADER = struct.Struct(">IB")
+# Largest payload either side will accept; a full pickled Board is ~4 KB
+MAX_FRAME = 1 << 20
+
+# Frame flag bits
+FLAG_PUSH = 1
+FLAG_COMPRESSED = 2
+
+# Payload codecs a client may ask for with "compress=<name>"
+COMPRESSIONS = ("zlib",)
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def pack_frame(payload, flags=0):
+    """Prefix payload (bytes or str) with its frame header."""
+    if isinstance(payload, str):
+        payload = payload.encode()
+    return FRAME_HEADER.pack(len(payload), flags) + payload
+
+
+class FrameDecoder:
+    '''
+    Incremental frame decoder.
+
+    feed() takes the next chunk from the socket and returns a list of
+    (flags, payload) for every frame completed so far; partial frames are
+    kept until the rest arrives. Compressed payloads come back already
+    decompressed (FLAG_COMPRESSED stays set, for whoever counts bytes).
+    '''
+    def __init__(self, max_frame=MAX_FRAME):
+        self.max_frame = max_frame
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        self.buffer += data
+        frames = []
+        offset = 0
+        while len(self.buffer) - offset >= FRAME_HEADER.size:
+            length, flags = FRAME_HEADER.unpack_from(self.buffer, offset)
+            if length > self.max_frame:
+                raise ProtocolError(f"frame of {length} bytes exceeds limit of {self.max_frame}")
+            end = offset + FRAME_HEADER.size + length
+            if end > len(self.buffer):
+                break
+            payload = bytes(self.buffer[offset + FRAME_HEADER.size:end])
+            if flags & FLAG_COMPRESSED:
+                payload = self._decompress(payload)
+            frames.append((flags, payload))
+            offset = end
+        del self.buffer[:offset]
+        return frames
+
+    def _decompress(self, payload):
+        inflater = zlib.decompressobj()
+        try:
+            data = inflater.decompress(payload, self.max_frame)
+        except zlib.error as error:
+            raise ProtocolError(f"bad compressed frame: {error}")
+        # The same limit as for plain frames, so a small frame can't inflate into a huge one
+        if inflater.unconsumed_tail:
+            raise ProtocolError(f"compressed frame inflates past limit of {self.max_frame}")
+        return data
+
+
+class Compressor:
+    '''
+    zlib compression of the replies to clients that asked for it.
+
+    pack() frames a payload like pack_frame, compressed at level when it
+    is at least minSize bytes and compression actually makes it smaller;
+    small replies (most deltas) go out as they are, since compressing them
+    costs more CPU than the bytes are worth. Level 1 is the fastest zlib
+    has; higher levels save a few percent more for a lot more CPU.
+
+    stats() reports bytes saved against CPU time spent, to decide per
+    deployment whether it pays: it does for remote players on slow links,
+    not for agents on the same host.
+    '''
+    def __init__(self, level=1, minSize=256):
+        self.level = level
+        self.minSize = minSize
+        self.lock = threading.Lock()
+        self.compressed = 0
+        self.skipped = 0
+        self.bytesIn = 0
+        self.bytesOut = 0
+        self.seconds = 0.0
+
+    def pack(self, payload, flags=0):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        if len(payload) < self.minSize:
+            with self.lock:
+                self.skipped += 1
+            return pack_frame(payload, flags)
+        start = time.perf_counter()
+        packed = zlib.compress(payload, self.level)
+        elapsed = time.perf_counter() - start
+        smaller = len(packed) < len(payload)
+        with self.lock:
+            self.compressed += 1
+            self.bytesIn += len(payload)
+            self.bytesOut += len(packed) if smaller else len(payload)
+            self.seconds += elapsed
+        if not smaller:
+            return pack_frame(payload, flags)
+        return pack_frame(packed, flags | FLAG_COMPRESSED)
+
+    def stats(self):
+        with self.lock:
+            perReply = self.seconds / self.compressed if self.compressed else 0.0
+            return {"compressed": self.compressed, "skipped": self.skipped, "bytes_in": self.bytesIn,
+                    "bytes_saved": self.bytesIn - self.bytesOut, "cpu_seconds": round(self.seconds, 3),
+                    "us_per_reply": round(perReply * 1e6, 1)}
+
+
+def format_options(options):
+    return ",".join(f"{key}={value}" for key, value in options.items())
+
+
+def parse_options(text):
+    return dict(item.split("=", 1) for item in text.split(",") if "=" in item)
+
+
+def make_hello(options):
+    return f"hello:{format_options(options)}:"
+
+
+def parse_hello(data):
+    """Return the options requested by a hello message, or None if data isn't a hello."""
+    if not data.startswith("hello:"):
+        return None
+    return parse_options(data.split(":")[1])
+
+
+def negotiate(requested, compression=True):
+    """Pick the options the server will use for a client that asked for `requested`.
+
+    compression=False declines any "compress" request, leaving it out of
+    the accepted options.
+    """
+    wire_format = requested.get("format")
+    accepted = {"format": wire_format if wire_format in FORMATS else DEFAULT_FORMAT}
+    if compression and requested.get("compress") in COMPRESSIONS:
+        accepted["compress"] = requested["compress"]
+    return accepted
+
+
+def make_greeting(playerId, accepted):
+    return f"{playerId}:{format_options(accepted)}"
+
+
+def parse_greeting(text):
+    """Split a greeting into (playerId, accepted options)."""
+    playerId, _, options = text.partition(":")
+    return playerId, parse_options(options)
+
+
+def encode_reply(state, wire_format):
+    """Encode a Board or BoardDelta in the negotiated format."""
+    if wire_format == "binary":
+        return encode_state(state)
+    return pickle.dumps(state)
+
+
+def decode_reply(data, wire_format):
+    if wire_format == "binary":
+        return decode_state(data)
+    return pickle.loads(data)
+
+
+# TCP keepalive for server sockets: probe after a minute of silence, give up after ~2 more
+KEEPALIVE = (("TCP_KEEPIDLE", 60), ("TCP_KEEPINTVL", 20), ("TCP_KEEPCNT", 6))
+
+
+def unix_listener(path, backlog):
+    '''
+    Return a socket listening on the Unix domain socket path, replacing a stale one left by a previous run.
+
+    A socket file is only stale if connecting to it is refused: if a server
+    is still listening there, this raises OSError(EADDRINUSE) instead of
+    taking the path over.
+    '''
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except FileNotFoundError:
+        pass
+    except ConnectionRefusedError:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+    except OSError as e:
+        # Anything else (a full backlog, no permission) may well be a live server
+        raise OSError(errno.EADDRINUSE, f"address in use ({e.strerror})", path)
+    else:
+        raise OSError(errno.EADDRINUSE, "address in use", path)
+    finally:
+        probe.close()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.bind(path)
+        sock.listen(backlog)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def enable_keepalive(sock):
+    """Let the kernel notice half-open connections (peer gone without a FIN) so their reads fail."""
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        for name, value in KEEPALIVE:
+            if hasattr(socket, name):
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, name), value)
+    except OSError:
+        pass
@@ -0,0 +1,84 @@
+import threading
+import time
+
+# Commands that change the board; everything else a seated player sends is a read
+MUTATIONS = frozenset(("move", "discard", "deal", "start", "reset"))
+
+READ, MUTATION = 0, 1
+
+
+class TokenBucket:
+    '''
+    rate tokens per second, holding at most burst of them.
+
+    reserve() always takes a token, letting the balance go negative, and
+    returns how long the caller should wait for the token it took. Callers
+    that wait before taking the next one are held to exactly rate.
+    '''
+    __slots__ = ("rate", "burst", "tokens", "stamp")
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = now
+
+    def reserve(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        self.tokens -= 1
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class RateLimiter:
+    '''
+    Token-bucket limits on the commands each connection and each game may send.
+
+    Reads (get, sync, wait, subscribe, ...) and mutations (move, discard,
+    deal, start, reset) have separate budgets, so a client polling too fast
+    cannot use up its own moves. Each connection has a pair of buckets (see
+    Session.throttle), and so does each game for the commands of all its
+    connections together. A rate of 0 leaves that budget unlimited. Buckets
+    hold burst seconds' worth of tokens, and at least one.
+
+    A command over budget is not refused. The server holds it back for
+    the delay throttle() returns before answering it, so a flooding client
+    is slowed to its budget and only its own connection waits.
+    '''
+    def __init__(self, readRate=0.0, mutationRate=0.0, gameReadRate=0.0, gameMutationRate=0.0, burst=1.0):
+        self.connectionRates = (readRate, mutationRate)
+        self.gameRates = (gameReadRate, gameMutationRate)
+        self.burst = burst
+        self.lock = threading.Lock()
+        # Commands held back, and the seconds they were held, by READ/MUTATION
+        self.limited = [0, 0]
+        self.delayed = [0.0, 0.0]
+
+    def buckets(self, rates, now):
+        return [TokenBucket(rate, max(1.0, rate * self.burst), now) if rate > 0 else None for rate in rates]
+
+    def throttle(self, session, room, command):
+        """Take a token for command from the session's and room's buckets; return the seconds to hold it back."""
+        kind = MUTATION if command.partition(':')[0] in MUTATIONS else READ
+        now = time.monotonic()
+        if session.buckets is None:
+            session.buckets = self.buckets(self.connectionRates, now)
+        bucket = session.buckets[kind]
+        delay = bucket.reserve(now) if bucket is not None else 0.0
+        # Spectators only count against their own connection, or an audience could starve the players
+        if self.gameRates[kind] > 0 and not session.spectator:
+            with room.lock:
+                if room.buckets is None:
+                    room.buckets = self.buckets(self.gameRates, now)
+                delay = max(delay, room.buckets[kind].reserve(now))
+        if delay > 0:
+            session.throttled += 1
+            with self.lock:
+                self.limited[kind] += 1
+                self.delayed[kind] += delay
+        return delay
+
+    def stats(self):
+        with self.lock:
+            return {"limited_reads": self.limited[READ], "limited_mutations": self.limited[MUTATION],
+                    "delay_seconds": round(sum(self.delayed), 3)}
@@ -0,0 +1,158 @@
+import logging
+import math
+import sys
+import threading
+import time
+
+logger = logging.getLogger("GameServer")
+
+
+class TimerWheel:
+    '''
+    Hashed timing wheel: schedule(key, deadline) is O(1) and advance(now)
+    only looks at the slots for the ticks that have passed.
+
+    Deadlines further out than one turn of the wheel wait in their slot
+    until the turn they are due in.
+    '''
+    def __init__(self, tick=1.0, slots=512, now=None):
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        self.origin = time.monotonic() if now is None else now
+        # Index of the next tick advance() will process
+        self.current = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        with self.lock:
+            return sum(len(slot) for slot in self.slots)
+
+    def schedule(self, key, deadline):
+        at = math.ceil((deadline - self.origin) / self.tick)
+        with self.lock:
+            index = max(self.current, at)
+            self.slots[index % len(self.slots)].append((index, key))
+
+    def advance(self, now):
+        """Return the keys whose deadlines have passed by now."""
+        last = math.floor((now - self.origin) / self.tick)
+        expired = []
+        with self.lock:
+            # Past one full turn every slot gets visited anyway
+            for index in range(self.current, min(last, self.current + len(self.slots) - 1) + 1):
+                slot = self.slots[index % len(self.slots)]
+                due = [key for at, key in slot if at <= last]
+                if due:
+                    slot[:] = [(at, key) for at, key in slot if at > last]
+                    expired += due
+            self.current = max(self.current, last + 1)
+        return expired
+
+
+def board_size(board):
+    """Rough bytes held by a Board: itself, its players and deck, and its piles."""
+    size = sys.getsizeof(board) + sys.getsizeof(board.playerOne) + sys.getsizeof(board.playerTwo) + sys.getsizeof(board.deck)
+    for pile in board.piles():
+        size += sys.getsizeof(pile)
+    return size
+
+
+class Reaper:
+    '''
+    Evicts games nobody is playing any more, so a long-running server's
+    memory stays flat.
+
+    A game is evicted once no command has touched it for idleTimeout
+    seconds (abandoned games, players who walked away, recovered games
+    nobody reclaimed), or finishedTimeout seconds after its last command
+    if it has a winner and nobody started a new game. Evicting a game
+    disconnects whoever is still seated in it (see Lobby.evict).
+
+    Every game is on a TimerWheel once. Commands only store the room's
+    lastActive time; when a game's slot comes up the reaper checks the real
+    deadline and reschedules it if it was touched since, so the hot path
+    never touches the wheel.
+
+    Each pass also frees the seats of dropped players whose resume grace
+    has run out (see Lobby.expireSeats).
+    '''
+    def __init__(self, lobby, idleTimeout=900.0, finishedTimeout=300.0, tick=1.0):
+        self.lobby = lobby
+        self.idleTimeout = idleTimeout
+        self.finishedTimeout = finishedTimeout
+        self.tick = tick
+        self.wheel = TimerWheel(tick)
+        self.evicted = {"idle": 0, "finished": 0}
+        self.reclaimed = 0
+        self._stop = threading.Event()
+        for room in lobby.games.rooms():
+            self.track(room)
+        if lobby.metrics is not None:
+            lobby.metrics.gauge("cards_reaper_evicted_idle_total", "Games evicted after idleTimeout without a command",
+                                lambda: self.evicted["idle"], kind="counter")
+            lobby.metrics.gauge("cards_reaper_evicted_finished_total", "Finished games evicted after finishedTimeout",
+                                lambda: self.evicted["finished"], kind="counter")
+            lobby.metrics.gauge("cards_reaper_reclaimed_bytes_total", "Estimated bytes of boards freed by the reaper",
+                                lambda: self.reclaimed, kind="counter")
+
+    def _timeouts(self):
+        return [t for t in (self.idleTimeout, self.finishedTimeout) if t > 0]
+
+    def track(self, room):
+        """Put a new room on the wheel."""
+        timeouts = self._timeouts()
+        if timeouts:
+            self.wheel.schedule(room.board.id, room.lastActive + min(timeouts))
+
+    def expiry(self, room, now):
+        """Return (deadline, reason) for room: when it should go and why, or (when to look again, None)."""
+        deadline, reason = math.inf, None
+        if self.idleTimeout > 0:
+            deadline, reason = room.lastActive + self.idleTimeout, "idle"
+        if self.finishedTimeout > 0:
+            if room.board.winner is not None:
+                finished = room.lastActive + self.finishedTimeout
+                if finished < deadline:
+                    deadline, reason = finished, "finished"
+            elif reason is None:
+                # No idle limit: look again once it could have been finished for long enough
+                deadline = now + self.finishedTimeout
+        return deadline, reason
+
+    def reap(self, now=None):
+        """Evict every game past its deadline; returns how many were evicted."""
+        now = time.monotonic() if now is None else now
+        self.lobby.expireSeats(now)
+        count = 0
+        for gameId in self.wheel.advance(now):
+            room = self.lobby.games.get(gameId)
+            if room is None:
+                continue
+            deadline, reason = self.expiry(room, now)
+            if reason is None or deadline > now:
+                self.wheel.schedule(gameId, deadline)
+                continue
+            size = board_size(room.board)
+            if self.lobby.evict(gameId, reason):
+                self.evicted[reason] += 1
+                self.reclaimed += size
+                count += 1
+        return count
+
+    def stats(self):
+        return {"tracked": len(self.wheel), "evicted_idle": self.evicted["idle"],
+                "evicted_finished": self.evicted["finished"], "reclaimed_bytes": self.reclaimed}
+
+    def start(self):
+        threading.Thread(target=self._run, name="reaper", daemon=True).start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.tick):
+            try:
+                self.reap()
+            except Exception as error:
+                logger.error(f"Reaper error: {error}")
+
+    def stop(self):
+        self._stop.set()
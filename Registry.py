@@ -0,0 +1,56 @@
+import threading
+
+# Shards in a GameRegistry; a power of two so gameId % SHARDS is cheap and even
+SHARDS = 16
+
+
+class GameRegistry:
+    '''
+    Thread-safe gameId -> room mapping split into independently locked shards.
+
+    Lookups, inserts and removals only lock the shard that owns gameId, so
+    players in different games never wait on each other's bookkeeping. The
+    rooms themselves carry their own lock for the state inside them.
+    '''
+    def __init__(self, shards=SHARDS):
+        self.shards = [{} for _ in range(shards)]
+        self.locks = [threading.Lock() for _ in range(shards)]
+
+    def _shard(self, gameId):
+        index = gameId % len(self.shards)
+        return self.shards[index], self.locks[index]
+
+    def get(self, gameId, default=None):
+        shard, lock = self._shard(gameId)
+        with lock:
+            return shard.get(gameId, default)
+
+    def setdefault(self, gameId, factory):
+        """Return the room for gameId, creating it with factory() if there isn't one yet."""
+        shard, lock = self._shard(gameId)
+        with lock:
+            room = shard.get(gameId)
+            if room is None:
+                room = shard[gameId] = factory()
+            return room
+
+    def pop(self, gameId, default=None):
+        shard, lock = self._shard(gameId)
+        with lock:
+            return shard.pop(gameId, default)
+
+    def __contains__(self, gameId):
+        shard, lock = self._shard(gameId)
+        with lock:
+            return gameId in shard
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    def rooms(self):
+        """Snapshot of every live room, shard by shard."""
+        rooms = []
+        for shard, lock in zip(self.shards, self.locks):
+            with lock:
+                rooms.extend(shard.values())
+        return rooms
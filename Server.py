@@ -1,13 +1,26 @@
+import argparse
 import socket
 import logging
 import os
-from _thread import *
+import select
 import threading
-import pickle
-from Game import *
+import time
+from _thread import *
 import sys
 
-# Configure logger to write to both server.log and stdout so Docker logs capture output
+from Journal import Journal
+from LogWriter import LogWriter, QueueLogHandler, RotatingFile
+from Lobby import Lobby, Session
+from Matchmaker import Matchmaker
+from Metrics import Metrics, serve_metrics
+from Protocol import Compressor, enable_keepalive, unix_listener
+from RateLimit import RateLimiter
+from Reaper import Reaper
+from Workers import Dispatcher, fork_workers, worker_loop
+
+# Configure logger to write to both server.log and stdout so Docker logs capture output.
+# Records are queued in memory and written in batches by a background thread (see LogWriter),
+# so a slow disk or stdout reader never adds to request latency.
 logger = logging.getLogger("GameServer")
 logger.setLevel(logging.INFO)
 formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
@@ -52,44 +65,45 @@ def _diagnose_path_issue(path: str) -> str:
         except Exception as e:
             return f"unable to determine owner or parent directory missing: {e}"
 
-file_handler = None
+# Size at which LOG_PATH rolls over to LOG_PATH.1 (--log-max-bytes), and how many old files to keep
+log_max_bytes = 50 * 1024 * 1024
+log_backups = 3
+
+log_file = None
 if _can_write_to_path(logfile):
     try:
-        file_handler = logging.FileHandler(logfile)
+        log_file = RotatingFile(logfile, log_max_bytes, log_backups)
     except Exception as e:
         # Unexpected error while creating handler; fall back
         fallback_log = '/tmp/server.log'
         logger.warning(f"Warning: cannot open {logfile} for writing ({e}); falling back to {fallback_log}")
         if _can_write_to_path(fallback_log):
             try:
-                file_handler = logging.FileHandler(fallback_log)
+                log_file = RotatingFile(fallback_log, log_max_bytes, log_backups)
             except Exception:
-                file_handler = None
+                log_file = None
         else:
-            file_handler = None
+            log_file = None
 else:
     fallback_log = '/tmp/server.log'
     diagnosis = _diagnose_path_issue(logfile)
     logger.warning(f"Warning: LOG_PATH '{logfile}' is not writable ({diagnosis}); falling back to {fallback_log}")
     if _can_write_to_path(fallback_log):
         try:
-            file_handler = logging.FileHandler(fallback_log)
+            log_file = RotatingFile(fallback_log, log_max_bytes, log_backups)
         except Exception:
-            file_handler = None
+            log_file = None
     else:
-        file_handler = None
+        log_file = None
 
-stream_handler = logging.StreamHandler(sys.stdout)
-stream_handler.setFormatter(formatter)
-if file_handler:
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-logger.addHandler(stream_handler)
+queue_handler = QueueLogHandler()
+logger.addHandler(queue_handler)
+log_writer = LogWriter(queue_handler, [log_file, sys.stdout] if log_file else [sys.stdout], formatter).start()
 
 # Record which logfile we are actually using for later user-facing messages
-if file_handler:
+if log_file:
     try:
-        used_logfile = getattr(file_handler, 'baseFilename', None)
+        used_logfile = log_file.path
     except Exception:
         used_logfile = None
 else:
@@ -107,96 +121,386 @@ else:
 
 server = '0.0.0.0'
 port = 5550
+# Pending connections the kernel will queue for accept(); large enough for bursts of agents
+backlog = 128
 
-s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-# Allow immediate reuse of the address after restart; prevents "address already in use" errors
-s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+lobby = Lobby()
 
-try:
-    s.bind((server, port))
-except socket.error as e:
-    logger.error(f"Socket binding error: {e}")
-    sys.exit()
+def wait_for_change(session, version, timeout):
+    """Block a "wait:" long-poll until the board moves past version or timeout runs out."""
+    changed = threading.Event()
+    wake = lambda origin: changed.set()
+    room = session.room
+    room.watch(wake)
+    deadline = time.monotonic() + timeout
+    try:
+        # A notify can be for a change we already have, so re-check until the deadline
+        while not session.changedSince(version):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            changed.wait(remaining)
+            changed.clear()
+    finally:
+        room.unwatch(wake)
 
-# Listen for incoming connections; missing listen() causes accept() to fail with EINVAL/Invalid argument
-s.listen(5)
-logger.info("Waiting for a connection, Server Started")
+def kick(conn):
+    """Wake the thread blocked in conn.recv() so it sees EOF and closes the session."""
+    try:
+        conn.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+# Longest a spectator push that only partly fitted in the socket buffer may take to finish
+PARTIAL_PUSH_TIMEOUT = 1.0
 
-connected = set()
-games = {}
-idCount = 0
-games_lock = threading.Lock()
+def writable(conn, timeout):
+    # poll() rather than select(): spectators push the descriptor numbers well past FD_SETSIZE
+    poller = select.poll()
+    poller.register(conn, select.POLLOUT)
+    return bool(poller.poll(timeout * 1000))
 
-def threaded_client(conn, p, gameId):
-    global idCount
-    conn.send(str.encode(str(p)))
+def offer(conn, frame):
+    """Spectator push (see Spectators.Broadcaster): False if the socket buffer is full right now."""
+    if not writable(conn, 0):
+        return False
+    view = memoryview(frame)
+    view = view[conn.send(view, socket.MSG_DONTWAIT):]
+    # Half a frame would corrupt the stream, so a partial write is finished or the spectator dropped
+    deadline = time.monotonic() + PARTIAL_PUSH_TIMEOUT
+    while view:
+        if not writable(conn, max(0.0, deadline - time.monotonic())):
+            raise TimeoutError("spectator stopped reading mid-frame")
+        view = view[conn.send(view, socket.MSG_DONTWAIT):]
+    return True
 
-    logger.info(f"Player {p} connected to game {gameId}")
+def threaded_client(conn, addr, session=None):
+    # Workers pass in a session whose hello they have already answered
+    if session is None:
+        session = Session(lobby)
+    # Pushes to a subscribed client are written from whichever thread changed the game
+    session.push = conn.sendall
+    session.kick = lambda: kick(conn)
+    session.offer = lambda frame: offer(conn, frame)
+    if session.lobby.readTimeout:
+        conn.settimeout(session.lobby.readTimeout)
 
     while True:
         try:
-            data = conn.recv(4096).decode()
-
-            if gameId in games:
-                board = games[gameId]
-
-                if not data:
-                    break
-                else:
-                    if data == "reset":
-                        board.reset()
-                        logger.info(f"Game {gameId} reset by Player {p}")
-                    elif data != "get":
-                        board.play(data, p)
-                        logger.info(f"Game {gameId}: Player {p} played {data}")
-
-                    conn.sendall(pickle.dumps(board))
-            else:
+            try:
+                data = conn.recv(65536)
+            except socket.timeout:
+                logger.info(f"Closing connection silent for {session.lobby.readTimeout}s")
+                break
+
+            if not data:
+                break
+
+            # A single recv may complete several pipelined frames; answer them with one send.
+            # sendLock is held until the replies are written so a push can't overtake them.
+            replies = []
+            closing = False
+            session.sendLock.acquire()
+            try:
+                for command in session.receive(data):
+                    delay = session.throttle(command)
+                    if delay:
+                        # Over its rate limit: answer what came before and slow this connection down
+                        if replies:
+                            conn.sendall(b"".join(replies))
+                            replies = []
+                        session.sendLock.release()
+                        try:
+                            time.sleep(delay)
+                        finally:
+                            session.sendLock.acquire()
+                    wait = session.waitRequest(command)
+                    if wait is not None:
+                        if replies:
+                            conn.sendall(b"".join(replies))
+                            replies = []
+                        session.sendLock.release()
+                        try:
+                            wait_for_change(session, *wait)
+                        finally:
+                            session.sendLock.acquire()
+                    reply = session.respond(command)
+                    if reply is None:
+                        closing = True
+                        break
+                    replies.append(reply)
+                if replies:
+                    conn.sendall(b"".join(replies))
+            finally:
+                session.sendLock.release()
+            session.publish()
+            if closing:
                 break
         except Exception as error:
             logger.error(f"An error occurred: {error}")
             break
 
     logger.info("Lost connection")
+    session.close()
+    conn.close()
+
+def listen(host, port):
+    """Return a socket listening on host:port, exiting if the address can't be bound."""
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    # Allow immediate reuse of the address after restart; prevents "address already in use" errors
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
     try:
-        with games_lock:
-            del games[gameId]
-            logger.info(f"Closing Game {gameId}")
-    except KeyError:
+        s.bind((host, port))
+    except socket.error as e:
+        logger.error(f"Socket binding error: {e}")
+        sys.exit()
+
+    # Listen for incoming connections; missing listen() causes accept() to fail with EINVAL/Invalid argument
+    s.listen(backlog)
+    return s
+
+def listen_unix(path):
+    """Return a socket listening on the Unix domain socket path, exiting if it can't be bound."""
+    try:
+        s = unix_listener(path, backlog)
+    except OSError as e:
+        logger.error(f"Unix socket binding error on {path}: {e}")
+        sys.exit()
+    logger.info(f"Listening on unix:{path}")
+    return s
+
+def remove_unix(path):
+    try:
+        os.unlink(path)
+    except OSError:
         pass
-    conn.close()
 
-try:
-    while True:
+def accept_forever(s, handler):
+    """Accept connections on s, running handler(conn, addr) on a new thread for each."""
+    try:
+        while True:
+            try:
+                conn, addr = s.accept()
+            except OSError as e:
+                logger.error(f"Socket accept error: {e}")
+                break
+
+            enable_keepalive(conn)
+            start_new_thread(handler, (conn, addr))
+    finally:
         try:
-            conn, addr = s.accept()
-        except OSError as e:
-            logger.error(f"Socket accept error: {e}")
-            break
+            s.close()
+        except Exception:
+            pass
+
+def serve_threaded(host, port, unix_path=None):
+    """Accept connections forever, running each player on its own thread."""
+    s = listen(host, port)
+
+    def connected(conn, addr):
+        logger.info(f"Connected to: {addr or 'unix socket'}")
+        threaded_client(conn, addr)
+
+    if unix_path:
+        # Co-located agents skip the loopback TCP stack; same sessions, same lobby
+        threading.Thread(target=accept_forever, args=(listen_unix(unix_path), connected), daemon=True).start()
+    logger.info("Waiting for a connection, Server Started")
+    accept_forever(s, connected)
+
+def serve_worker(channel, worker_lobby):
+    """Run one threaded --workers child: serve the connections the dispatcher hands over."""
+    def adopt(conn, addr, session):
         logger.info(f"Connected to: {addr}")
+        start_new_thread(threaded_client, (conn, addr, session))
+
+    worker_loop(channel, worker_lobby, adopt)
+
+def serve_workers(host, port, workers, mode, lobby_factory, unix_path=None):
+    """Dispatch games across `workers` forked processes, each running a server in `mode`."""
+    s = listen(host, port)
+    if mode == 'asyncio':
+        import AsyncServer
+        channels = fork_workers(workers, lobby_factory, AsyncServer.run_worker)
+    else:
+        channels = fork_workers(workers, lobby_factory, serve_worker)
+    dispatcher = Dispatcher(channels)
+    if unix_path:
+        # Bound after the fork, so only the dispatcher holds it
+        threading.Thread(target=accept_forever, args=(listen_unix(unix_path), dispatcher.dispatch),
+                         daemon=True).start()
+    logger.info(f"Waiting for a connection, Server Started ({workers} {mode} workers)")
+
+    accept_forever(s, dispatcher.dispatch)
+
+def make_lobby(args, firstId=0, idStride=1):
+    """Build a Lobby configured from the command line; workers pass their own id range."""
+    matchmaker = Matchmaker(bucketWidth=args.rating_bucket, widenAfter=args.widen_after,
+                            batchSize=args.match_batch, batchWindow=args.match_window,
+                            firstId=firstId, idStride=idStride)
+    metrics = Metrics() if args.metrics_port else None
+    journal = None
+    if args.journal:
+        # Each worker journals its own games
+        directory = args.journal if args.workers == 0 else os.path.join(args.journal, f"worker-{firstId}")
+        journal = Journal(directory, flushInterval=args.journal_flush)
+    limiter = None
+    if any(rate > 0 for rate in (args.read_rate, args.move_rate, args.game_read_rate, args.game_move_rate)):
+        limiter = RateLimiter(readRate=args.read_rate, mutationRate=args.move_rate, gameReadRate=args.game_read_rate,
+                              gameMutationRate=args.game_move_rate, burst=args.rate_burst)
+    new_lobby = Lobby(snapshotCache=not args.no_snapshot_cache, matchmaker=matchmaker, metrics=metrics, journal=journal,
+                      readTimeout=args.read_timeout, limiter=limiter, moveLogEvery=args.log_moves_every,
+                      maxSpectators=args.max_spectators, spectatorDropAfter=args.spectator_drop_after,
+                      resumeGrace=args.resume_grace,
+                      compressor=None if args.no_compression else Compressor(args.compress_level, args.compress_min_bytes))
+    if metrics is not None:
+        metrics.gauge("cards_log_dropped_total", "Log records dropped because the log queue was full",
+                      lambda: queue_handler.dropped, kind="counter")
+    if journal is not None:
+        new_lobby.recover()
+        # Fold the replayed journal into a snapshot straight away so it isn't replayed again next time
+        journal.snapshot(new_lobby.capture)
+        journal.start(new_lobby.capture, args.snapshot_every)
+    # The reaper also frees seats whose resume grace ran out
+    if args.idle_timeout > 0 or args.finished_timeout > 0 or args.resume_grace > 0:
+        new_lobby.reaper = Reaper(new_lobby, idleTimeout=args.idle_timeout, finishedTimeout=args.finished_timeout,
+                                  tick=args.reap_interval).start()
+    return new_lobby
+
+def make_worker_lobby(args, index):
+    """Lobby for worker `index`; with --metrics-port P, worker k serves its own metrics on port P + k."""
+    worker_lobby = make_lobby(args, firstId=index, idStride=args.workers)
+    if worker_lobby.metrics is not None:
+        serve_metrics(args.metrics_host, args.metrics_port + index, worker_lobby.metrics)
+    return worker_lobby
+
+def log_lobby_stats():
+    logger.info(f"Matchmaking: {lobby.matchmaker.stats()}")
+    if lobby.reaper is not None:
+        logger.info(f"Reaper: {lobby.reaper.stats()}")
+    if lobby.limiter is not None:
+        logger.info(f"Rate limits: {lobby.limiter.stats()}")
+    if lobby.resumeGrace > 0:
+        logger.info(f"Resumed seats: {lobby.resumed}")
+    if lobby.compressor is not None:
+        logger.info(f"Compression: {lobby.compressor.stats()}")
+    logger.info(f"Spectators: {lobby.broadcaster.stats()}")
+    logger.info(f"Logging: {log_writer.stats()}")
+
+def log_stats(interval):
+    """Log matchmaking, reaper, rate limit, resume, compression, spectator and logging stats every `interval` seconds (run on a daemon thread)."""
+    while True:
+        time.sleep(interval)
+        log_lobby_stats()
+
+def main():
+    global lobby
+
+    parser = argparse.ArgumentParser(description='Cards game server')
+    parser.add_argument('--mode', default='threaded', choices=['threaded', 'asyncio'],
+                        help='threaded: one OS thread per player; asyncio: all players on one event loop')
+    parser.add_argument('--host', default=server, help='Address to bind (default 0.0.0.0)')
+    parser.add_argument('--port', default=port, type=int, help='Port to listen on (default 5550)')
+    parser.add_argument('--unix', default=None, metavar='PATH',
+                        help='Also listen on a Unix domain socket at PATH, for agents on the same host '
+                             '(Network(server="unix:PATH"); default off)')
+    parser.add_argument('--no-snapshot-cache', action='store_true',
+                        help='Re-encode the board for every full-state reply instead of caching it per version')
+    parser.add_argument('--workers', default=0, type=int,
+                        help='Fork this many worker processes and spread games across them (Unix only; default 0 = one process)')
+    parser.add_argument('--rating-bucket', default=0, type=int,
+                        help='Only pair players whose hello rating falls in the same band of this many points (default 0 = off)')
+    parser.add_argument('--widen-after', default=10.0, type=float,
+                        help='Seconds before a waiting player accepts neighbouring rating bands (default 10)')
+    parser.add_argument('--match-batch', default=1, type=int,
+                        help='Hold arrivals and pair them in batches of this size, for agent swarms (default 1 = pair on arrival)')
+    parser.add_argument('--match-window', default=1.0, type=float,
+                        help='Longest a player waits for its batch to fill (default 1s)')
+    parser.add_argument('--stats-interval', default=0, type=float,
+                        help='Log matchmaking queue depth and time-to-match every N seconds (default 0 = off)')
+    parser.add_argument('--metrics-port', default=0, type=int,
+                        help='Serve Prometheus metrics over HTTP on this port (default 0 = off; workers use port + k)')
+    parser.add_argument('--metrics-host', default='127.0.0.1',
+                        help='Address for the metrics endpoint (default 127.0.0.1, local only)')
+    parser.add_argument('--journal', default=None, metavar='DIR',
+                        help='Journal every move to DIR and recover the live games from it on startup (default off)')
+    parser.add_argument('--journal-flush', default=0.05, type=float,
+                        help='Seconds between batched journal fsyncs; 0 = fsync every move (default 0.05)')
+    parser.add_argument('--snapshot-every', default=60.0, type=float,
+                        help='Seconds between journal snapshots, which bound replay time on recovery (default 60)')
+    parser.add_argument('--read-timeout', default=0, type=float,
+                        help='Drop connections that send nothing for this many seconds (default 0 = never; '
+                             'half-open connections are caught by TCP keepalive either way)')
+    parser.add_argument('--idle-timeout', default=900, type=float,
+                        help='Evict games with no command for this many seconds, disconnecting their players (default 900, 0 = off)')
+    parser.add_argument('--finished-timeout', default=300, type=float,
+                        help='Evict games that have a winner after this many seconds without a command (default 300, 0 = off)')
+    parser.add_argument('--reap-interval', default=1.0, type=float, help='Seconds between reaper passes (default 1)')
+    parser.add_argument('--resume-grace', default=30.0, type=float,
+                        help='Keep a dropped player\'s seat this many seconds for a reconnect with its resume token '
+                             '(default 30, 0 = free it at once)')
+    parser.add_argument('--read-rate', default=0, type=float,
+                        help='Reads (get, sync, wait, subscribe) per second allowed on each connection; faster ones '
+                             'are held back, not refused (default 0 = unlimited)')
+    parser.add_argument('--move-rate', default=0, type=float,
+                        help='Moves (move, discard, deal, start, reset) per second allowed on each connection (default 0 = unlimited)')
+    parser.add_argument('--game-read-rate', default=0, type=float,
+                        help='Reads per second allowed for all connections of one game together (default 0 = unlimited)')
+    parser.add_argument('--game-move-rate', default=0, type=float,
+                        help='Moves per second allowed for all connections of one game together (default 0 = unlimited)')
+    parser.add_argument('--rate-burst', default=1.0, type=float,
+                        help="Seconds' worth of commands a client may send at once before being slowed (default 1)")
+    parser.add_argument('--log-max-bytes', default=log_max_bytes, type=int,
+                        help='Roll LOG_PATH over to LOG_PATH.1 when it reaches this size (default 50 MiB, 0 = never)')
+    parser.add_argument('--log-backups', default=log_backups, type=int,
+                        help='Rolled-over log files to keep (default 3)')
+    parser.add_argument('--log-queue', default=queue_handler.capacity, type=int,
+                        help='Log records buffered for the writer thread before new ones are dropped (default 10000)')
+    parser.add_argument('--log-moves-every', default=1, type=int,
+                        help='Log one in N moves (default 1 = every move, 0 = none)')
+    parser.add_argument('--max-spectators', default=1000, type=int,
+                        help='Spectators allowed per game (hello:...,spectate=<gameId>:; default 1000, 0 = none)')
+    parser.add_argument('--spectator-drop-after', default=10.0, type=float,
+                        help='Disconnect a spectator that has been too slow to take pushes for this many seconds (default 10)')
+    parser.add_argument('--no-compression', action='store_true',
+                        help='Decline clients that ask for compressed replies (hello:...,compress=zlib:)')
+    parser.add_argument('--compress-level', default=1, type=int,
+                        help='zlib level for compressed replies, 1 = fastest to 9 = smallest (default 1)')
+    parser.add_argument('--compress-min-bytes', default=256, type=int,
+                        help='Send replies smaller than this uncompressed (default 256)')
+    args = parser.parse_args()
+    if log_file:
+        log_file.maxBytes = args.log_max_bytes
+        log_file.backups = args.log_backups
+    queue_handler.capacity = args.log_queue
+    if args.workers == 0:
+        # Workers build their own lobbies after the fork
+        lobby = make_lobby(args)
+        if lobby.metrics is not None:
+            serve_metrics(args.metrics_host, args.metrics_port, lobby.metrics)
+        if args.stats_interval > 0:
+            threading.Thread(target=log_stats, args=(args.stats_interval,), daemon=True).start()
 
-        # Protect access to idCount and games so we don't race with other threads
-        with games_lock:
-            idCount += 1
-            p = 0
-            gameId = (idCount - 1) // 2
-            if idCount % 2 == 1:
-                games[gameId] = Board(gameId)
-                logger.info(f"Creating a new game {gameId}")
-            else:
-                # If gameId isn't present (previous player disconnected), create a new Board
-                if gameId not in games:
-                    logger.warning(f"Game {gameId} not found when second player connected; creating a new game")
-                    games[gameId] = Board(gameId)
-                games[gameId].startGame()
-                p = 1
-                logger.info(f"Game {gameId} is now ready")
-
-        start_new_thread(threaded_client, (conn, p, gameId))
-except KeyboardInterrupt:
-    logger.info("Shutting down server (KeyboardInterrupt)")
-finally:
     try:
-        s.close()
-    except Exception:
-        pass
\ No newline at end of file
+        if args.workers > 0:
+            serve_workers(args.host, args.port, args.workers, args.mode,
+                          lambda index: make_worker_lobby(args, index), unix_path=args.unix)
+        elif args.mode == 'asyncio':
+            import AsyncServer
+            AsyncServer.run(args.host, args.port, lobby, backlog=backlog, unix_path=args.unix)
+        else:
+            serve_threaded(args.host, args.port, unix_path=args.unix)
+    except KeyboardInterrupt:
+        logger.info("Shutting down server (KeyboardInterrupt)")
+    if args.unix:
+        remove_unix(args.unix)
+    if args.workers == 0:
+        if lobby.journal is not None:
+            lobby.journal.close()
+        hits, misses = lobby.snapshotStats()
+        logger.info(f"Snapshot cache: {hits} hits, {misses} misses")
+        log_lobby_stats()
+    log_writer.stop()
+
+if __name__ == '__main__':
+    main()
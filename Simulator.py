@@ -0,0 +1,326 @@
+import random
+
+import numpy as np
+
+from Game import CARD_NAMES, DECK_SIZE, FIELD_FULL, KING, MAX_REPLAYED_SHUFFLES, RANKS, RESHUFFLE_BELOW
+
+# Headless self-play: many games of the Board rules at once as NumPy arrays.
+# Only the simulator needs NumPy; the server, clients and agents never import it.
+
+# Every pile of a batch is a fixed-size array; the most cards each kind can hold
+CARDS = 2 * DECK_SIZE
+HAND_SIZE = 5
+GOAL_SIZE = 2
+FIELD_SIZE = FIELD_FULL    # a field pile this long is cleared to the dump straight away
+
+# Where a played card comes from, in the order the rules look for a named
+# card (see Board._playable): hand slots 0-4, the goal top, discard tops 0-3
+GOAL_SOURCE = HAND_SIZE
+SOURCES = HAND_SIZE + 1 + 4
+
+# An action is a field move, source * 4 + field pile, or a discard,
+# MOVE_ACTIONS + hand slot * 4 + discard pile
+MOVE_ACTIONS = SOURCES * 4
+ACTIONS = MOVE_ACTIONS + HAND_SIZE * 4
+
+# BatchSimulator.winner: still playing, 1 or 2 as Board.winner, or the deck ran dry mid-deal
+PLAYING = 0
+EXHAUSTED = -1
+
+_SLOTS = np.arange(HAND_SIZE)
+_PILES = np.arange(4)
+_FIELD_CARDS = np.arange(FIELD_SIZE)
+# _EARLIER[i, j]: source j is looked at before source i
+_EARLIER = np.tri(SOURCES, k=-1, dtype=bool)
+
+
+class BatchSimulator:
+    '''
+    A batch of games of the Board rules, played in lockstep as NumPy arrays.
+
+    Game k is dealt exactly as Board(seed, seed=seed).startGame() deals it:
+    each game shuffles with its own random.Random, reseeding the way a Board
+    does, so any simulated game can be replayed on a Board play for play.
+
+    legal() is the mask of what the player whose turn it is may do in each
+    game: the plays Board.legal_moves yields, as actions (see ACTIONS).
+    step() makes one play in every game still going. A policy is any
+    callable policy(sim, mask) returning one legal action per row of mask;
+    run() plays every game out with one. command() spells an action the way
+    Board.play takes it.
+
+    A game ends when a player has played both goal cards (winner 1 or 2,
+    as on a Board) or when a deal finds the deck empty, which makes
+    Board.play raise IndexError (winner EXHAUSTED).
+    '''
+    def __init__(self, seeds):
+        self.seeds = list(seeds)
+        count = len(self.seeds)
+        self.deck = np.zeros((count, CARDS), np.uint8)
+        self.deck_len = np.zeros(count, np.int32)
+        self.dump = np.zeros((count, CARDS), np.uint8)
+        self.dump_len = np.zeros(count, np.int32)
+        self.field = np.zeros((count, 4, FIELD_SIZE), np.uint8)
+        self.field_len = np.zeros((count, 4), np.int32)
+        # Per player: [game, player id, ...]
+        self.hand = np.zeros((count, 2, HAND_SIZE), np.uint8)
+        self.hand_len = np.zeros((count, 2), np.int32)
+        self.goal = np.zeros((count, 2, GOAL_SIZE), np.uint8)
+        self.goal_len = np.zeros((count, 2), np.int32)
+        self.discard = np.zeros((count, 2, 4, CARDS), np.uint8)
+        self.discard_len = np.zeros((count, 2, 4), np.int32)
+        self.turn = np.zeros(count, np.int32)
+        self.winner = np.zeros(count, np.int32)
+        self.plays = np.zeros(count, np.int32)
+        self._rngs = [random.Random(seed) for seed in self.seeds]
+        self._shuffles = np.zeros(count, np.int32)
+        # The games legal() last looked at, and the cards their sources hold, for step()
+        self._sources_of = (None, None)
+        self._start()
+
+    def _start(self):
+        games = np.arange(len(self.seeds))
+        self.deck[:] = np.arange(CARDS)
+        self._shuffle(games, self.deck, np.full(len(games), CARDS))
+        # Goals are dealt off the top (the end) of the deck, one card each in turn
+        self.goal[:, 0] = self.deck[:, [CARDS - 1, CARDS - 3]]
+        self.goal[:, 1] = self.deck[:, [CARDS - 2, CARDS - 4]]
+        self.goal_len[:] = GOAL_SIZE
+        self.deck_len[:] = CARDS - 2 * GOAL_SIZE
+        # The lower goal card starts (see Deck.compare)
+        self.turn[:] = np.where(self.goal[:, 0, 0] % len(RANKS) < self.goal[:, 1, 0] % len(RANKS), 0, 1)
+        self._deal(games, self.turn)
+
+    def _shuffle(self, games, cards, lengths):
+        # Board._shuffle for each of games: shuffle the first lengths[i] of cards[i] with the
+        # game's generator, which is reseeded after the same number of shuffles as a Board's
+        _shuffle_rows(cards, lengths, [self._rngs[game] for game in games])
+        for game in games:
+            if self._shuffles[game] < MAX_REPLAYED_SHUFFLES:
+                self._shuffles[game] += 1
+            else:
+                self._rngs[game] = random.Random(self._rngs[game].getrandbits(32))
+                self._shuffles[game] = 0
+
+    def _deal(self, games, players):
+        """Fill the hands of players in games up to five from the deck (Board.dealPlayer)."""
+        need = HAND_SIZE - self.hand_len[games, players]
+        short = need > self.deck_len[games]
+        if short.any():
+            self.winner[games[short]] = EXHAUSTED
+            games, players, need = games[~short], players[~short], need[~short]
+        for _ in range(HAND_SIZE):
+            dealing = need > 0
+            if not dealing.any():
+                break
+            games, players, need = games[dealing], players[dealing], need[dealing] - 1
+            self.deck_len[games] -= 1
+            self.hand[games, players, self.hand_len[games, players]] = self.deck[games, self.deck_len[games]]
+            self.hand_len[games, players] += 1
+
+    def active(self):
+        """Indexes of the games still being played."""
+        return np.flatnonzero(self.winner == PLAYING)
+
+    def _sources(self, games):
+        # The card each source of the current player holds, and whether there is one
+        players = self.turn[games]
+        cards = np.empty((len(games), SOURCES), np.int32)
+        valid = np.empty((len(games), SOURCES), bool)
+        cards[:, :HAND_SIZE] = self.hand[games, players]
+        valid[:, :HAND_SIZE] = _SLOTS < self.hand_len[games, players][:, None]
+        cards[:, GOAL_SOURCE] = self.goal[games, players, 0]
+        valid[:, GOAL_SOURCE] = self.goal_len[games, players] > 0
+        tops = self.discard_len[games, players]
+        cards[:, GOAL_SOURCE + 1:] = self.discard[games[:, None], players[:, None], _PILES, np.maximum(tops - 1, 0)]
+        valid[:, GOAL_SOURCE + 1:] = tops > 0
+        return cards, valid
+
+    def legal(self, games=None):
+        '''
+        Return the (games, ACTIONS) mask of legal actions of the player whose turn it is.
+
+        games defaults to all of them; a finished game has none. A source
+        holding the same face as one the rules look at first is left out, as
+        the command naming it would play the other card.
+        '''
+        games = np.arange(len(self.seeds)) if games is None else games
+        cards, valid = self._sources(games)
+        self._sources_of = (games, cards)
+        faces = cards % DECK_SIZE
+        shadowed = ((faces[:, :, None] == faces[:, None, :]) & valid[:, None, :] & _EARLIER).any(axis=2)
+        playable = valid & ~shadowed
+        ranks = cards % len(RANKS)
+        # Game.fits for every source and field pile at once
+        fits = (ranks[:, :, None] == self.field_len[games][:, None, :]) | (ranks == KING)[:, :, None]
+        mask = np.empty((len(games), ACTIONS), bool)
+        mask[:, :MOVE_ACTIONS] = (playable[:, :, None] & fits).reshape(len(games), MOVE_ACTIONS)
+        mask[:, MOVE_ACTIONS:] = np.repeat(playable[:, :HAND_SIZE], 4, axis=1)
+        mask[self.winner[games] != PLAYING] = False
+        return mask
+
+    def command(self, game, action):
+        """The Board.play command for an action in game."""
+        cards, _ = self._sources(np.array([game]))
+        if action < MOVE_ACTIONS:
+            return f"move:{CARD_NAMES[cards[0, action // 4]]}:{action % 4}"
+        action -= MOVE_ACTIONS
+        return f"discard:{CARD_NAMES[cards[0, action // 4]]}:{action % 4}"
+
+    def step(self, actions, games=None):
+        '''
+        Make one play in each of games (default: every game still going): actions[i] in games[i].
+
+        Every action must be legal (see legal()). Returns how many games played.
+        '''
+        games = self.active() if games is None else games
+        actions = np.asarray(actions)
+        if len(actions) != len(games):
+            actions = actions[games]
+        players = self.turn[games]
+        cards = self._sources_of[1] if self._sources_of[0] is games else self._sources(games)[0]
+        self._sources_of = (None, None)
+        moving = actions < MOVE_ACTIONS
+        source = np.where(moving, actions, actions - MOVE_ACTIONS) // 4
+        target = actions % 4
+        card = cards[np.arange(len(games)), source]
+        self._take(games, players, source)
+
+        g, t = games[moving], target[moving]
+        self.field[g, t, self.field_len[g, t]] = card[moving]
+        self.field_len[g, t] += 1
+
+        discarding = ~moving
+        g, p, t = games[discarding], players[discarding], target[discarding]
+        self.discard[g, p, t, self.discard_len[g, p, t]] = card[discarding]
+        self.discard_len[g, p, t] += 1
+        # A discard ends the turn; the next player is dealt back up to five
+        self.turn[g] = 1 - p
+        self._deal(g, 1 - p)
+
+        self._check_field(games[moving], players[moving])
+        self.plays[games] += 1
+        return len(games)
+
+    def _take(self, games, players, source):
+        # Take each played card off its pile: any hand slot, the goal top or a discard top
+        fromHand = source < HAND_SIZE
+        g, p, slot = games[fromHand], players[fromHand], source[fromHand]
+        # The cards after the played one move up a slot
+        after = np.minimum(_SLOTS + (_SLOTS >= slot[:, None]), HAND_SIZE - 1)
+        self.hand[g, p] = np.take_along_axis(self.hand[g, p], after, axis=1)
+        self.hand_len[g, p] -= 1
+
+        fromGoal = source == GOAL_SOURCE
+        g, p = games[fromGoal], players[fromGoal]
+        self.goal[g, p, 0] = self.goal[g, p, 1]
+        self.goal_len[g, p] -= 1
+
+        fromDiscard = source > GOAL_SOURCE
+        self.discard_len[games[fromDiscard], players[fromDiscard], source[fromDiscard] - GOAL_SOURCE - 1] -= 1
+
+    def _check_field(self, games, players):
+        # Board.checkField after a move in each of games by players
+        g, t = np.nonzero(self.field_len[games] == FIELD_SIZE)
+        g = games[g]
+        # Onto the dump top card first, as if taken off the pile one at a time
+        self.dump[g[:, None], self.dump_len[g][:, None] + _FIELD_CARDS] = self.field[g, t, ::-1]
+        self.dump_len[g] += FIELD_SIZE
+        self.field_len[g, t] = 0
+
+        empty = self.hand_len[games, players] == 0
+        self._deal(games[empty], players[empty])
+        games = games[self.winner[games] == PLAYING]
+
+        # A short deck gets the shuffled dump on top
+        low = games[self.deck_len[games] < RESHUFFLE_BELOW]
+        if len(low):
+            dump = self.dump[low]
+            self._shuffle(low, dump, self.dump_len[low])
+            rows, cards = np.nonzero(np.arange(CARDS) < self.dump_len[low][:, None])
+            self.deck[low[rows], self.deck_len[low][rows] + cards] = dump[rows, cards]
+            self.deck_len[low] += self.dump_len[low]
+            self.dump_len[low] = 0
+
+        self.winner[games[self.goal_len[games, 0] == 0]] = 1
+        self.winner[games[self.goal_len[games, 1] == 0]] = 2
+
+    def run(self, policy, max_plays=1000):
+        """Play every game until it ends or has made max_plays plays; returns winner."""
+        for _ in range(max_plays):
+            games = self.active()
+            if not len(games):
+                break
+            self.step(policy(self, self.legal(games)), games)
+        return self.winner
+
+    def piles(self, game):
+        """Game's piles as bytes in PILE_NAMES order, to compare with a Board's."""
+        piles = [self.deck[game, :self.deck_len[game]], self.dump[game, :self.dump_len[game]]]
+        piles += [self.field[game, pile, :self.field_len[game, pile]] for pile in range(4)]
+        for player in range(2):
+            piles.append(self.hand[game, player, :self.hand_len[game, player]])
+            piles.append(self.goal[game, player, :self.goal_len[game, player]])
+            piles += [self.discard[game, player, pile, :self.discard_len[game, player, pile]] for pile in range(4)]
+        return [pile.tobytes() for pile in piles]
+
+
+def _shuffle_rows(cards, lengths, rngs):
+    '''
+    Shuffle cards[i, :lengths[i]] in place exactly as rngs[i].shuffle would, leaving rngs[i] where it would.
+
+    random.shuffle swaps each card i, from the last down, with one below
+    _randbelow(i + 1), which draws getrandbits(k) (one 32-bit Mersenne Twister
+    word shifted down to k bits) until it is below i + 1. The swaps run across
+    all rows at once. A row short of words draws one for each swap it has
+    left in a single getrandbits call: it needs at least that many, so no
+    generator is ever advanced further than its shuffle takes it.
+    '''
+    words = np.zeros((len(rngs), 2 * CARDS), np.uint32)
+    drawn = np.zeros(len(rngs), np.intp)
+    available = np.zeros(len(rngs), np.intp)
+    for i in range(int(lengths.max(initial=0)) - 1, 0, -1):
+        rows = np.flatnonzero(lengths > i)
+        shift = 32 - (i + 1).bit_length()
+        pick = np.zeros(len(rngs), np.intp)
+        waiting = rows
+        while len(waiting):
+            short = waiting[drawn[waiting] == available[waiting]]
+            if len(short):
+                if available[short].max() + i > words.shape[1]:
+                    words = np.concatenate((words, np.zeros_like(words)), axis=1)
+                more = b"".join(rngs[row].getrandbits(32 * i).to_bytes(4 * i, "little") for row in short)
+                words[short[:, None], available[short][:, None] + np.arange(i)] = \
+                    np.frombuffer(more, np.uint32).reshape(len(short), i)
+                available[short] += i
+            value = words[waiting, drawn[waiting]] >> shift
+            drawn[waiting] += 1
+            below = value <= i
+            pick[waiting[below]] = value[below]
+            waiting = waiting[~below]
+        pick = pick[rows]
+        cards[rows, i], cards[rows, pick] = cards[rows, pick], cards[rows, i]
+
+
+def random_policy(rng):
+    """A policy choosing uniformly among the legal actions, drawing from a numpy Generator."""
+    def policy(sim, mask):
+        scores = rng.random(mask.shape)
+        scores[~mask] = -1
+        return scores.argmax(axis=1)
+    return policy
+
+
+# Field moves in the order the greedy policy tries them: the goal top, the hand, then the discard tops
+_GREEDY_ORDER = np.r_[GOAL_SOURCE * 4:GOAL_SOURCE * 4 + 4, :GOAL_SOURCE * 4, GOAL_SOURCE * 4 + 4:MOVE_ACTIONS]
+
+
+def greedy_policy(rng):
+    """A policy like the load generator's: the first field move that fits, else a random discard."""
+    def policy(sim, mask):
+        moves = mask[:, _GREEDY_ORDER]
+        scores = rng.random(mask.shape)
+        scores[~mask] = -1
+        scores[:, :MOVE_ACTIONS] = -1
+        return np.where(moves.any(axis=1), _GREEDY_ORDER[moves.argmax(axis=1)], scores.argmax(axis=1))
+    return policy
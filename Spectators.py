@@ -0,0 +1,156 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from Protocol import FLAG_PUSH
+
+logger = logging.getLogger("GameServer")
+
+# How many recent fan-out times stats() summarises
+FANOUT_SAMPLES = 1000
+
+
+class Broadcaster:
+    '''
+    Pushes every change of a game to its subscribed spectators from one
+    background thread, so the players' threads never wait on them.
+
+    A game with spectators has a room watcher that marks it dirty. On each
+    pass the broadcaster encodes the public view of each dirty game once
+    per wire format and compression (see GameRoom.publicView). It then hands the same frame
+    to every spectator that doesn't have that version yet through
+    session.offer, which never blocks. Every frame is a full public board,
+    so a spectator that misses versions just gets the latest one.
+
+    A spectator whose connection can't take the frame right now (a full
+    socket buffer, or a reply of its own being written) is skipped and its
+    game stays dirty so it is retried next pass. One that has been behind
+    for dropAfter seconds, or whose offer fails, is disconnected.
+    '''
+    def __init__(self, interval=0.01, dropAfter=10.0):
+        self.interval = interval
+        self.dropAfter = dropAfter
+        self.lock = threading.Lock()
+        self.dirty = set()
+        self.wake = threading.Event()
+        self.frames = 0
+        self.sent = 0
+        self.skipped = 0
+        self.dropped = 0
+        self.fanouts = deque(maxlen=FANOUT_SAMPLES)
+        self._thread = None
+        self._stop = threading.Event()
+
+    def add(self, room, session):
+        """Start pushing room's changes to a spectator session."""
+        with room.watchLock:
+            room.spectators.add(session)
+            first = room.fanout is None
+            if first:
+                room.fanout = lambda origin, room=room: self.changed(room)
+        if first:
+            room.watch(room.fanout)
+        self._ensureStarted()
+        # Bring it up to date straight away if it is already behind
+        self.changed(room)
+
+    def remove(self, room, session):
+        with room.watchLock:
+            room.spectators.discard(session)
+            fanout = room.fanout if not room.spectators else None
+            if fanout is not None:
+                room.fanout = None
+        if fanout is not None:
+            room.unwatch(fanout)
+
+    def changed(self, room):
+        with self.lock:
+            self.dirty.add(room)
+        self.wake.set()
+
+    def _ensureStarted(self):
+        with self.lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="spectators", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Sleep until a change, or a moment before retrying skipped spectators
+            self.wake.wait(self.interval if self.dirty else None)
+            self.wake.clear()
+            with self.lock:
+                rooms, self.dirty = self.dirty, set()
+            for room in rooms:
+                try:
+                    if self.fanOut(room):
+                        with self.lock:
+                            self.dirty.add(room)
+                except Exception as error:
+                    logger.error(f"Spectator fan-out for game {room.board.id} failed: {error}")
+
+    def fanOut(self, room, now=None):
+        """Offer room's latest public view to each of its spectators; True if any is still behind."""
+        start = time.perf_counter()
+        with room.watchLock:
+            spectators = list(room.spectators)
+        with room.lock:
+            version = room.board.version
+            frames = {}
+            for session in spectators:
+                kind = session.format, session.compress
+                if session.sentVersion != version and kind not in frames:
+                    frames[kind] = session.frame(room.publicView(session.format), FLAG_PUSH)
+        self.frames += len(frames)
+
+        now = time.monotonic() if now is None else now
+        behind = False
+        for session in spectators:
+            if session.sentVersion == version:
+                continue
+            if not session.sendLock.acquire(blocking=False):
+                taken = False
+            else:
+                try:
+                    taken = session.offer(frames[session.format, session.compress])
+                except OSError as error:
+                    self._drop(room, session, f"push failed: {error}")
+                    continue
+                finally:
+                    session.sendLock.release()
+            if taken:
+                session.sentVersion = version
+                session.behindSince = None
+                self.sent += 1
+                continue
+            self.skipped += 1
+            if session.behindSince is None:
+                session.behindSince = now
+            if now - session.behindSince >= self.dropAfter:
+                self._drop(room, session, f"behind for {self.dropAfter}s")
+            else:
+                behind = True
+        if frames:
+            self.fanouts.append(time.perf_counter() - start)
+        return behind
+
+    def _drop(self, room, session, reason):
+        logger.info(f"Dropping spectator of game {room.board.id}: {reason}")
+        self.dropped += 1
+        self.remove(room, session)
+        session.subscribed = False
+        session.kick()
+
+    def stats(self):
+        """Frames encoded, pushes sent/skipped, spectators dropped and fan-out time percentiles (seconds)."""
+        samples = sorted(self.fanouts)
+        stats = {"frames": self.frames, "sent": self.sent, "skipped": self.skipped, "dropped": self.dropped}
+        if samples:
+            stats.update(fanout_p50=samples[len(samples) // 2],
+                         fanout_p99=samples[min(len(samples) - 1, len(samples) * 99 // 100)])
+        return stats
+
+    def stop(self):
+        self._stop.set()
+        self.wake.set()
@@ -0,0 +1,176 @@
+'''
+Pre-fork mode: one dispatcher process spreading games over worker processes.
+
+The dispatcher owns the listening socket. For every connection it waits
+for the client's hello (peeking, so the bytes stay in the socket), counts
+it as the next seat and hands the file descriptor to a worker: seats 2k
+and 2k+1 both go to worker k % workers, so each worker receives players
+in pairs. Workers receive descriptors over a SOCK_SEQPACKET socketpair,
+seat them through their own Matchmaker in the order they arrive and then
+serve them exactly like a single-process server, so both players of a
+Board are always in the same process.
+
+A hello that names a game it is already in - resume=<token> after a
+dropped connection, or spectate=<gameId> - takes no new seat and goes
+straight to the worker that owns that game: worker k hands out game ids
+k, k + workers, ... (see Server.make_worker_lobby).
+
+Unix only: descriptors are passed with socket.send_fds/recv_fds.
+'''
+import logging
+import os
+import socket
+import struct
+import threading
+
+from Lobby import Session
+from Protocol import FRAME_HEADER, parse_hello
+
+logger = logging.getLogger("GameServer")
+
+# Longest the dispatcher waits for a new connection's hello
+HELLO_TIMEOUT = 10.0
+# Largest hello the dispatcher will wait for; real ones are a few dozen bytes
+MAX_HELLO = 1024
+# Dispatcher -> worker message: length of the hello frame waiting in the socket
+_HANDOFF = struct.Struct(">I")
+
+
+def peek_hello(conn):
+    """Return (size, requested options) of the hello frame at the front of conn without consuming it, or None."""
+    conn.settimeout(HELLO_TIMEOUT)
+    header = conn.recv(FRAME_HEADER.size, socket.MSG_PEEK | socket.MSG_WAITALL)
+    if len(header) < FRAME_HEADER.size:
+        return None
+    length, _ = FRAME_HEADER.unpack(header)
+    if length > MAX_HELLO:
+        return None
+    size = FRAME_HEADER.size + length
+    frame = conn.recv(size, socket.MSG_PEEK | socket.MSG_WAITALL)
+    if len(frame) < size:
+        return None
+    requested = parse_hello(frame[FRAME_HEADER.size:].decode(errors="replace"))
+    if requested is None:
+        return None
+    return size, requested
+
+
+def named_game(requested):
+    """The game id a resume token or spectate option points at, or None for a player wanting a new seat."""
+    name = requested.get("resume", "").partition(".")[0] or requested.get("spectate", "")
+    try:
+        return int(name)
+    except ValueError:
+        return None
+
+
+class Dispatcher:
+    '''
+    Accepts connections and forwards each one, once its hello has arrived,
+    to the worker that owns its game.
+    '''
+    def __init__(self, channels):
+        self.channels = channels
+        self.seats = 0
+        self.lock = threading.Lock()
+
+    def dispatch(self, conn, addr):
+        try:
+            hello = peek_hello(conn)
+        except OSError as error:
+            logger.warning(f"No hello from {addr}: {error}")
+            hello = None
+        if hello is None:
+            logger.warning(f"Closing connection from {addr}: expected a hello")
+            conn.close()
+            return
+        size, requested = hello
+
+        gameId = named_game(requested)
+        if gameId is not None:
+            worker = gameId % len(self.channels)
+            with self.lock:
+                socket.send_fds(self.channels[worker], [_HANDOFF.pack(size)], [conn.fileno()])
+            logger.info(f"Dispatched {addr} to worker {worker} (game {gameId})")
+            conn.close()
+            return
+
+        # Seats are numbered in the order hellos complete; the lock keeps each
+        # worker receiving its connections in that same order
+        with self.lock:
+            seat = self.seats
+            self.seats += 1
+            worker = seat // 2 % len(self.channels)
+            socket.send_fds(self.channels[worker], [_HANDOFF.pack(size)], [conn.fileno()])
+        logger.info(f"Dispatched {addr} to worker {worker} (seat {seat})")
+        conn.close()
+
+
+def worker_loop(channel, lobby, serve_connection):
+    '''
+    Receive connections from the dispatcher until it goes away.
+
+    Each connection's hello is answered here, in arrival order, so seating
+    matches the dispatcher's numbering; serve_connection(conn, addr, session)
+    then takes over the already greeted connection. When the matchmaker
+    batches arrivals a hello can block, so each one gets its own thread.
+    '''
+    while True:
+        try:
+            data, fds, _, _ = socket.recv_fds(channel, _HANDOFF.size, 1)
+        except OSError as error:
+            logger.error(f"Worker channel error: {error}")
+            break
+        if not fds:
+            break
+        conn = socket.socket(fileno=fds[0])
+        if lobby.matchmaker.blocking:
+            threading.Thread(target=take_over, args=(conn, data, lobby, serve_connection), daemon=True).start()
+        else:
+            take_over(conn, data, lobby, serve_connection)
+
+
+def take_over(conn, data, lobby, serve_connection):
+    """Answer the hello waiting on a handed over connection, then pass it to serve_connection."""
+    # The dispatcher left the descriptor non-blocking after its timed peek
+    conn.setblocking(True)
+    session = Session(lobby)
+    try:
+        addr = conn.getpeername()
+        (size,) = _HANDOFF.unpack(data)
+        hello = conn.recv(size, socket.MSG_WAITALL)
+        conn.sendall(session.respond(session.receive(hello)[0]))
+    except (OSError, IndexError, TypeError, struct.error) as error:
+        logger.error(f"Could not take over connection: {error}")
+        session.close()
+        conn.close()
+        return
+    serve_connection(conn, addr, session)
+
+
+def fork_workers(workers, lobby_factory, serve_worker):
+    '''
+    Fork the worker processes and return the dispatcher's ends of their channels.
+
+    Worker k builds its Lobby with lobby_factory(k) (see Server.make_lobby) and
+    runs serve_worker(channel, lobby); the child exits when it returns.
+    '''
+    channels = []
+    for index in range(workers):
+        parent_end, child_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        pid = os.fork()
+        if pid == 0:
+            for other in channels:
+                other.close()
+            parent_end.close()
+            lobby = lobby_factory(index)
+            logger.info(f"Worker {index} started (pid {os.getpid()})")
+            try:
+                serve_worker(child_end, lobby)
+            finally:
+                # os._exit skips atexit, so write out buffered logs first
+                logging.shutdown()
+                os._exit(0)
+        child_end.close()
+        channels.append(parent_end)
+    return channels
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Memory and copy cost of live boards.
+
+Deals --boards games (one Board each, as a lobby holds them) and reports:
+
+- process RSS growth per board across all of them
+- bytes per board from tracemalloc (over at most 1000 more boards)
+- copy.deepcopy, Board.copy, a pickle round trip and one commit() (which
+  snapshots every pile to diff against) per board, in microseconds
+
+Usage:
+    python3 benchmarks/bench_board_memory.py --boards 10000 [--number 2000]
+"""
+import argparse
+import copy
+import gc
+import os
+import pickle
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Game import Board
+
+
+def rss_kb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def dealt(id):
+    board = Board(id, seed=id)
+    board.startGame()
+    return board
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark memory per live board and the cost of copying one')
+    parser.add_argument('--boards', default=10000, type=int, help='Live boards (default 10000)')
+    parser.add_argument('--number', default=2000, type=int, help='Iterations per timing (default 2000)')
+    args = parser.parse_args()
+
+    gc.collect()
+    rss = rss_kb()
+    boards = [dealt(id) for id in range(args.boards)]
+    grown = rss_kb() - rss
+
+    # Traced separately: tracemalloc's own bookkeeping would show up in the RSS figure
+    sample = min(args.boards, 1000)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    traced_boards = [dealt(id) for id in range(sample)]
+    traced = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del traced_boards
+
+    board = boards[-1]
+    payload = pickle.dumps(board)
+    timings = (
+        ("deepcopy", lambda: copy.deepcopy(board)),
+        ("Board.copy", board.copy),
+        ("pickle round trip", lambda: pickle.loads(pickle.dumps(board))),
+        ("commit (no change)", board.commit),
+    )
+
+    print(f"{'boards':<24} {args.boards:>10}")
+    print(f"{'traced bytes/board':<24} {traced / sample:>10.0f}")
+    print(f"{'RSS bytes/board':<24} {grown * 1024 / args.boards:>10.0f}")
+    print(f"{'pickled bytes':<24} {len(payload):>10}")
+    for name, call in timings:
+        elapsed = timeit.timeit(call, number=args.number) / args.number
+        print(f"{name + ' us':<24} {elapsed * 1e6:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
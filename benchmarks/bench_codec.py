@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of Board snapshot/delta encoding: pickle vs the binary wire format.
+
+Builds a mid-game board by playing random discards, then reports per call
+encode and decode time and the encoded size for:
+
+- a full snapshot (what "get" returns)
+- a one-turn delta (what "sync" returns while a game is in progress)
+
+Usage:
+    python3 benchmarks/bench_codec.py --turns 30 --number 2000
+"""
+import argparse
+import os
+import pickle
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Game import CARD_NAMES, Board, decode_state, encode_state
+
+
+def mid_game_board(turns, seed):
+    rng = random.Random(seed)
+    board = Board(0)
+    board.startGame()
+    for _ in range(turns):
+        player = board.playerOne if board.currentTurn == 0 else board.playerTwo
+        board.play(f"discard:{CARD_NAMES[rng.choice(player.hand)]}:{rng.randrange(4)}", board.currentTurn)
+    return board
+
+
+def measure(label, state, encode, decode, number):
+    data = encode(state)
+    enc = timeit.timeit(lambda: encode(state), number=number) / number
+    dec = timeit.timeit(lambda: decode(data), number=number) / number
+    print(f"{label:<18} {len(data):>8} {enc * 1e6:>12.1f} {dec * 1e6:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare pickle and binary encodings of Board states')
+    parser.add_argument('--turns', default=30, type=int, help='Random turns played before measuring (default 30)')
+    parser.add_argument('--number', default=2000, type=int, help='Iterations per measurement (default 2000)')
+    parser.add_argument('--seed', default=1, type=int)
+    args = parser.parse_args()
+
+    board = mid_game_board(args.turns, args.seed)
+    base = board.version
+    player = board.playerOne if board.currentTurn == 0 else board.playerTwo
+    board.play(f"discard:{CARD_NAMES[player.hand[0]]}:0", board.currentTurn)
+    delta = board.delta_since(base)
+
+    print(f"{'state':<18} {'bytes':>8} {'encode us':>12} {'decode us':>12}")
+    measure('snapshot pickle', board, pickle.dumps, pickle.loads, args.number)
+    measure('snapshot binary', board, encode_state, decode_state, args.number)
+    measure('delta pickle', delta, pickle.dumps, pickle.loads, args.number)
+    measure('delta binary', delta, encode_state, decode_state, args.number)
+
+
+if __name__ == '__main__':
+    main()
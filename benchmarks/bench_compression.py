@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Bytes saved against CPU spent by compressing replies, per wire format and zlib level.
+
+Builds boards after --turns random discards (bench_codec's mid_game_board)
+and, for each format, a full snapshot ("get") and a one-turn delta ("sync")
+of each. Every payload is framed with Protocol.Compressor at each of
+--levels and read back with FrameDecoder. Reports per reply:
+
+- raw and sent bytes (replies under --min-bytes, or that don't shrink, go out as they are)
+- compress and decompress time in microseconds
+- microseconds of server CPU per KB saved
+
+A link sending 1 KB takes about 8 us at 1 Gbit/s, 80 us at 100 Mbit/s and
+800 us at 10 Mbit/s. Compression pays when the last column is well under
+that for the client's link.
+
+Usage:
+    python3 benchmarks/bench_compression.py --turns 0 30 60 --levels 1 6 9
+"""
+import argparse
+import os
+import pickle
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Game import CARD_NAMES, encode_state
+from Protocol import Compressor, FrameDecoder, pack_frame
+from bench_codec import mid_game_board
+
+FORMATS = (("pickle", pickle.dumps), ("binary", encode_state))
+
+
+def states(turns, seed):
+    board = mid_game_board(turns, seed)
+    base = board.version
+    player = board.playerOne if board.currentTurn == 0 else board.playerTwo
+    board.play(f"discard:{CARD_NAMES[player.hand[0]]}:0", board.currentTurn)
+    return (("snapshot", board), ("delta", board.delta_since(base)))
+
+
+def measure(payload, level, minSize, number):
+    compressor = Compressor(level, minSize)
+    frame = compressor.pack(payload)
+    packTime = timeit.timeit(lambda: compressor.pack(payload), number=number) / number
+    plainTime = timeit.timeit(lambda: pack_frame(payload), number=number) / number
+    readTime = timeit.timeit(lambda: FrameDecoder().feed(frame), number=number) / number
+    plainRead = timeit.timeit(lambda: FrameDecoder().feed(pack_frame(payload)), number=number) / number
+    return len(frame) - 5, max(0.0, packTime - plainTime), max(0.0, readTime - plainRead)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark reply compression: bytes saved against CPU spent')
+    parser.add_argument('--turns', default=[0, 30, 60], type=int, nargs='+',
+                        help='Random turns played before each measurement (default 0 30 60)')
+    parser.add_argument('--levels', default=[1, 6, 9], type=int, nargs='+', help='zlib levels (default 1 6 9)')
+    parser.add_argument('--min-bytes', default=256, type=int, help='Compressor minSize (default 256)')
+    parser.add_argument('--number', default=2000, type=int, help='Iterations per measurement (default 2000)')
+    parser.add_argument('--seed', default=1, type=int)
+    args = parser.parse_args()
+
+    print(f"{'turns':>5} {'reply':<16} {'level':>5} {'raw B':>7} {'sent B':>7} {'saved':>6} "
+          f"{'comp us':>8} {'decomp us':>9} {'us/KB saved':>11}")
+    for turns in args.turns:
+        for kind, state in states(turns, args.seed):
+            for name, encode in FORMATS:
+                payload = encode(state)
+                for level in args.levels:
+                    sent, packTime, readTime = measure(payload, level, args.min_bytes, args.number)
+                    saved = len(payload) - sent
+                    perKB = f"{packTime * 1e6 / (saved / 1024):>11.1f}" if saved > 0 else f"{'-':>11}"
+                    print(f"{turns:>5} {kind + ' ' + name:<16} {level:>5} {len(payload):>7} {sent:>7} "
+                          f"{saved / len(payload):>6.0%} {packTime * 1e6:>8.1f} {readTime * 1e6:>9.1f} {perKB}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Lock contention with many concurrent games, in process (no sockets).
+
+--games games are seated in a Lobby and each of their two players runs on
+its own thread issuing --ops commands through Session.handle (every
+--mutate-every commands a play, with the load generator's policy, if it
+is that player's turn; "get" otherwise), the way the threaded server does. Two locking schemes are compared:
+
+- per-game: the registry shards plus one lock per GameRoom (what the server uses)
+- global:   every room shares a single lock, i.e. all games serialised
+
+It reports commands/s and p50/p99 per-command latency across all threads.
+
+Usage:
+    python3 benchmarks/bench_contention.py --games 200 --ops 200
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Lobby import Lobby, Session
+from loadgen import next_play
+
+
+def seat(games, scheme):
+    lobby = Lobby()
+    shared = threading.Lock()
+    sessions = []
+    for _ in range(games * 2):
+        session = Session(lobby)
+        session.hello("hello:format=binary:")
+        sessions.append(session)
+        if scheme == 'global':
+            session.room.lock = shared
+    return sessions
+
+
+def player(session, ops, mutate_every, start, latencies):
+    rng = random.Random(session.p)
+    start.wait()
+    for i in range(ops):
+        command = "get"
+        if mutate_every and i % mutate_every == 0:
+            # Read under the lock so the other player's thread isn't caught halfway through a play
+            with session.room.lock:
+                seat, play = next_play(session.room.board, rng)
+            if seat == session.p:
+                command = play
+        t0 = time.perf_counter()
+        session.handle(command)
+        latencies.append(time.perf_counter() - t0)
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def bench(scheme, games, ops, mutate_every):
+    sessions = seat(games, scheme)
+    start = threading.Event()
+    latencies = [[] for _ in sessions]
+    threads = [threading.Thread(target=player, args=(session, ops, mutate_every, start, out))
+               for session, out in zip(sessions, latencies)]
+    for thread in threads:
+        thread.start()
+    t0 = time.perf_counter()
+    start.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - t0
+    merged = sorted(value for out in latencies for value in out)
+    return len(merged) / elapsed, percentile(merged, 0.5), percentile(merged, 0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-game and global locking with many concurrent games')
+    parser.add_argument('--games', default=200, type=int, help='Concurrent games, two threads each (default 200)')
+    parser.add_argument('--ops', default=200, type=int, help='Commands per player (default 200)')
+    parser.add_argument('--mutate-every', default=4, type=int, help='Play (on its turn) every N commands (default 4)')
+    args = parser.parse_args()
+
+    print(f"{'scheme':<10} {'commands/s':>12} {'p50 us':>10} {'p99 us':>10}")
+    for scheme in ('per-game', 'global'):
+        rate, p50, p99 = bench(scheme, args.games, args.ops, args.mutate_every)
+        print(f"{scheme:<10} {rate:>12.0f} {p50 * 1e6:>10.1f} {p99 * 1e6:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
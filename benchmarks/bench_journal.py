@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Cost of the move journal, and how long recovery takes.
+
+1. Per-move overhead: one game plays --number moves through
+   Session.handle (no sockets) with the load generator's policy, a won
+   game reset for the next, with no journal, with batched fsync every
+   --flush seconds, and with an fsync for every move.
+2. Recovery: --games games each play --moves moves into a journal, and
+   a fresh Lobby recovers them, once by replaying the whole journal and
+   once from a snapshot taken --tail moves before the end. Both must
+   rebuild identical boards.
+
+The journal lives in a temporary directory under --dir (default: the
+system temp dir), so point --dir at the disk the server would use.
+
+Usage:
+    python3 benchmarks/bench_journal.py --number 2000 --games 10000 --moves 20
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Game import encode_board
+from Journal import Journal
+from Lobby import Lobby
+from loadgen import next_play, seat_game
+
+
+def play(players, rng):
+    seat, command = next_play(players[0].room.board, rng)
+    players[seat].handle(command)
+
+
+def per_move(journal, number):
+    lobby = Lobby(journal=journal)
+    players = seat_game(lobby)
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for _ in range(number):
+        play(players, rng)
+    if journal is not None:
+        journal.flush()
+    return (time.perf_counter() - start) / number
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def recover(directory):
+    lobby = Lobby(journal=Journal(directory))
+    start = time.perf_counter()
+    lobby.recover()
+    elapsed = time.perf_counter() - start
+    return elapsed, {room.board.id: encode_board(room.board) for room in lobby.games.rooms()}
+
+
+def recovery(base, games, moves, tail):
+    """Recovery time for the same games from the full journal and from a snapshot plus tail."""
+    directory = tempfile.mkdtemp(dir=base)
+    journal = Journal(directory, flushInterval=1.0)
+    lobby = Lobby(journal=journal)
+    tables = [seat_game(lobby) for _ in range(games)]
+    rng = random.Random(0)
+    for _ in range(moves - tail):
+        for players in tables:
+            play(players, rng)
+    journal.flush()
+    # Keep the journal as it was before the snapshot, for the full replay
+    full = os.path.join(base, 'full')
+    shutil.copytree(directory, full)
+
+    journal.snapshot(lobby.capture)
+    for _ in range(tail):
+        for players in tables:
+            play(players, rng)
+    journal.close()
+    shutil.copy(os.path.join(directory, f'journal-{journal.segment:08d}.log'), full)
+
+    replay_time, replayed = recover(full)
+    snapshot_time, restored = recover(directory)
+    assert replayed == restored and len(restored) == games
+    return replay_time, directory_size(full), snapshot_time, directory_size(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark journaling overhead and recovery time')
+    parser.add_argument('--number', default=2000, type=int, help='Moves for the per-move measurement (default 2000)')
+    parser.add_argument('--flush', default=0.05, type=float, help='Batched fsync interval in seconds (default 0.05)')
+    parser.add_argument('--games', default=10000, type=int, help='Games to recover (default 10000)')
+    parser.add_argument('--moves', default=20, type=int, help='Moves per game before recovery (default 20)')
+    parser.add_argument('--tail', default=5, type=int, help='Moves per game after the snapshot (default 5)')
+    parser.add_argument('--dir', default=None, help='Where to put the journal (default: system temp dir)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='cards_journal_', dir=args.dir) as base:
+        print(f"{'journal':<22} {'us/move':>9} {'fsyncs':>7}")
+        baseline = per_move(None, args.number)
+        print(f"{'off':<22} {baseline * 1e6:>9.1f} {0:>7}")
+        for label, flush in ((f"batched ({args.flush * 1e3:.0f} ms)", args.flush), ("fsync every move", 0)):
+            journal = Journal(tempfile.mkdtemp(dir=base), flushInterval=flush)
+            journal.start(lambda: [], snapshotEvery=0)
+            cost = per_move(journal, args.number)
+            journal.close()
+            print(f"{label:<22} {cost * 1e6:>9.1f} {journal.syncs:>7}")
+
+        replay_time, size, snapshot_time, snapshot_size = recovery(base, args.games, args.moves, args.tail)
+        print(f"\nrecovering {args.games} games:")
+        print(f"  replay all {args.moves} moves/game:      {replay_time:>7.2f} s ({size / 1e6:.1f} MB)")
+        print(f"  snapshot + last {args.tail} moves/game: {snapshot_time:>7.2f} s ({snapshot_size / 1e6:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
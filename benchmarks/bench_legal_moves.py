@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Legal-move generation on typical mid-game boards.
+
+Deals --boards games and plays each for up to --turns turns with the load
+generator's policy, then times on every board, for the player whose turn
+it is:
+
+- list(Board.legal_moves(...)): every legal move (moves/s and us/board)
+- next(Board.legal_moves(...)): only the first, as the load generator asks
+- Board.legal(command, ...): the server's check of one command
+- Agent.find_moves: the agent's move list, built on legal_moves
+
+Usage:
+    python3 benchmarks/bench_legal_moves.py --boards 500 --turns 30 [--number 20]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Agent import Agent
+from loadgen import mid_game
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark legal-move generation on mid-game boards')
+    parser.add_argument('--boards', default=500, type=int, help='Boards to generate moves on (default 500)')
+    parser.add_argument('--turns', default=30, type=int, help='Turns played on each board first (default 30)')
+    parser.add_argument('--number', default=20, type=int, help='Passes over all boards per timing (default 20)')
+    args = parser.parse_args()
+
+    boards = [mid_game(seed, args.turns) for seed in range(args.boards)]
+    moves = [list(board.legal_moves(board.currentTurn)) for board in boards]
+    commands = [(board, str(move), board.currentTurn) for board, legal in zip(boards, moves) for move in legal]
+    total = sum(len(legal) for legal in moves)
+
+    agent = Agent.__new__(Agent)
+    agent.policy = 'greedy'
+
+    def find_moves():
+        for board in boards:
+            agent.player_id = board.currentTurn
+            agent.find_moves(board)
+
+    timings = (
+        ("all moves", lambda: [list(board.legal_moves(board.currentTurn)) for board in boards], len(boards)),
+        ("first move", lambda: [next(board.legal_moves(board.currentTurn), None) for board in boards], len(boards)),
+        ("legal(command)", lambda: [board.legal(command, seat) for board, command, seat in commands], len(commands)),
+        ("Agent.find_moves", find_moves, len(boards)),
+    )
+
+    print(f"{args.boards} boards, {total} legal moves ({total / args.boards:.1f} per board)")
+    print(f"{'operation':<18} {'us/call':>8} {'calls/s':>10}")
+    seconds = {}
+    for name, call, calls in timings:
+        elapsed = seconds[name] = min(timeit.repeat(call, number=args.number, repeat=5)) / args.number
+        print(f"{name:<18} {elapsed / calls * 1e6:>8.2f} {calls / elapsed:>10,.0f}")
+    print(f"moves/s: {total / seconds['all moves']:,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Per-move latency with the server's logging off, synchronous, and queued.
+
+One game plays --number discards through Session.handle (no sockets),
+each of which logs a "played" line at INFO, with the "GameServer" logger
+set up as:
+
+- off:          level WARNING, so the per-move lines are skipped
+- sync:         a handler per output writing in the calling thread, as the server used to
+- queued:       QueueLogHandler + LogWriter writing both in the background
+- queued 1/N:   the same, logging only every --sample-th move
+
+Both outputs are files in a temp dir (the "stdout" one stands in for a
+container log pipe). --stall-ms makes every --stall-every-th write to them
+sleep, to show a slow disk or log reader; with the queue that time is
+spent on the writer thread instead of in the move.
+
+Usage:
+    python3 benchmarks/bench_logging.py --number 20000 [--stall-ms 20 --stall-every 500]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Lobby import Lobby
+from LogWriter import LogWriter, QueueLogHandler, RotatingFile
+from bench_journal import discard, seat_game
+
+FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+class StallingFile:
+    '''File wrapper whose every Nth write sleeps for stall seconds.'''
+    def __init__(self, file, stall, every):
+        self.file = file
+        self.stall = stall
+        self.every = every
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        if self.stall and self.writes % self.every == 0:
+            time.sleep(self.stall)
+        return self.file.write(text)
+
+    def flush(self):
+        if hasattr(self.file, 'flush'):
+            self.file.flush()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def outputs(directory, label, stall, every, queued):
+    files = []
+    for name in ('server.log', 'stdout.log'):
+        path = os.path.join(directory, f"{label.replace(' ', '_').replace('/', '_')}-{name}")
+        files.append(StallingFile(RotatingFile(path) if queued else open(path, 'a'), stall, every))
+    return files
+
+
+def run(label, number, directory, stall, every, mode, sample=1):
+    logger = logging.getLogger("GameServer")
+    logger.handlers.clear()
+    logger.propagate = False
+    logger.setLevel(logging.WARNING if mode == 'off' else logging.INFO)
+    formatter = logging.Formatter(FORMAT)
+    writer = None
+    if mode == 'sync':
+        for output in outputs(directory, label, stall, every, queued=False):
+            handler = logging.StreamHandler(output)
+            handler.setFormatter(formatter)
+            logger.addHandler(handler)
+    elif mode == 'queued':
+        handler = QueueLogHandler(capacity=number * 2)
+        logger.addHandler(handler)
+        writer = LogWriter(handler, outputs(directory, label, stall, every, queued=True), formatter).start()
+
+    players = seat_game(Lobby(moveLogEvery=sample))
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(number):
+        before = time.perf_counter()
+        discard(players)
+        latencies.append(time.perf_counter() - before)
+    elapsed = time.perf_counter() - start
+    if writer is not None:
+        writer.stop()
+    logger.handlers.clear()
+    return elapsed / number, percentile(latencies, 0.5), percentile(latencies, 0.99), max(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark per-move latency with logging off, synchronous and queued')
+    parser.add_argument('--number', default=20000, type=int, help='Moves per run (default 20000)')
+    parser.add_argument('--sample', default=10, type=int, help='Log one in N moves for the sampled run (default 10)')
+    parser.add_argument('--stall-ms', default=0, type=float, help='Sleep this long on every --stall-every-th log write (default 0)')
+    parser.add_argument('--stall-every', default=500, type=int, help='How often a log write stalls (default 500)')
+    parser.add_argument('--dir', default=None, help='Where to write the logs (default: system temp dir)')
+    args = parser.parse_args()
+
+    runs = (("off", "off", 1), ("sync", "sync", 1), ("queued", "queued", 1),
+            (f"queued 1/{args.sample}", "queued", args.sample))
+    with tempfile.TemporaryDirectory(prefix='cards_logging_', dir=args.dir) as directory:
+        print(f"{'logging':<14} {'mean us':>8} {'p50 us':>8} {'p99 us':>8} {'max ms':>8}")
+        for label, mode, sample in runs:
+            mean, p50, p99, worst = run(label, args.number, directory, args.stall_ms / 1e3, args.stall_every,
+                                        mode, sample)
+            print(f"{label:<14} {mean * 1e6:>8.1f} {p50 * 1e6:>8.1f} {p99 * 1e6:>8.1f} {worst * 1e3:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Matchmaking under load: queue depth and time-to-match for a stream of arrivals.
+
+Players arrive at --rate per second for --seconds with ratings drawn from a
+normal distribution, each on its own thread (so batched joins can block).
+Once seated a player stays --lifetime seconds on average, then leaves;
+with --abandon a fraction of them leave mid-game and their seats are
+requeued. Matchmaker settings mirror the Server.py options.
+
+Usage:
+    python3 benchmarks/bench_matchmaker.py --rate 200 --seconds 5 --rating-bucket 100
+    python3 benchmarks/bench_matchmaker.py --rate 200 --match-batch 32 --match-window 0.5
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Matchmaker import Matchmaker
+
+
+def player(mm, rating, lifetime, abandon, rng_seed):
+    rng = random.Random(rng_seed)
+    p, gameId = mm.join(rating)
+    # Abandoners leave quickly; everyone else plays out a game
+    time.sleep(rng.expovariate(1 / lifetime) * (0.1 if rng.random() < abandon else 1))
+    mm.leave(gameId, p)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure matchmaking queue depth and time-to-match')
+    parser.add_argument('--rate', default=200, type=float, help='Arrivals per second (default 200)')
+    parser.add_argument('--seconds', default=5.0, type=float, help='How long players keep arriving (default 5)')
+    parser.add_argument('--lifetime', default=1.0, type=float, help='Mean seconds a player stays seated (default 1)')
+    parser.add_argument('--abandon', default=0.1, type=float, help='Fraction of players who leave early (default 0.1)')
+    parser.add_argument('--rating-bucket', default=0, type=int, help='Rating band width (default 0 = off)')
+    parser.add_argument('--widen-after', default=10.0, type=float)
+    parser.add_argument('--match-batch', default=1, type=int)
+    parser.add_argument('--match-window', default=1.0, type=float)
+    parser.add_argument('--seed', default=1, type=int)
+    args = parser.parse_args()
+
+    mm = Matchmaker(bucketWidth=args.rating_bucket, widenAfter=args.widen_after,
+                    batchSize=args.match_batch, batchWindow=args.match_window)
+    rng = random.Random(args.seed)
+    threads = []
+    depths = []
+    start = time.monotonic()
+    next_arrival = start
+    while time.monotonic() - start < args.seconds:
+        now = time.monotonic()
+        if now < next_arrival:
+            time.sleep(next_arrival - now)
+        rating = int(rng.gauss(1500, 300))
+        thread = threading.Thread(target=player, args=(mm, rating, args.lifetime, args.abandon, rng.random()),
+                                  daemon=True)
+        thread.start()
+        threads.append(thread)
+        depths.append(mm.queueDepth())
+        next_arrival += rng.expovariate(args.rate)
+    for thread in threads:
+        thread.join()
+
+    stats = mm.stats()
+    print(f"arrivals:          {len(threads)}")
+    print(f"matches:           {stats['matches']}")
+    print(f"requeued seats:    {stats['requeued']}")
+    print(f"queue depth:       mean {sum(depths) / len(depths):.1f}, max {max(depths)}")
+    if 'match_p50' in stats:
+        print(f"time to match (ms): p50 {stats['match_p50'] * 1e3:.1f}, p99 {stats['match_p99'] * 1e3:.1f}, "
+              f"max {stats['match_max'] * 1e3:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Hot-path cost of the metrics instrumentation.
+
+Seats one player in a Lobby, still waiting for an opponent so that every
+"reset" is accepted (one mid-game is refused), and issues --number
+commands of each kind through Session.respond (no sockets, so only the
+server-side work is measured), once with metrics off and once with a
+Metrics instance attached. Also times
+Metrics.observe on its own and one render() of the exposition text.
+
+With --connections N it then starts each server mode without and with
+--metrics-port and compares end-to-end "get" requests/s over N sockets.
+
+Usage:
+    python3 benchmarks/bench_metrics.py --number 50000 [--connections 200 --requests 50]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Lobby import Lobby, Session
+from Metrics import Metrics
+from bench_server import bench as bench_sockets, free_port, start_server
+
+
+def bench(metrics, command, number):
+    lobby = Lobby(metrics=metrics)
+    session = Session(lobby)
+    session.respond("hello:format=binary:")
+    # Best of three runs to keep scheduler noise out of a sub-microsecond difference
+    best = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(number):
+            session.respond(command)
+        best = min(best, time.perf_counter() - start)
+    return best / number
+
+
+def bench_server(mode, metrics, connections, requests):
+    port = free_port()
+    args = ('--metrics-port', str(free_port())) if metrics else ()
+    # A fresh log directory per run so readiness isn't read from the previous server's log
+    with tempfile.TemporaryDirectory(prefix='cards_bench_') as log_dir:
+        process = start_server(mode, port, log_dir, *args)
+        try:
+            _, rate = asyncio.run(bench_sockets(port, connections, requests, 1))
+        finally:
+            process.terminate()
+            process.wait()
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the overhead of per-command metrics')
+    parser.add_argument('--number', default=50000, type=int, help='Commands per measurement (default 50000)')
+    parser.add_argument('--connections', default=0, type=int, help='Also compare servers over this many sockets (default 0 = skip)')
+    parser.add_argument('--requests', default=50, type=int, help='"get" round trips per socket (default 50)')
+    args = parser.parse_args()
+
+    print(f"{'command':<10} {'off us':>8} {'on us':>8} {'overhead':>9}")
+    for command in ("get", "sync:0:", "reset"):
+        off = bench(None, command, args.number)
+        on = bench(Metrics(), command, args.number)
+        print(f"{command:<10} {off * 1e6:>8.2f} {on * 1e6:>8.2f} {(on - off) / off:>8.1%}")
+
+    metrics = Metrics()
+    start = time.perf_counter()
+    for _ in range(args.number):
+        metrics.observe("get", 0.0001, 1200)
+    observe = (time.perf_counter() - start) / args.number
+    start = time.perf_counter()
+    text = metrics.render()
+    render = time.perf_counter() - start
+    print(f"\nMetrics.observe: {observe * 1e9:.0f} ns/call; render: {render * 1e3:.2f} ms ({len(text)} bytes)")
+
+    if args.connections:
+        print(f"\n{'mode':<10} {'off req/s':>10} {'on req/s':>10} {'change':>8}")
+        for mode in ('threaded', 'asyncio'):
+            off = bench_server(mode, False, args.connections, args.requests)
+            on = bench_server(mode, True, args.connections, args.requests)
+            print(f"{mode:<10} {off:>10.0f} {on:>10.0f} {(on - off) / off:>7.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Board.play throughput: how fast the rules resolve and apply commands.
+
+Plays --games games of up to --turns turns with the load generator's
+policy (move a card to the field when one fits, otherwise discard) and
+records each game's commands. Then times replaying those commands on fresh
+boards from the same seeds, --repeat times, and reports plays/s and the
+mean microseconds per play for each action. commit() runs after every play
+either way, so it is also timed on its own and subtracted in the last
+column.
+
+Usage:
+    python3 benchmarks/bench_play.py --games 200 --turns 60 [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Game import Board
+from loadgen import mid_game
+
+
+def record(seed, turns):
+    """The commands of one game played by the load generator's policy."""
+    commands = []
+    mid_game(seed, turns, commands)
+    return commands
+
+
+def replay(games, seconds):
+    for seed, commands in games:
+        board = Board(seed, seed=seed)
+        board.startGame()
+        play, clock = board.play, time.perf_counter
+        for command, seat in commands:
+            start = clock()
+            play(command, seat)
+            seconds[command.split(':', 1)[0]].append(clock() - start)
+
+
+def timing(call, number=10000):
+    start = time.perf_counter()
+    for _ in range(number):
+        call()
+    return (time.perf_counter() - start) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Board.play throughput')
+    parser.add_argument('--games', default=200, type=int, help='Games to record (default 200)')
+    parser.add_argument('--turns', default=60, type=int, help='Most commands per game (default 60)')
+    parser.add_argument('--repeat', default=5, type=int, help='Replays of every game (default 5)')
+    args = parser.parse_args()
+
+    games = [(seed, record(seed, args.turns)) for seed in range(args.games)]
+    seconds = {"move": [], "discard": [], "deal": []}
+    for _ in range(args.repeat):
+        replay(games, seconds)
+
+    board = Board(0, seed=0)
+    board.startGame()
+    commit = min(timing(board.commit) for _ in range(5))
+
+    total = sum(len(times) for times in seconds.values())
+    elapsed = sum(sum(times) for times in seconds.values())
+    print(f"{'action':<8} {'plays':>8} {'us/play':>8} {'less commit':>12}")
+    for action, times in seconds.items():
+        if times:
+            mean = sum(times) / len(times)
+            print(f"{action:<8} {len(times):>8} {mean * 1e6:>8.2f} {(mean - commit) * 1e6:>12.2f}")
+    print(f"{'all':<8} {total:>8} {elapsed / total * 1e6:>8.2f} {(elapsed / total - commit) * 1e6:>12.2f}")
+    print(f"plays/s: {total / elapsed:,.0f}")
+
+
+if __name__ == '__main__':
+    main()
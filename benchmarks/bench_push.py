@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Measure what subscribe/long-poll saves over "sync" polling for idle games.
+
+For each client style the server is started as a subprocess, --games games
+(two players each) are seated and left idle for --seconds while every
+player waits for the opponent the way that style does:
+
+- poll:      "sync:<version>:" at --hz per player (Display used to do this at 60 FPS)
+- wait:      "wait:<version>:<timeout>" long-polls that only return on change or timeout
+- subscribe: one "subscribe:<version>:", then nothing until the server pushes
+
+It reports requests/s the server had to answer and the server's CPU time
+(user+system from /proc/<pid>/stat, so Linux only) over the idle period.
+
+Usage:
+    python3 benchmarks/bench_push.py --games 500 --seconds 5 --hz 60
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from Game import decode_state
+from Protocol import pack_frame
+from bench_server import free_port, open_player, read_frames, start_server
+
+STYLES = ('poll', 'wait', 'subscribe')
+
+
+def cpu_seconds(pid):
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    # utime and stime are fields 14 and 15 of the full line
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+async def idle_player(style, reader, writer, decoder, version, seconds, hz, timeout):
+    requests = 0
+    deadline = time.perf_counter() + seconds
+    if style == 'subscribe':
+        writer.write(pack_frame(f'subscribe:{version}:'))
+        await read_frames(reader, decoder, 1)
+        await asyncio.sleep(seconds)
+        return 1
+    while time.perf_counter() < deadline:
+        if style == 'poll':
+            writer.write(pack_frame(f'sync:{version}:'))
+        else:
+            writer.write(pack_frame(f'wait:{version}:{timeout}'))
+        requests += 1
+        await read_frames(reader, decoder, 1)
+        if style == 'poll':
+            await asyncio.sleep(1 / hz)
+    return requests
+
+
+async def bench(port, pid, style, games, seconds, hz):
+    players = []
+    for i in range(0, games * 2, 50):
+        players += await asyncio.gather(*(open_player(port) for _ in range(min(50, games * 2 - i))))
+
+    # Every style asks about the version the player really has, like Network does
+    versions = []
+    for reader, writer, decoder in players:
+        writer.write(pack_frame('get'))
+        versions.append(decode_state((await read_frames(reader, decoder, 1))[0][1]).version)
+
+    cpu = cpu_seconds(pid)
+    start = time.perf_counter()
+    counts = await asyncio.gather(*(idle_player(style, r, w, d, v, seconds, hz, timeout=1.0)
+                                    for (r, w, d), v in zip(players, versions)))
+    elapsed = time.perf_counter() - start
+    cpu = cpu_seconds(pid) - cpu
+
+    for _, writer, _ in players:
+        writer.close()
+    return sum(counts) / elapsed, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sync polling vs wait vs subscribe for idle games')
+    parser.add_argument('--games', default=200, type=int, help='Idle games, two players each (default 200)')
+    parser.add_argument('--seconds', default=5.0, type=float, help='Idle period to measure (default 5)')
+    parser.add_argument('--hz', default=60, type=float, help='Polling rate per player for "poll" (default 60)')
+    parser.add_argument('--mode', default='asyncio', choices=['threaded', 'asyncio'], help='Server mode')
+    parser.add_argument('--styles', default=','.join(STYLES), help='Comma separated client styles to run')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='cards_bench_') as log_dir:
+        print(f"{'style':<10} {'requests/s':>12} {'server cpu s':>13}")
+        for style in args.styles.split(','):
+            port = free_port()
+            # A fresh log directory per run, since readiness is read from the log
+            run_dir = os.path.join(log_dir, style)
+            os.mkdir(run_dir)
+            process = start_server(args.mode, port, run_dir)
+            try:
+                rate, cpu = asyncio.run(bench(port, process.pid, style, args.games, args.seconds, args.hz))
+            finally:
+                process.terminate()
+                process.wait()
+            print(f"{style:<10} {rate:>12.0f} {cpu:>13.2f}")
+
+
+if __name__ == '__main__':
+    main()
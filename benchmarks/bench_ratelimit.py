@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Does a flooding client hurt everyone else's latency, with and without rate limits?
+
+The server is started as a subprocess with no limits, and again with
+--read-rate/--move-rate. Each time --games quiet games are seated and one
+player in each sends "get" at --hz, timing every reply. Meanwhile a
+separate process opens --noisy connections that send "get" as fast as the
+server answers, --pipeline at a time (an agent with --delay 0, or worse).
+
+Reports the quiet players' latency p50/p99 and how many replies/s the
+noisy connections got out of the server, plus a baseline run without the
+flood. --server-args="--no-snapshot-cache" makes every "get" a full
+encode, as before the snapshot cache.
+
+Usage:
+    python3 benchmarks/bench_ratelimit.py --games 50 --noisy 4 --seconds 5 --read-rate 60
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import shlex
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from Protocol import pack_frame
+from bench_server import free_port, open_player, read_frames, start_server
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def flood(port, connections, pipeline, seconds):
+    players = [await open_player(port) for _ in range(connections)]
+    replies = 0
+    deadline = time.perf_counter() + seconds
+
+    async def one(reader, writer, decoder):
+        nonlocal replies
+        while time.perf_counter() < deadline:
+            writer.write(pack_frame('get') * pipeline)
+            await read_frames(reader, decoder, pipeline)
+            replies += pipeline
+
+    await asyncio.gather(*(one(*player) for player in players))
+    for _, writer, _ in players:
+        writer.close()
+    return replies
+
+
+def flood_process(port, connections, pipeline, seconds, result):
+    result.value = asyncio.run(flood(port, connections, pipeline, seconds))
+
+
+async def quiet(port, games, hz, seconds, started):
+    players = [await open_player(port) for _ in range(games * 2)]
+    started.set()
+    latencies = []
+    deadline = time.perf_counter() + seconds
+
+    async def poll(reader, writer, decoder):
+        while time.perf_counter() < deadline:
+            sent = time.perf_counter()
+            writer.write(pack_frame('get'))
+            await read_frames(reader, decoder, 1)
+            latencies.append(time.perf_counter() - sent)
+            await asyncio.sleep(1 / hz)
+
+    # One player of each game polls; the other sits idle
+    await asyncio.gather(*(poll(*player) for player in players[::2]))
+    for _, writer, _ in players:
+        writer.close()
+    return latencies
+
+
+def run(mode, log_dir, args, server_args, noisy):
+    port = free_port()
+    process = start_server(mode, port, log_dir, *server_args)
+    try:
+        started = multiprocessing.Event()
+        result = multiprocessing.Value('l', 0)
+
+        async def measure():
+            task = asyncio.ensure_future(quiet(port, args.games, args.hz, args.seconds, started))
+            while not started.is_set():
+                await asyncio.sleep(0.01)
+            if noisy == 0:
+                return await task
+            flooder = multiprocessing.Process(target=flood_process,
+                                              args=(port, noisy, args.pipeline, args.seconds, result))
+            flooder.start()
+            latencies = await task
+            flooder.join()
+            return latencies
+
+        latencies = asyncio.run(measure())
+    finally:
+        process.terminate()
+        process.wait()
+    return percentile(latencies, 0.5), percentile(latencies, 0.99), result.value / args.seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark quiet-game latency next to a flooding client')
+    parser.add_argument('--games', default=50, type=int, help='Quiet games (default 50)')
+    parser.add_argument('--hz', default=10, type=float, help='"get" rate of each quiet player (default 10)')
+    parser.add_argument('--noisy', default=4, type=int, help='Flooding connections (default 4)')
+    parser.add_argument('--pipeline', default=8, type=int, help='Requests each flooding connection keeps in flight (default 8)')
+    parser.add_argument('--seconds', default=5.0, type=float, help='Measurement period (default 5)')
+    parser.add_argument('--read-rate', default=60, type=float, help='--read-rate for the limited run (default 60)')
+    parser.add_argument('--move-rate', default=20, type=float, help='--move-rate for the limited run (default 20)')
+    parser.add_argument('--mode', default='threaded', choices=['threaded', 'asyncio'], help='Server mode')
+    parser.add_argument('--server-args', default='', help='Extra Server.py arguments for every run')
+    args = parser.parse_args()
+
+    extra = shlex.split(args.server_args)
+    limited = extra + ['--read-rate', str(args.read_rate), '--move-rate', str(args.move_rate)]
+    runs = (("no flood", extra, 0), ("off", extra, args.noisy),
+            (f"read {args.read_rate:g}/s, move {args.move_rate:g}/s", limited, args.noisy))
+    with tempfile.TemporaryDirectory(prefix='cards_bench_') as log_dir:
+        print(f"{'limits':<24} {'quiet p50 ms':>13} {'quiet p99 ms':>13} {'noisy replies/s':>16}")
+        for label, server_args, noisy in runs:
+            run_dir = tempfile.mkdtemp(dir=log_dir)
+            p50, p99, flooded = run(args.mode, run_dir, args, server_args, noisy)
+            print(f"{label:<24} {p50 * 1e3:>13.2f} {p99 * 1e3:>13.2f} {flooded:>16.0f}")
+
+
+if __name__ == '__main__':
+    main()
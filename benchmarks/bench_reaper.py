@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Memory of a long-running lobby under churn, with and without the idle reaper.
+
+Every round --games new games are seated and play a few moves, then their
+players walk away without closing (the dead clients and abandoned tabs a
+server sees in production). Without the reaper those games stay in the
+lobby forever; with it they are evicted --idle seconds after their last
+command. Prints live games and process RSS after each round.
+
+Usage:
+    python3 benchmarks/bench_reaper.py --rounds 10 --games 2000 --idle 0.5
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Game import CARD_NAMES
+from Lobby import Lobby
+from Reaper import Reaper
+from loadgen import seat_game
+
+
+def rss_kb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def churn(lobby, games, moves):
+    for _ in range(games):
+        players = seat_game(lobby)
+        board = players[0].room.board
+        for _ in range(moves):
+            hand = (board.playerOne if board.currentTurn == 0 else board.playerTwo).hand
+            players[board.currentTurn].handle(f"discard:{CARD_NAMES[hand[0]]}:{board.version % 4}")
+
+
+def run(label, rounds, games, moves, idle):
+    lobby = Lobby()
+    if idle > 0:
+        lobby.reaper = Reaper(lobby, idleTimeout=idle, finishedTimeout=idle, tick=idle / 5).start()
+    print(f"\n{label}")
+    print(f"{'round':>5} {'live games':>11} {'RSS MB':>8}")
+    for n in range(1, rounds + 1):
+        churn(lobby, games, moves)
+        # Give the reaper time to catch up with the round's games
+        time.sleep(idle * 2 if idle > 0 else 0)
+        gc.collect()
+        print(f"{n:>5} {len(lobby.games):>11} {rss_kb() / 1024:>8.1f}")
+    if lobby.reaper is not None:
+        lobby.reaper.stop()
+        print(f"reaper: {lobby.reaper.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark lobby memory under churn with and without the reaper')
+    parser.add_argument('--rounds', default=10, type=int, help='Rounds of churn (default 10)')
+    parser.add_argument('--games', default=2000, type=int, help='Games abandoned per round (default 2000)')
+    parser.add_argument('--moves', default=4, type=int, help='Moves per game before it is abandoned (default 4)')
+    parser.add_argument('--idle', default=0.5, type=float, help='Reaper idle/finished timeout in seconds (default 0.5)')
+    args = parser.parse_args()
+
+    # With the reaper first, so the run without it cannot lend it freed heap
+    run(f"reaper on (idle {args.idle}s)", args.rounds, args.games, args.moves, args.idle)
+    run("reaper off", args.rounds, args.games, args.moves, 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Search throughput: nodes per second exploring move trees with Board.apply/undo.
+
+Plays --boards games for up to --turns turns with the load generator's
+policy, then from every board searches every line of play --depth plays
+deep (the player whose turn it is after each play moves next), two ways:
+
+- apply/undo: one board, each move applied and then undone
+- copy+play: a Board.copy() per node, played with the command
+
+Both visit the same nodes; plays whose deal finds the deck empty are
+skipped. Reports nodes, nodes/s and how much faster apply/undo is.
+
+Usage:
+    python3 benchmarks/bench_search.py --boards 50 --turns 20 --depth 3
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from loadgen import mid_game
+
+
+def search_undo(board, depth):
+    nodes = 1
+    if depth:
+        for move in list(board.legal_moves(board.currentTurn)):
+            try:
+                record = board.apply(move)
+            except IndexError:
+                continue
+            nodes += search_undo(board, depth - 1)
+            board.undo(record)
+    return nodes
+
+
+def search_copy(board, depth):
+    nodes = 1
+    if depth:
+        for move in list(board.legal_moves(board.currentTurn)):
+            child = board.copy()
+            try:
+                child.play(str(move), board.currentTurn)
+            except IndexError:
+                continue
+            nodes += search_copy(child, depth - 1)
+    return nodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark move-tree search with apply/undo')
+    parser.add_argument('--boards', default=50, type=int, help='Boards to search from (default 50)')
+    parser.add_argument('--turns', default=20, type=int, help='Turns played on each board first (default 20)')
+    parser.add_argument('--depth', default=3, type=int, help='Plays searched from each board (default 3)')
+    args = parser.parse_args()
+
+    boards = [mid_game(seed, args.turns) for seed in range(args.boards)]
+    print(f"{'method':<12} {'nodes':>10} {'seconds':>8} {'nodes/s':>10}")
+    rates = {}
+    for name, search in (("apply/undo", search_undo), ("copy+play", search_copy)):
+        start = time.perf_counter()
+        nodes = sum(search(board, args.depth) for board in boards)
+        elapsed = time.perf_counter() - start
+        rates[name] = nodes / elapsed
+        print(f"{name:<12} {nodes:>10} {elapsed:>8.2f} {rates[name]:>10,.0f}")
+    print(f"apply/undo is {rates['apply/undo'] / rates['copy+play']:.1f}x copy+play")
+
+
+if __name__ == '__main__':
+    main()
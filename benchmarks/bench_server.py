@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Compare the threaded and asyncio server modes.
+
+Each mode is started as a subprocess on a free port. The benchmark then opens
+--connections sockets (paired into games by the server) and issues --requests
+"get" requests on every one of them concurrently (--pipeline of them per
+round trip), reporting:
+
+- connections/s: how fast the server accepts and seats new players
+- requests/s:    "get" replies received per second across all sockets
+
+Usage:
+    python3 benchmarks/bench_server.py --connections 1000 --requests 20
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from Protocol import FrameDecoder, pack_frame
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode, port, log_dir, *args):
+    env = os.environ.copy()
+    env['LOG_PATH'] = os.path.join(log_dir, f'{mode}.log')
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'Server.py'), '--mode', mode, '--port', str(port), *args],
+                               cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        if os.path.exists(env['LOG_PATH']) and 'Server Started' in open(env['LOG_PATH']).read():
+            return process
+        time.sleep(0.05)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+async def read_frames(reader, decoder, count):
+    frames = []
+    while len(frames) < count:
+        chunk = await reader.read(65536)
+        if not chunk:
+            raise ConnectionError("server closed the connection")
+        frames += decoder.feed(chunk)
+    return frames
+
+
+async def open_player(port):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    decoder = FrameDecoder()
+    writer.write(pack_frame('hello:format=binary:'))
+    await read_frames(reader, decoder, 1)  # greeting with the player id
+    return reader, writer, decoder
+
+
+async def run_requests(reader, writer, decoder, count, pipeline):
+    for _ in range(count // pipeline):
+        writer.write(pack_frame('get') * pipeline)
+        await writer.drain()
+        await read_frames(reader, decoder, pipeline)
+
+
+async def bench(port, connections, requests, pipeline):
+    start = time.perf_counter()
+    # Connect sequentially in small batches so seating order (and pairing) stays deterministic
+    players = []
+    for i in range(0, connections, 50):
+        players += await asyncio.gather(*(open_player(port) for _ in range(min(50, connections - i))))
+    connect_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_requests(r, w, d, requests, pipeline) for r, w, d in players))
+    request_time = time.perf_counter() - start
+
+    for _, writer, _ in players:
+        writer.close()
+    return connections / connect_time, connections * requests / request_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark threaded vs asyncio server modes')
+    parser.add_argument('--connections', default=500, type=int, help='Concurrent client sockets (default 500)')
+    parser.add_argument('--requests', default=20, type=int, help='"get" round trips per socket (default 20)')
+    parser.add_argument('--pipeline', default=1, type=int, help='Requests sent per round trip (default 1)')
+    parser.add_argument('--modes', default='threaded,asyncio', help='Comma separated server modes to run')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='cards_bench_') as log_dir:
+        print(f"{'mode':<10} {'connections/s':>14} {'requests/s':>12}")
+        for mode in args.modes.split(','):
+            port = free_port()
+            process = start_server(mode, port, log_dir)
+            try:
+                conn_rate, req_rate = asyncio.run(bench(port, args.connections, args.requests, args.pipeline))
+            finally:
+                process.terminate()
+                process.wait()
+            print(f"{mode:<10} {conn_rate:>14.0f} {req_rate:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
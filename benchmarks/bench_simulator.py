@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Self-play throughput: the batched NumPy simulator against Board games one at a time.
+
+Plays --games games to the end in batches of --batch with each policy of
+Simulator (greedy: the first field move that fits, else a random discard;
+random: any legal play) and reports games and plays per second and games
+per minute. For scale, the board row plays --board-games games on
+Game.Board one at a time with the load generator's policy, a game ending
+when it is won or the deck runs dry.
+
+Usage:
+    python3 benchmarks/bench_simulator.py --games 20000 --batch 4096 [--board-games 500]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Game import Board
+from loadgen import choose
+from Simulator import BatchSimulator, greedy_policy, random_policy
+
+
+def simulate(games, batch, policy):
+    plays = 0
+    for first in range(0, games, batch):
+        sim = BatchSimulator(range(first, min(first + batch, games)))
+        sim.run(policy)
+        plays += int(sim.plays.sum())
+    return plays
+
+
+def board_games(games):
+    plays = 0
+    for seed in range(games):
+        board = Board(seed, seed=seed)
+        board.startGame()
+        rng = random.Random(seed)
+        try:
+            while board.winner is None:
+                board.play(choose(board, board.currentTurn, rng), board.currentTurn)
+                plays += 1
+        except IndexError:
+            pass
+    return plays
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark batched self-play')
+    parser.add_argument('--games', default=20000, type=int, help='Games per simulator policy (default 20000)')
+    parser.add_argument('--batch', default=4096, type=int, help='Games simulated at once (default 4096)')
+    parser.add_argument('--board-games', default=500, type=int, help='Games played on Board (default 500)')
+    args = parser.parse_args()
+
+    runs = (
+        ("board", args.board_games, lambda: board_games(args.board_games)),
+        ("greedy", args.games, lambda: simulate(args.games, args.batch, greedy_policy(np.random.default_rng(0)))),
+        ("random", args.games, lambda: simulate(args.games, args.batch, random_policy(np.random.default_rng(0)))),
+    )
+    print(f"{'policy':<8} {'games':>7} {'plays':>9} {'seconds':>8} {'plays/s':>10} {'games/min':>11}")
+    for name, games, run in runs:
+        start = time.perf_counter()
+        plays = run()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<8} {games:>7} {plays:>9} {elapsed:>8.2f} {plays / elapsed:>10,.0f} {games / elapsed * 60:>11,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+"get" throughput with the per-version snapshot cache on and off.
+
+Seats one game in a Lobby plus --readers extra sessions reading it, then
+issues --number "get" commands round-robin across all of them through
+Session.handle (no sockets, so only the server-side work is measured).
+Every --mutate-every gets the player whose turn it is plays (the load
+generator's policy, with a won game reset), which bumps the version and
+invalidates the cached snapshot.
+
+Usage:
+    python3 benchmarks/bench_snapshot.py --readers 4 --number 20000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Lobby import Lobby, Session
+from loadgen import next_play
+
+
+def bench(cache, wire_format, readers, number, mutate_every):
+    lobby = Lobby(snapshotCache=cache)
+    players = []
+    for _ in range(2):
+        session = Session(lobby)
+        session.hello(f"hello:format={wire_format}:")
+        players.append(session)
+    # Extra readers share the game's room the way watchers of the same board would
+    sessions = players + [Session(lobby) for _ in range(readers)]
+    for reader in sessions[2:]:
+        reader.gameId, reader.p, reader.format = players[0].gameId, 0, wire_format
+
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for i in range(number):
+        if mutate_every and i % mutate_every == 0:
+            seat, command = next_play(players[0].room.board, rng)
+            players[seat].handle(command)
+        sessions[i % len(sessions)].handle("get")
+    elapsed = time.perf_counter() - start
+    hits, misses = lobby.snapshotStats()
+    return number / elapsed, hits, misses
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark "get" with and without the snapshot cache')
+    parser.add_argument('--readers', default=4, type=int, help='Sessions reading the game besides its players')
+    parser.add_argument('--number', default=20000, type=int, help='"get" commands to issue (default 20000)')
+    parser.add_argument('--mutate-every', default=100, type=int, help='Play a move every N gets (0 = never)')
+    args = parser.parse_args()
+
+    print(f"{'format':<8} {'cache':<6} {'gets/s':>10} {'hits':>8} {'misses':>8}")
+    for wire_format in ('pickle', 'binary'):
+        for cache in (False, True):
+            rate, hits, misses = bench(cache, wire_format, args.readers, args.number, args.mutate_every)
+            print(f"{wire_format:<8} {'on' if cache else 'off':<6} {rate:>10.0f} {hits:>8} {misses:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Fan-out latency of spectator pushes against the number of spectators.
+
+For each count in --spectators the server is started as a subprocess, one
+game is seated, and that many spectators join it ("hello:...,spectate=<id>:")
+and subscribe. They are spread over --procs client processes so reading
+hundreds of sockets isn't the bottleneck. The players then make --moves
+plays, --interval apart, whoever's turn it is playing with the load
+generator's policy, noting time.monotonic() as each is sent; the
+spectators note it as each push arrives (CLOCK_MONOTONIC is shared between
+processes on Linux).
+
+Per move it takes the delay until each spectator had that version and
+reports the p50 over all deliveries and the p50/max of the last spectator
+to get each move. Also reports the player's own reply time, which should
+not grow with the audience.
+
+Usage:
+    python3 benchmarks/bench_spectators.py --spectators 10 100 500 --moves 50
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from Game import decode_state
+from Protocol import FrameDecoder, pack_frame
+from bench_server import free_port, open_player, read_frames, start_server
+from loadgen import next_play
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def open_spectator(port, gameId):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    decoder = FrameDecoder()
+    writer.write(pack_frame(f'hello:format=binary,spectate={gameId}:'))
+    await read_frames(reader, decoder, 1)
+    writer.write(pack_frame('subscribe:-1:'))
+    await read_frames(reader, decoder, 1)
+    return reader, writer, decoder
+
+
+async def watch(reader, decoder, stop):
+    """Return (payload, arrival time) for every push until stop is set and the socket goes quiet."""
+    arrivals = []
+    while True:
+        try:
+            chunk = await asyncio.wait_for(reader.read(65536), 0.2)
+        except asyncio.TimeoutError:
+            if stop.is_set():
+                return arrivals
+            continue
+        if not chunk:
+            return arrivals
+        now = time.monotonic()
+        # Decoding waits until the end, so a busy client doesn't delay the next arrival
+        arrivals += [(payload, now) for _, payload in decoder.feed(chunk)]
+
+
+async def spectate(port, gameId, count, ready, stop):
+    spectators = []
+    for i in range(0, count, 50):
+        spectators += await asyncio.gather(*(open_spectator(port, gameId) for _ in range(min(50, count - i))))
+    ready.put(len(spectators))
+    arrivals = await asyncio.gather(*(watch(reader, decoder, stop) for reader, _, decoder in spectators))
+    for _, writer, _ in spectators:
+        writer.close()
+    return arrivals
+
+
+def spectator_process(port, gameId, count, ready, stop, results):
+    results.put(asyncio.run(spectate(port, gameId, count, ready, stop)))
+
+
+async def seat(port):
+    players = [await open_player(port) for _ in range(2)]
+    reader, writer, decoder = players[0]
+    writer.write(pack_frame('get'))
+    board = decode_state((await read_frames(reader, decoder, 1))[0][1])
+    return players, board
+
+
+def run(mode, log_dir, count, args):
+    port = free_port()
+    process = start_server(mode, port, log_dir)
+    try:
+        async def measure():
+            players, board = await seat(port)
+            gameId = board.id
+            ready, stop, results = multiprocessing.Queue(), multiprocessing.Event(), multiprocessing.Queue()
+            procs = min(args.procs, count)
+            clients = [multiprocessing.Process(target=spectator_process,
+                                               args=(port, gameId, count // procs + (i < count % procs),
+                                                     ready, stop, results))
+                       for i in range(procs)]
+            for client in clients:
+                client.start()
+            for _ in clients:
+                ready.get()
+            # The game's own two players make the moves
+            rng = random.Random(0)
+            sent, replies = {}, []
+            for _ in range(args.moves):
+                turn, command = next_play(board, rng)
+                reader, writer, decoder = players[turn]
+                before = time.monotonic()
+                writer.write(pack_frame(command))
+                board = decode_state((await read_frames(reader, decoder, 1))[0][1])
+                replies.append(time.monotonic() - before)
+                sent[board.version] = before
+                await asyncio.sleep(args.interval)
+            stop.set()
+            arrivals = [[(decode_state(payload).version, when) for payload, when in spectator]
+                        for _ in clients for spectator in results.get()]
+            for client in clients:
+                client.join()
+            for _, w, _ in players:
+                w.close()
+            return sent, replies, arrivals
+
+        sent, replies, arrivals = asyncio.run(measure())
+    finally:
+        process.terminate()
+        process.wait()
+
+    delays, last, missed = [], [], 0
+    for version, at in sent.items():
+        slowest = 0.0
+        for received in arrivals:
+            # A spectator that skipped this version got a later one instead
+            got = [when for seen, when in received if seen >= version]
+            if not got:
+                missed += 1
+                continue
+            delays.append(got[0] - at)
+            slowest = max(slowest, got[0] - at)
+        last.append(slowest)
+    return percentile(delays, 0.5), percentile(last, 0.5), max(last), percentile(replies, 0.99), missed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark spectator fan-out latency against spectator count')
+    parser.add_argument('--spectators', default=[10, 100, 500], type=int, nargs='+',
+                        help='Spectator counts to try (default 10 100 500)')
+    parser.add_argument('--moves', default=50, type=int, help='Moves per run (default 50)')
+    parser.add_argument('--interval', default=0.05, type=float, help='Seconds between moves (default 0.05)')
+    parser.add_argument('--procs', default=4, type=int, help='Client processes the spectators are spread over (default 4)')
+    parser.add_argument('--mode', default='threaded', choices=['threaded', 'asyncio'], help='Server mode')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='cards_bench_') as log_dir:
+        print(f"{'spectators':>10} {'p50 ms':>8} {'last p50 ms':>12} {'last max ms':>12} {'player p99 ms':>14} {'missed':>7}")
+        for count in args.spectators:
+            run_dir = tempfile.mkdtemp(dir=log_dir)
+            p50, last50, lastMax, player99, missed = run(args.mode, run_dir, count, args)
+            print(f"{count:>10} {p50 * 1e3:>8.2f} {last50 * 1e3:>12.2f} {lastMax * 1e3:>12.2f} "
+                  f"{player99 * 1e3:>14.2f} {missed:>7}")
+
+
+if __name__ == '__main__':
+    main()
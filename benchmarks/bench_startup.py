@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+What a headless process pays for the game core: import time, server cold
+start and memory per board.
+
+- import: wall time of `python -c "import MODULE"` minus a bare interpreter,
+  median of --runs fresh processes, and whether pygame got loaded
+- cold start: from spawning `Server.py --mode threaded` to its first reply to
+  a hello (two players, so the game is dealt), median of --runs, plus the
+  server's RSS at that point
+- per board: tracemalloc bytes for --boards dealt games, divided by --boards
+
+Usage:
+    python3 benchmarks/bench_startup.py --runs 5 --boards 1000 [--modules Game Lobby Network]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from bench_server import free_port
+
+
+def import_time(module):
+    """Seconds to import module in a fresh interpreter, and whether that loaded pygame."""
+    code = ("import sys, time; start = time.perf_counter(); import {}; "
+            "print(time.perf_counter() - start, 'pygame' in sys.modules)").format(module)
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1')
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    elapsed, pygame = out.stdout.split()
+    return float(elapsed), pygame == 'True'
+
+
+def rss_kb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def cold_start(log_dir):
+    """Seconds from spawning a server to its first greeting, and the server's RSS then."""
+    # Imported here so the import timings above start from a clean interpreter state
+    from Protocol import FrameDecoder, pack_frame
+
+    port = free_port()
+    env = dict(os.environ, LOG_PATH=os.path.join(log_dir, f'{port}.log'), PYGAME_HIDE_SUPPORT_PROMPT='1')
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'Server.py'), '--mode', 'threaded', '--port', str(port)],
+                               cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = start + 10
+        while True:
+            try:
+                sock = socket.create_connection(('127.0.0.1', port))
+                break
+            except OSError:
+                if time.perf_counter() > deadline:
+                    raise RuntimeError("server did not start")
+                time.sleep(0.001)
+        with sock:
+            sock.sendall(pack_frame('hello:format=binary:'))
+            decoder = FrameDecoder()
+            while not decoder.feed(sock.recv(65536)):
+                pass
+            elapsed = time.perf_counter() - start
+            return elapsed, rss_kb(process.pid)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def board_bytes(boards):
+    from Game import Board
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    live = []
+    for id in range(boards):
+        board = Board(id, seed=id)
+        board.startGame()
+        live.append(board)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / boards
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark import time, server cold start and memory per board')
+    parser.add_argument('--runs', default=5, type=int, help='Fresh processes per measurement (default 5)')
+    parser.add_argument('--boards', default=1000, type=int, help='Boards dealt for the memory figure (default 1000)')
+    parser.add_argument('--modules', default=['Game', 'Lobby', 'Network'], nargs='+',
+                        help='Modules to time the import of (default Game Lobby Network)')
+    args = parser.parse_args()
+
+    baseline = statistics.median(import_time('os')[0] for _ in range(args.runs))
+    print(f"{'measurement':<24} {'median':>10} {'pygame':>7}")
+    for module in args.modules:
+        runs = [import_time(module) for _ in range(args.runs)]
+        elapsed = statistics.median(t for t, _ in runs) - baseline
+        print(f"{'import ' + module:<24} {elapsed * 1e3:>7.1f} ms {'yes' if runs[0][1] else 'no':>7}")
+
+    with tempfile.TemporaryDirectory(prefix='cards_bench_') as log_dir:
+        starts = [cold_start(log_dir) for _ in range(args.runs)]
+    print(f"{'server cold start':<24} {statistics.median(t for t, _ in starts) * 1e3:>7.1f} ms")
+    print(f"{'server RSS at start':<24} {statistics.median(kb for _, kb in starts) / 1024:>7.1f} MB")
+    print(f"{'memory per board':<24} {board_bytes(args.boards) / 1024:>7.1f} KB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Round-trip latency over loopback TCP vs a Unix domain socket.
+
+For each server mode the server is started as a subprocess with --unix, a
+game is seated over each transport, and one player sends --number "get"s
+(or --command) one at a time, waiting for each reply before the next -
+what an agent on the same host does every turn. --clients > 1 runs that
+many such players at once (each in its own thread, half of them seated
+opposite each other).
+
+Reports round trips/s and the latency p50/p99 per transport.
+
+Usage:
+    python3 benchmarks/bench_transport.py --number 5000 [--clients 4] [--mode threaded asyncio]
+"""
+import argparse
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from Protocol import FrameDecoder, pack_frame
+from bench_server import free_port, start_server
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def read_frame(sock, decoder, pending):
+    while not pending:
+        chunk = sock.recv(65536)
+        if not chunk:
+            raise ConnectionError("server closed the connection")
+        pending.extend(decoder.feed(chunk))
+    return pending.pop(0)
+
+
+def open_player(address):
+    family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.connect(address)
+    if family == socket.AF_INET:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    decoder, pending = FrameDecoder(), []
+    sock.sendall(pack_frame('hello:format=binary:'))
+    read_frame(sock, decoder, pending)
+    return sock, decoder, pending
+
+
+def round_trips(player, command, number, latencies):
+    sock, decoder, pending = player
+    frame = pack_frame(command)
+    for _ in range(number):
+        sent = time.perf_counter()
+        sock.sendall(frame)
+        read_frame(sock, decoder, pending)
+        latencies.append(time.perf_counter() - sent)
+
+
+def run(address, clients, command, number):
+    # Seated in pairs, so every player is in a started game
+    players = [open_player(address) for _ in range(clients + clients % 2)]
+    latencies = []
+    threads = [threading.Thread(target=round_trips, args=(player, command, number, latencies))
+               for player in players[:clients]]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    for sock, _, _ in players:
+        sock.close()
+    return len(latencies) / elapsed, percentile(latencies, 0.5), percentile(latencies, 0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark request/response latency over TCP vs a Unix socket')
+    parser.add_argument('--number', default=5000, type=int, help='Round trips per client (default 5000)')
+    parser.add_argument('--clients', default=1, type=int, help='Players doing round trips at once (default 1)')
+    parser.add_argument('--command', default='get', help='Command to send (default "get")')
+    parser.add_argument('--mode', default=['threaded', 'asyncio'], nargs='+', choices=['threaded', 'asyncio'],
+                        help='Server modes to try (default both)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='cards_bench_') as log_dir:
+        print(f"{'mode':<9} {'transport':<10} {'round trips/s':>14} {'p50 us':>8} {'p99 us':>8}")
+        for mode in args.mode:
+            port = free_port()
+            path = os.path.join(log_dir, f'{mode}.sock')
+            process = start_server(mode, port, log_dir, '--unix', path)
+            try:
+                for transport, address in (('tcp', ('127.0.0.1', port)), ('unix', path)):
+                    rate, p50, p99 = run(address, args.clients, args.command, args.number)
+                    print(f"{mode:<9} {transport:<10} {rate:>14.0f} {p50 * 1e6:>8.1f} {p99 * 1e6:>8.1f}")
+            finally:
+                process.terminate()
+                process.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Load test for `Server.py --workers N`: games per second against worker count.
+
+For each worker count the server is started as a subprocess and --pairs
+games are seated one pair at a time (so the two players of each pair
+really share a Board). The pairs are then split across --clients forked
+client processes, and each pair plays games back to back for --seconds:
+whichever player's turn it is plays with the load generator's policy,
+each play followed by a "sync" from the other player, and a won game is
+reset for the next. A game is counted when it is won, or after --turns
+plays.
+
+Games/s should grow with the worker count until it reaches the number of
+free cores (leave some for the client processes).
+
+Usage:
+    python3 benchmarks/bench_workers.py --workers 1,2,4 --pairs 64 --clients 4
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from Game import decode_state
+from Protocol import FrameDecoder, pack_frame
+from bench_server import free_port, read_frames, start_server
+from loadgen import next_play
+
+
+def seat_pairs(port, pairs):
+    seated = []
+    for _ in range(pairs * 2):
+        conn = socket.create_connection(('127.0.0.1', port))
+        conn.sendall(pack_frame('hello:format=binary:'))
+        decoder = FrameDecoder()
+        while not decoder.feed(conn.recv(65536)):
+            pass
+        seated.append(conn)
+    return [seated[i:i + 2] for i in range(0, len(seated), 2)]
+
+
+async def request(player, command):
+    reader, writer, decoder = player
+    writer.write(pack_frame(command))
+    return (await read_frames(reader, decoder, 1))[0][1]
+
+
+async def play_games(pair, deadline, turns):
+    players = []
+    for conn in pair:
+        reader, writer = await asyncio.open_connection(sock=conn)
+        players.append((reader, writer, FrameDecoder()))
+    rng = random.Random(0)
+    board = decode_state(await request(players[0], 'get'))
+    games = plays = 0
+    while time.perf_counter() < deadline:
+        turn, command = next_play(board, rng)
+        board = decode_state(await request(players[turn], command))
+        await request(players[1 - turn], f'sync:{board.version}:')
+        plays += 1
+        # The reset after a win starts the next game
+        if command == 'reset' or plays == turns:
+            games += 1
+            plays = 0
+    return games
+
+
+def client(pairs, seconds, turns, results):
+    async def run():
+        deadline = time.perf_counter() + seconds
+        return sum(await asyncio.gather(*(play_games(pair, deadline, turns) for pair in pairs)))
+    results.put(asyncio.run(run()))
+
+
+def bench(port, pairs, clients, seconds, turns):
+    seated = seat_pairs(port, pairs)
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    processes = [context.Process(target=client, args=(seated[i::clients], seconds, turns, results))
+                 for i in range(clients)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    games = sum(results.get() for _ in processes)
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join()
+    for pair in seated:
+        for conn in pair:
+            conn.close()
+    return games / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure games/s as the number of server worker processes grows')
+    parser.add_argument('--workers', default='1,2,4', help='Comma separated worker counts to try (default 1,2,4)')
+    parser.add_argument('--pairs', default=64, type=int, help='Concurrent games (default 64)')
+    parser.add_argument('--clients', default=max(1, (os.cpu_count() or 2) // 2), type=int,
+                        help='Client processes generating load (default half the cores)')
+    parser.add_argument('--seconds', default=5.0, type=float, help='Measurement time per worker count (default 5)')
+    parser.add_argument('--turns', default=20, type=int, help='Plays counted as a game if it is not won sooner (default 20)')
+    parser.add_argument('--mode', default='threaded', choices=['threaded', 'asyncio'], help='Server mode in each worker')
+    args = parser.parse_args()
+
+    print(f"cores: {os.cpu_count()}, client processes: {args.clients}")
+    print(f"{'workers':>8} {'games/s':>10}")
+    with tempfile.TemporaryDirectory(prefix='cards_bench_') as log_dir:
+        for workers in (int(n) for n in args.workers.split(',')):
+            port = free_port()
+            run_dir = os.path.join(log_dir, str(workers))
+            os.mkdir(run_dir)
+            process = start_server(args.mode, port, run_dir, '--workers', str(workers))
+            try:
+                rate = bench(port, args.pairs, args.clients, args.seconds, args.turns)
+            finally:
+                process.terminate()
+                process.wait()
+            print(f"{workers:>8} {rate:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
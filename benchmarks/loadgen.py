@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Load generator: thousands of simulated players playing full games against Server.py.
+
+--pairs N pairs of players (2N connections) are spread over --procs forked
+client processes, each running its players as asyncio tasks. Every player
+is independent, the way real clients are: it says hello, is seated by the
+server's matchmaker and then loops
+- on its turn, plays with a cheap greedy policy: a goal card to the field
+  if it fits, else a hand/discard card that fits, else discards a random
+  hand card (which passes the turn);
+- otherwise long-polls with "wait:<version>:<secs>" until the board moves;
+- when the game has a winner, seat 0 counts it and sends "reset" to start
+  the next one (the server refuses a reset while a game is under way).
+  Games that took more than --max-moves board versions to decide are
+  counted as aborted instead.
+
+Scenarios (reproducible for a given --seed; the server's shuffles are not):
+- steady:     all players connect up front, then play for --seconds.
+- ramp:       players connect evenly spread over the first --ramp seconds.
+- disconnect: steady, then at the half-way mark --drop of the players cut
+              their connections and reconnect at once. Their opponents'
+              seats are requeued, so this exercises mass leave/rejoin.
+
+Reported: games/s per --interval and overall, request latency p50/p99
+(round trips of non-wait commands), bytes sent and received per finished
+game, reconnect time, and the server's RSS (including worker processes).
+
+By default the server is started here (--mode, plus any --server-args);
+use --port to drive one that is already running, with --server-pid for RSS.
+
+Usage:
+    python3 benchmarks/loadgen.py --scenario steady --pairs 500 --procs 4 --seconds 20
+    python3 benchmarks/loadgen.py --scenario ramp --pairs 2000 --ramp 10 --seconds 30 --mode asyncio
+    python3 benchmarks/loadgen.py --scenario disconnect --drop 0.5 --server-args="--workers 4"
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import shlex
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from Game import CARD_NAMES, Board, BoardDelta, decode_state
+from Lobby import Session
+from Protocol import FrameDecoder, pack_frame, parse_greeting
+from bench_server import free_port, start_server
+
+SCENARIOS = ("steady", "ramp", "disconnect")
+# Latency samples each client process keeps (reservoir sampled beyond this)
+LATENCY_SAMPLES = 100000
+# Longest single long-poll, so players notice the end of the run promptly
+WAIT_SECONDS = 1.0
+
+
+def choose(board, seat, rng):
+    """Return the next command for the player in seat, whose turn it is: the first field move, else a random discard."""
+    # Field moves come first, so the first legal move is one if there is any
+    move = next(board.legal_moves(seat), None)
+    if move is not None and move.action == "move":
+        return str(move)
+    player = board.playerOne if seat == 0 else board.playerTwo
+    if player.hand:
+        return f"discard:{CARD_NAMES[rng.choice(player.hand)]}:{rng.randrange(4)}"
+    return "deal::"
+
+
+def mid_game(seed, turns, played=None):
+    '''
+    Deal Board(seed, seed=seed) and play it for up to turns turns with choose(); returns the board.
+
+    The deck can run dry before a reshuffle, so play stops well short of
+    that, or when the game is won. Each (command, seat) played is appended
+    to played, if given.
+    '''
+    board = Board(seed, seed=seed)
+    board.startGame()
+    rng = random.Random(seed)
+    for _ in range(turns):
+        if board.winner is not None or len(board.deck.cards) < 20:
+            break
+        command = choose(board, board.currentTurn, rng)
+        if played is not None:
+            played.append((command, board.currentTurn))
+        board.play(command, board.currentTurn)
+    return board
+
+
+def seat_game(lobby):
+    """Seat two Sessions in lobby, in process, which pairs them into one game; returns them in seat order."""
+    players = [Session(lobby), Session(lobby)]
+    for session in players:
+        session.hello("hello:format=binary:")
+    return players
+
+
+def next_play(board, rng):
+    """Return (seat, command) for the game's next play: choose() for whoever's turn it is, or seat 0's reset once it is won."""
+    if board.winner is not None:
+        return 0, "reset"
+    return board.currentTurn, choose(board, board.currentTurn, rng)
+
+
+class Stats:
+    '''Counters one client process collects and sends back to the parent.'''
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.latencies = []
+        self.requests = 0
+        self.games = []
+        self.aborted = 0
+        self.bytes = 0
+        self.reconnects = []
+        self.errors = 0
+
+    def latency(self, seconds):
+        self.requests += 1
+        if len(self.latencies) < LATENCY_SAMPLES:
+            self.latencies.append(seconds)
+        else:
+            slot = self.rng.randrange(self.requests)
+            if slot < LATENCY_SAMPLES:
+                self.latencies[slot] = seconds
+
+    def result(self):
+        return {"latencies": self.latencies, "requests": self.requests, "games": self.games,
+                "aborted": self.aborted, "bytes": self.bytes, "reconnects": self.reconnects, "errors": self.errors}
+
+
+class Player:
+    def __init__(self, host, port, seed, stats, max_moves):
+        self.host = host
+        self.port = port
+        self.rng = random.Random(seed)
+        self.stats = stats
+        self.maxMoves = max_moves
+        self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.decoder = FrameDecoder()
+        self.pending = []
+        self.board = None
+        self.gameStart = None
+        seat, _ = parse_greeting((await self.request("hello:format=binary:")).decode())
+        self.seat = int(seat)
+        await self.update(await self.request("get"))
+
+    def drop(self):
+        """Cut the connection without a goodbye, like a client crash or network loss."""
+        self.writer.transport.abort()
+
+    async def request(self, command, timed=True):
+        frame = pack_frame(command)
+        start = time.perf_counter()
+        self.writer.write(frame)
+        self.stats.bytes += len(frame)
+        while not self.pending:
+            chunk = await self.reader.read(65536)
+            if not chunk:
+                raise ConnectionError("server closed the connection")
+            self.stats.bytes += len(chunk)
+            self.pending += self.decoder.feed(chunk)
+        if timed:
+            self.stats.latency(time.perf_counter() - start)
+        return self.pending.pop(0)[1]
+
+    async def update(self, payload):
+        state = decode_state(payload)
+        if isinstance(state, BoardDelta):
+            try:
+                self.board.apply_delta(state)
+            except (AttributeError, ValueError):
+                state = decode_state(await self.request("get"))
+            else:
+                return
+        self.board = state
+
+    async def play(self, deadline):
+        while time.time() < deadline:
+            board = self.board
+            if self.gameStart is None or board.version < self.gameStart:
+                # A reset (ours, the opponent's or after a requeue) started a new game
+                self.gameStart = board.version
+            if board.ready and board.winner is not None:
+                if self.seat == 0:
+                    if board.version - self.gameStart <= self.maxMoves:
+                        self.stats.games.append(time.time())
+                    else:
+                        self.stats.aborted += 1
+                    await self.update(await self.request("reset"))
+                    self.gameStart = self.board.version
+                    continue
+            elif board.ready and board.currentTurn == self.seat:
+                await self.update(await self.request(choose(board, self.seat, self.rng)))
+                continue
+            timeout = max(0.0, min(WAIT_SECONDS, deadline - time.time()))
+            await self.update(await self.request(f"wait:{board.version}:{timeout:.3f}", timed=False))
+
+
+async def run_player(player, start, deadline, drop_at):
+    try:
+        await asyncio.sleep(max(0.0, start - time.time()))
+        await player.connect()
+        if drop_at is None:
+            await player.play(deadline)
+            return
+        await player.play(drop_at)
+        player.drop()
+        began = time.perf_counter()
+        await player.connect()
+        player.stats.reconnects.append(time.perf_counter() - began)
+        await player.play(deadline)
+    except (OSError, ConnectionError, ValueError) as error:
+        player.stats.errors += 1
+        if player.stats.errors <= 3:
+            print(f"player error: {error!r}", file=sys.stderr)
+    finally:
+        if player.writer is not None:
+            player.writer.close()
+
+
+def client(index, players, args, begin, results):
+    """One client process: run the players (global index, start time, drop time) given to it."""
+    async def run():
+        stats = Stats(args.seed * 1000003 + index)
+        deadline = begin + args.seconds
+        await asyncio.gather(*(run_player(Player(args.host, args.port, args.seed * 1000003 + number, stats,
+                                                 args.max_moves), start, deadline, drop_at)
+                               for number, start, drop_at in players))
+        return stats.result()
+    results.put(asyncio.run(run()))
+
+
+def schedule(args, begin):
+    """Return (player number, connect time, drop time or None) for every simulated player."""
+    rng = random.Random(args.seed)
+    count = args.pairs * 2
+    players = []
+    for number in range(count):
+        start = begin
+        if args.scenario == "ramp":
+            start += args.ramp * number / count
+        drop_at = None
+        if args.scenario == "disconnect" and rng.random() < args.drop:
+            drop_at = begin + args.seconds / 2
+        players.append((number, start, drop_at))
+    return players
+
+
+def rss_kb(pid):
+    """Resident set size of pid plus its children (the --workers processes), from /proc; None if unknown."""
+    total = 0
+    try:
+        pids = [pid]
+        for entry in os.listdir('/proc'):
+            if entry.isdigit():
+                try:
+                    with open(f'/proc/{entry}/stat') as stat:
+                        if int(stat.read().rsplit(')', 1)[1].split()[1]) == pid:
+                            pids.append(int(entry))
+                except (OSError, IndexError, ValueError):
+                    continue
+        for each in pids:
+            with open(f'/proc/{each}/status') as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+    except OSError:
+        return None
+    return total
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else float('nan')
+
+
+def run(args, server_pid):
+    begin = time.time() + 0.5
+    players = schedule(args, begin)
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    processes = [context.Process(target=client, args=(i, players[i::args.procs], args, begin, results))
+                 for i in range(args.procs)]
+    idle_rss = rss_kb(server_pid) if server_pid else None
+    for process in processes:
+        process.start()
+
+    # Sample the server's memory while the clients run
+    samples = []
+    while time.time() < begin + args.seconds:
+        time.sleep(min(args.interval, max(0.0, begin + args.seconds - time.time())))
+        if server_pid:
+            samples.append((time.time() - begin, rss_kb(server_pid)))
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return begin, idle_rss, samples, outcomes
+
+
+def report(args, begin, idle_rss, samples, outcomes):
+    games = sorted(t - begin for outcome in outcomes for t in outcome["games"])
+    latencies = sorted(s for outcome in outcomes for s in outcome["latencies"])
+    reconnects = sorted(s for outcome in outcomes for s in outcome["reconnects"])
+    total_bytes = sum(outcome["bytes"] for outcome in outcomes)
+    rss = dict(samples)
+
+    print(f"scenario {args.scenario}: {args.pairs} pairs, {args.procs} client processes, {args.seconds:.0f}s")
+    print(f"{'t (s)':>6} {'games/s':>9} {'rss MB':>8}")
+    steps = int(args.seconds / args.interval + 0.5)
+    for step in range(steps):
+        low, high = step * args.interval, (step + 1) * args.interval
+        done = sum(1 for t in games if low <= t < high)
+        memory = min(rss.items(), key=lambda item: abs(item[0] - high))[1] if rss else None
+        print(f"{high:>6.1f} {done / args.interval:>9.1f} {memory / 1024 if memory else float('nan'):>8.1f}")
+
+    def rate(low, high):
+        return sum(1 for t in games if low <= t < high) / (high - low) if high > low else float('nan')
+
+    print()
+    warmup = args.ramp if args.scenario == "ramp" else 0.0
+    print(f"games finished:     {len(games)} ({sum(o['aborted'] for o in outcomes)} aborted after --max-moves)")
+    print(f"games/s:            {rate(warmup, args.seconds):.1f}" + (" (after ramp-up)" if warmup else ""))
+    if args.scenario == "disconnect":
+        half = args.seconds / 2
+        print(f"games/s before/after drop: {rate(0, half):.1f} / {rate(half, args.seconds):.1f}")
+        print(f"reconnects:         {len(reconnects)}, p50 {percentile(reconnects, 0.5) * 1e3:.1f} ms, "
+              f"p99 {percentile(reconnects, 0.99) * 1e3:.1f} ms")
+    print(f"requests:           {sum(o['requests'] for o in outcomes)}, "
+          f"p50 {percentile(latencies, 0.5) * 1e3:.2f} ms, p99 {percentile(latencies, 0.99) * 1e3:.2f} ms")
+    print(f"bytes per game:     {total_bytes / len(games):.0f}" if games else "bytes per game:     n/a")
+    if idle_rss is not None and samples:
+        peak = max((kb for _, kb in samples if kb), default=0)
+        print(f"server RSS:         idle {idle_rss / 1024:.1f} MB, peak {peak / 1024:.1f} MB, "
+              f"end {samples[-1][1] / 1024:.1f} MB")
+    errors = sum(o['errors'] for o in outcomes)
+    if errors:
+        print(f"player errors:      {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Drive many simulated game pairs against Server.py')
+    parser.add_argument('--scenario', default='steady', choices=SCENARIOS)
+    parser.add_argument('--pairs', default=200, type=int, help='Simulated games (2 players each; default 200)')
+    parser.add_argument('--procs', default=max(1, (os.cpu_count() or 2) // 2), type=int,
+                        help='Client processes generating load (default half the cores)')
+    parser.add_argument('--seconds', default=20.0, type=float, help='Length of the run (default 20)')
+    parser.add_argument('--ramp', default=5.0, type=float, help='ramp: seconds over which players connect (default 5)')
+    parser.add_argument('--drop', default=0.5, type=float, help='disconnect: fraction of players that drop (default 0.5)')
+    parser.add_argument('--max-moves', default=500, type=int, help='Board versions after which a game counts as aborted')
+    parser.add_argument('--interval', default=1.0, type=float, help='Reporting interval in seconds (default 1)')
+    parser.add_argument('--seed', default=1, type=int, help='Seed for the schedule and the players\' choices')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', default=0, type=int, help='Use a running server on this port instead of starting one')
+    parser.add_argument('--server-pid', default=0, type=int, help='With --port: pid whose RSS to report')
+    parser.add_argument('--mode', default='threaded', choices=['threaded', 'asyncio'], help='Mode of the server started here')
+    parser.add_argument('--server-args', default='', help='Extra Server.py arguments, e.g. "--workers 4"')
+    args = parser.parse_args()
+
+    if args.port:
+        report(args, *run(args, args.server_pid))
+        return
+    with tempfile.TemporaryDirectory(prefix='cards_load_') as log_dir:
+        args.port = free_port()
+        process = start_server(args.mode, args.port, log_dir, *shlex.split(args.server_args))
+        try:
+            outcome = run(args, process.pid)
+        finally:
+            process.terminate()
+            process.wait()
+    report(args, *outcome)
+
+
+if __name__ == '__main__':
+    main()
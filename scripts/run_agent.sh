@@ -79,9 +79,6 @@ else
   echo "Skipping dependency installation (--no-install)"
 fi
 
-# Ensure we use headless SDL driver so pygame can import in headless/CI envs
-export SDL_VIDEODRIVER=${SDL_VIDEODRIVER:-dummy}
-
 # Ensure server is listening at port 5550; if not, warn but continue
 if ! ss -ltnp 2>/dev/null | grep -q ":5550\s"; then
   echo "Warning: no process listening on port 5550; make sure the server is running before starting agents."
@@ -3,7 +3,6 @@
 # Run server integration tests for the Cards project.
 # Usage: scripts/run_server_tests.sh [--reuse-venv | --no-install] [pytest-args]
 # By default this script creates/uses ./venv and installs requirements from requirements.txt.
-# It also sets SDL_VIDEODRIVER=dummy for headless environments.
 
 set -euo pipefail
 
@@ -61,9 +60,6 @@ else
   echo "Skipping dependency installation (--no-install)"
 fi
 
-# Export SDL_VIDEODRIVER so pygame can run headless
-export SDL_VIDEODRIVER=${SDL_VIDEODRIVER:-dummy}
-
 # Run pytest - only server tests by default
 TEST_PATTERN="tests/test_server_integration.py"
 
@@ -0,0 +1,113 @@
+import contextlib
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from Lobby import Session
+
+
+def free_port():
+    """Ask the OS for a TCP port nobody is listening on."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def running_server(*args, timeout=5):
+    """Run Server.py on a free port with extra CLI args and yield (process, port).
+
+    Readiness is detected from the log file rather than by probing the port, so
+    no throwaway connection gets seated in a game.
+    """
+    temp_dir = tempfile.mkdtemp(prefix='cards_test_')
+    log_path = os.path.join(temp_dir, 'server_test.log')
+    port = free_port()
+
+    env = os.environ.copy()
+    env['LOG_PATH'] = log_path
+    with open(os.path.join(temp_dir, 'stdout.log'), 'w') as out:
+        process = subprocess.Popen([sys.executable, '-u', os.path.join(ROOT, 'Server.py'), '--port', str(port), *args],
+                                   cwd=ROOT, env=env, stdout=out, stderr=subprocess.STDOUT)
+
+    try:
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if os.path.exists(log_path) and 'Server Started' in open(log_path).read():
+                break
+            if process.poll() is not None:
+                break
+            time.sleep(0.05)
+        else:
+            raise RuntimeError(f"Server failed to start in {timeout} seconds")
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited early: {open(os.path.join(temp_dir, 'stdout.log')).read()}")
+        yield process, port
+    finally:
+        try:
+            process.terminate()
+            process.wait(timeout=2)
+        except Exception:
+            process.kill()
+        shutil.rmtree(temp_dir)
+
+
+def seat_game(lobby):
+    """Seat two Sessions in lobby, which pairs them into one game; returns them in seat order."""
+    players = [Session(lobby), Session(lobby)]
+    for session in players:
+        session.hello("hello:format=binary:")
+    return players
+
+
+def turn_command(board):
+    """A play the server accepts from the player whose turn it is: the first legal move, a deal, or a reset once won."""
+    move = next(board.legal_moves(board.currentTurn), None)
+    if move is not None:
+        return str(move)
+    return "deal::" if board.winner is None else "reset"
+
+
+def play_turn(players):
+    """Have whichever of a game's two Sessions holds the turn make a play; returns its reply."""
+    board = players[0].room.board
+    player = next(session for session in players if session.p == board.currentTurn)
+    return player.handle(turn_command(board))
+
+
+def send_turn(clients):
+    """Have whichever of a game's two Network clients holds the turn send a play; returns the board it gets back."""
+    turn = clients[0].sync().currentTurn
+    client = next(c for c in clients if c.getId() == str(turn))
+    return client.send(turn_command(client.sync()))
+
+
+def give_turn(clients, client):
+    """Play turns until it is client's; returns its board."""
+    while True:
+        board = client.sync()
+        if str(board.currentTurn) == client.getId():
+            return board
+        send_turn(clients)
+
+
+@pytest.fixture(scope='module')
+def asyncio_server():
+    with running_server('--mode', 'asyncio') as (process, port):
+        yield process, port
+
+
+@pytest.fixture(scope='module', params=['threaded', 'asyncio'])
+def any_server(request):
+    """Run the test module once against each server mode."""
+    with running_server('--mode', request.param) as (process, port):
+        yield process, port
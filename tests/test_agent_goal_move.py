@@ -19,7 +19,7 @@ def make_agent_for_tests():
 def test_goal_top_ace_detected():
     board = Board(0)
     board.field = [[], [], [], []]
-    board.playerOne.goal = [Card('Hearts', 'Ace')]
+    board.playerOne.goal = bytearray([Card('Hearts', 'Ace')])
     agent = make_agent_for_tests()
     moves = Agent.find_moves(agent, board)
     assert any(m[3] == 'goal' for m in moves), "Goal top Ace should be detected as a move"
@@ -28,7 +28,7 @@ def test_goal_top_ace_detected():
 def test_goal_top_2_not_detected():
     board = Board(0)
     board.field = [[], [], [], []]
-    board.playerOne.goal = [Card('Hearts', '2')]
+    board.playerOne.goal = bytearray([Card('Hearts', '2')])
     agent = make_agent_for_tests()
     moves = Agent.find_moves(agent, board)
     assert not any(m[3] == 'goal' for m in moves), "Goal top 2 should not be detected on empty field"
@@ -75,7 +75,7 @@ def make_agent():
 def test_goal_top_ace_playable():
     board = Board(0)
     board.field = [[], [], [], []]
-    board.playerOne.goal = [Card('Hearts', 'Ace')]
+    board.playerOne.goal = bytearray([Card('Hearts', 'Ace')])
     agent = make_agent()
     moves = Agent.find_moves(agent, board)
     assert any(m[3] == 'goal' for m in moves), 'Goal top Ace should be playable'
@@ -84,7 +84,7 @@ def test_goal_top_ace_playable():
 def test_goal_top_2_not_playable():
     board = Board(0)
     board.field = [[], [], [], []]
-    board.playerOne.goal = [Card('Hearts', '2')]
+    board.playerOne.goal = bytearray([Card('Hearts', '2')])
     agent = make_agent()
     moves = Agent.find_moves(agent, board)
     assert not any(m[3] == 'goal' for m in moves), 'Goal top 2 should not be playable on empty field'
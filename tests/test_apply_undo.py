@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+PyTest for Board.apply and Board.undo: every move taken back exactly, however deep the search.
+"""
+import random
+
+import pytest
+
+from Game import DECK_SIZE, FIELD_FULL, GOAL_PILE, Board, card_code
+
+
+def state(board):
+    """Everything apply may touch, plus what it must not (ready and version)."""
+    return ([bytes(pile) for pile in board.piles()], board.currentTurn, board.winner, board.seed, board._shuffled,
+            board.ready, board.version)
+
+
+def walk(seed, goals=True, turns=1000):
+    '''
+    Yield a board at each of up to turns turns of a game played with random legal moves, field moves first.
+
+    Without goals no goal card is played, and the game goes on through
+    reshuffle after reshuffle.
+    '''
+    board = Board(seed, seed=seed)
+    board.startGame()
+    rng = random.Random(seed)
+    for _ in range(turns):
+        if board.winner is not None:
+            return
+        yield board
+        moves = [move for move in board.legal_moves(board.currentTurn) if goals or move.source not in GOAL_PILE]
+        rng.shuffle(moves)
+        moves.sort(key=lambda move: move.action != "move")
+        for move in moves:
+            try:
+                board.apply(move)
+                break
+            except IndexError:
+                pass
+        else:
+            return
+
+
+def test_every_move_applies_as_play_and_undoes_exactly():
+    cleared = reshuffled = won = 0
+    boards = [walk(seed) for seed in range(40)] + [walk(seed, goals=False, turns=200) for seed in range(3)]
+    for board in (board for game in boards for board in game):
+        before = state(board)
+        for move in board.legal_moves(board.currentTurn):
+            played = board.copy()
+            try:
+                played.play(str(move), board.currentTurn)
+            except IndexError:
+                with pytest.raises(IndexError):
+                    board.apply(move)
+                assert state(board) == before
+                continue
+            record = board.apply(move)
+            assert state(board)[:5] == state(played)[:5]
+            cleared += move.action == "move" and not board.field[move.location]
+            reshuffled += board._shuffled != before[4]
+            won += board.winner is not None
+            board.undo(record)
+            assert state(board) == before
+    # The walk must reach the rules that are hard to take back
+    assert cleared and reshuffled and won
+
+
+def test_a_whole_game_unwinds_to_the_deal():
+    for seed in range(40):
+        board = Board(seed, seed=seed)
+        board.startGame()
+        dealt, rng = state(board), board.rng.getstate()
+        records = []
+        rng_moves = random.Random(seed)
+        while board.winner is None:
+            moves = list(board.legal_moves(board.currentTurn))
+            moves.sort(key=lambda move: (move.action != "move", rng_moves.random()))
+            try:
+                records.append(board.apply(moves[0]))
+            except IndexError:
+                break
+        for record in reversed(records):
+            board.undo(record)
+        assert state(board) == dealt
+        # The generator is rebuilt to the same place: later shuffles come out the same
+        assert board.rng.getstate() == rng
+
+
+def test_nested_search_leaves_the_board_as_it_was():
+    def search(board, depth):
+        nodes = 1
+        if depth:
+            for move in list(board.legal_moves(board.currentTurn)):
+                record = board.apply(move)
+                nodes += search(board, depth - 1)
+                board.undo(record)
+        return nodes
+
+    for seed in (1, 5, 9):
+        for turn, board in enumerate(walk(seed)):
+            if turn % 7 == 0:
+                before = state(board)
+                assert search(board, 2) > 1
+                assert state(board) == before
+
+
+def test_failed_deal_leaves_the_board_unchanged():
+    board = Board(0, decks=0)
+    board.ready = True
+    nine = card_code("Hearts", "9")
+    board.playerOne.hand = bytearray([nine])
+    board.deck.cards = bytearray([card_code("Clubs", "2"), card_code("Clubs", "3")])
+    # Player two's hand is empty and the deck holds two cards: the deal after the discard runs dry
+    move = next(move for move in board.legal_moves(0) if move.action == "discard")
+    before = state(board)
+    with pytest.raises(IndexError):
+        board.apply(move)
+    assert state(board) == before
+
+    # So does a move that fills a field pile and then can't deal the mover a new hand
+    board.field[0] = bytearray(range(DECK_SIZE, DECK_SIZE + FIELD_FULL - 1))
+    board.playerOne.hand = bytearray([card_code("Spades", "Queen")])
+    move = next(move for move in board.legal_moves(0) if move.action == "move" and move.location == 0)
+    before = state(board)
+    with pytest.raises(IndexError):
+        board.apply(move)
+    assert state(board) == before
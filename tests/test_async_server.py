@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+PyTest for `Server.py --mode asyncio`: the event-loop server must speak the same protocol as the threaded one.
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from AsyncServer import SPECTATOR_BUFFER, LoopPush, SpectatorFeed
+from Network import Network
+
+
+def test_asyncio_server_seats_two_players_and_starts_game(asyncio_server):
+    _, port = asyncio_server
+    c1 = Network(max_retries=20, retry_delay=0.05, port=port)
+    time.sleep(0.1)
+    c2 = Network(max_retries=20, retry_delay=0.05, port=port)
+    try:
+        assert {c1.getId(), c2.getId()} == {'0', '1'}
+
+        board = c2.send('get')
+        assert board is not None
+        assert board.ready is True
+        assert len(board.deck.cards) < 104
+
+        before = len(board.deck.cards)
+        after = len(c1.send('deal::').deck.cards)
+        assert after <= before
+
+        # c2's copy is brought forward with a delta instead of a full board
+        synced = c2.sync()
+        assert synced is c2.board
+        assert synced.version == c1.board.version
+        assert len(synced.deck.cards) == after
+    finally:
+        c1.client.close()
+        c2.client.close()
+
+
+class RecordingTransport:
+    """Stands in for an asyncio transport, noting the threads that touch it."""
+    def __init__(self):
+        self.threads = set()
+        self.written = []
+        self.buffered = 0
+        self.closing = False
+
+    def is_closing(self):
+        self.threads.add(threading.get_ident())
+        return self.closing
+
+    def get_write_buffer_size(self):
+        self.threads.add(threading.get_ident())
+        return self.buffered
+
+    def write(self, frame):
+        self.threads.add(threading.get_ident())
+        self.written.append(frame)
+
+
+def test_spectator_feed_touches_the_transport_only_on_the_loop():
+    async def main():
+        loop = asyncio.get_running_loop()
+        transport = RecordingTransport()
+        feed = SpectatorFeed(loop, transport)
+
+        async def offer():
+            # From another thread, as the Broadcaster does, then let the loop run what it queued
+            taken = await loop.run_in_executor(None, feed.offer, b"frame")
+            await asyncio.sleep(0)
+            return taken
+
+        assert await offer() is True and transport.written == [b"frame"]
+        transport.buffered = SPECTATOR_BUFFER + 1
+        assert await offer() is True
+        # The loop found the buffer full after that write: skip until it drains
+        assert await offer() is False and len(transport.written) == 2
+        transport.buffered = 0
+        assert await offer() is False
+        assert await offer() is True and len(transport.written) == 3
+        transport.closing = True
+        await offer()
+        with pytest.raises(ConnectionResetError):
+            await offer()
+        assert transport.threads == {threading.get_ident()}
+
+    asyncio.run(main())
+
+
+def test_pushes_from_other_threads_are_written_on_the_loop_in_order():
+    async def main():
+        loop = asyncio.get_running_loop()
+        transport = RecordingTransport()
+        push = LoopPush(loop, transport)
+        # A push from another thread (the Reaper) only queues; the loop writes it
+        reaper = threading.Thread(target=push, args=(b"pushed",))
+        reaper.start()
+        reaper.join()
+        assert transport.written == []
+        # and a reply written before the loop got round to it still goes out second
+        push.write(b"reply")
+        push(b"on the loop")
+        await asyncio.sleep(0)
+        assert transport.written == [b"pushed", b"reply", b"on the loop"]
+        assert transport.threads == {threading.get_ident()}
+
+    asyncio.run(main())
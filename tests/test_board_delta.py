@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+PyTest for Board versioning and delta sync: a client copy brought forward by deltas must match the server board.
+"""
+import pickle
+import random
+import sys
+from os.path import abspath, dirname, join
+sys.path.insert(0, abspath(join(dirname(__file__), '..')))
+
+from Game import CARD_NAMES, Board, BoardDelta
+
+
+def pile_strings(board):
+    return [[CARD_NAMES[card] for card in pile] for pile in board.piles()] + [[board.ready, board.currentTurn, board.winner]]
+
+
+def play_some_turns(board, turns, rng):
+    for _ in range(turns):
+        player = board.playerOne if board.currentTurn == 0 else board.playerTwo
+        if not player.hand:
+            board.play("deal::", board.currentTurn)
+            continue
+        card = rng.choice(player.hand)
+        board.play(f"discard:{CARD_NAMES[card]}:{rng.randrange(4)}", board.currentTurn)
+
+
+def test_commit_bumps_version_only_on_change():
+    board = Board(0)
+    board.startGame()
+    version = board.version
+    assert board.commit() == version, 'commit without changes must not bump the version'
+    board.play("discard:{}:0".format(CARD_NAMES[board.playerOne.hand[0] if board.currentTurn == 0 else board.playerTwo.hand[0]]),
+               board.currentTurn)
+    assert board.version == version + 1
+
+
+def test_delta_brings_client_copy_up_to_date():
+    rng = random.Random(7)
+    server = Board(0)
+    server.startGame()
+    client = pickle.loads(pickle.dumps(server))
+
+    play_some_turns(server, 10, rng)
+    delta = pickle.loads(pickle.dumps(server.delta_since(client.version)))
+    assert isinstance(delta, BoardDelta)
+    client.apply_delta(delta)
+
+    assert client.version == server.version
+    assert pile_strings(client) == pile_strings(server)
+
+
+def test_delta_is_much_smaller_than_snapshot():
+    server = Board(0)
+    server.startGame()
+    play_some_turns(server, 3, random.Random(1))
+    assert len(pickle.dumps(server.delta_since(server.version))) < len(pickle.dumps(server)) // 10
+
+
+def test_stale_or_unknown_version_falls_back_to_snapshot():
+    server = Board(0)
+    server.startGame()
+    assert server.delta_since(server.version + 5) is None
+    assert server.delta_since(-1) is None
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+PyTest for the compact board: cards as one-byte codes in bytearray piles, Card views, copies, the released generator
+and how commands find the card they name.
+"""
+import pickle
+import random
+
+from Game import (CARD_NAMES, DECK_SIZE, HIDDEN_CODE, Board, BoardView, Card, Deck, card_code, decode_state,
+                  encode_board, rank_of)
+
+
+def test_codes_name_every_card_of_both_decks():
+    assert card_code("Hearts", "Ace") == 0 and card_code("Spades", "King") == DECK_SIZE - 1
+    assert card_code("Clubs", "7", copy=1) == DECK_SIZE + card_code("Clubs", "7")
+    assert CARD_NAMES[card_code("Diamonds", "Queen", copy=1)] == "Queen of Diamonds"
+    assert CARD_NAMES[HIDDEN_CODE] == "Card of Hidden"
+    assert rank_of(card_code("Spades", "Jack", copy=1)) == Deck.ranks.index("Jack")
+    deck = Deck(2)
+    assert len(deck.cards) == 104 and len({CARD_NAMES[code] for code in deck.cards}) == 52
+
+
+def test_card_view_stands_in_for_its_code():
+    ace = Card("Hearts", "Ace", copy=1)
+    assert (ace.suit, ace.rank, str(ace)) == ("Hearts", "Ace", "Ace of Hearts")
+    pile = bytearray()
+    pile.append(ace)
+    assert ace in pile and pile == bytearray([ace]) == bytearray([DECK_SIZE])
+    hidden = Card.of(HIDDEN_CODE)
+    assert (hidden.suit, hidden.rank) == ("Hidden", "Card")
+
+
+def test_view_is_a_copy_with_card_objects():
+    board = Board(1, seed=4)
+    board.startGame()
+    view = board.view()
+    assert isinstance(view, BoardView)
+    hand = board.playerOne.hand if board.currentTurn == 0 else board.playerTwo.hand
+    seen = view.playerOne.hand if board.currentTurn == 0 else view.playerTwo.hand
+    assert [str(card) for card in seen] == [CARD_NAMES[code] for code in hand]
+    seen.clear()
+    assert len(hand) == 5
+
+
+def test_copy_is_independent_and_pickles_round_trip():
+    board = Board(2, seed=9)
+    board.startGame()
+    copy = board.copy()
+    player = board.playerOne if board.currentTurn == 0 else board.playerTwo
+    board.play(f"discard:{CARD_NAMES[player.hand[0]]}:0", board.currentTurn)
+    assert [bytes(pile) for pile in copy.piles()] != [bytes(pile) for pile in board.piles()]
+    assert copy.version == board.version - 1
+
+    for other in (pickle.loads(pickle.dumps(board)), decode_state(encode_board(board))):
+        assert [CARD_NAMES[c] for pile in other.piles() for c in pile] == \
+               [CARD_NAMES[c] for pile in board.piles() for c in pile]
+
+
+def test_reset_deals_as_many_decks_as_the_board_has():
+    board = Board(4, decks=1, seed=5)
+    board.ready = True
+    board.reset()
+    assert sum(len(pile) for pile in board.piles()) == DECK_SIZE
+    for other in (board.copy(), pickle.loads(pickle.dumps(board)), decode_state(encode_board(board))):
+        other.ready = True
+        other.reset()
+        assert other.decks == 1 and sum(len(pile) for pile in other.piles()) == DECK_SIZE
+
+
+def test_released_generator_continues_the_same_stream():
+    board = Board(3, seed=21)
+    board.startGame()
+    assert board._rng is None
+
+    continuous = random.Random(21)
+    continuous.shuffle(bytearray(104))
+    assert board.rng.getrandbits(64) == continuous.getrandbits(64)
+
+    # A copy draws exactly what the original would
+    board.reseed(5)
+    board._shuffle(bytearray(30))
+    assert board.copy().rng.random() == board.rng.random()
+
+
+def seated(hand, goal=(), discard=()):
+    """A board where player one holds hand, on top of goal, with discard as the tops of their discard piles."""
+    board = Board(4, seed=4)
+    board.playerOne.hand = bytearray(hand)
+    board.playerOne.goal = bytearray(goal)
+    for pile, code in zip(board.playerOne.discard, discard):
+        pile.append(code)
+    return board
+
+
+def test_command_plays_one_copy_of_a_doubled_card():
+    seven, copy = card_code("Clubs", "7"), card_code("Clubs", "7", copy=1)
+    board = seated([copy, card_code("Hearts", "2"), seven])
+    board.discard("7 of Clubs", "2", 0)
+    assert board.playerOne.hand == bytearray([card_code("Hearts", "2"), seven])
+    assert board.playerOne.discard[2] == bytearray([copy])
+
+    board.move("7 of Clubs", "1", 0)
+    assert board.playerOne.hand == bytearray([card_code("Hearts", "2")])
+    assert board.field[1] == bytearray([seven])
+
+
+def test_move_looks_in_hand_then_goal_then_discard_tops():
+    ace = card_code("Spades", "Ace")
+    board = seated([ace], goal=[ace + DECK_SIZE], discard=[card_code("Hearts", "5"), ace])
+    board.move("Ace of Spades", "0", 0)
+    assert not board.playerOne.hand and len(board.playerOne.goal) == 1
+    board.move("Ace of Spades", "0", 0)
+    assert not board.playerOne.goal and board.playerOne.discard[1] == bytearray([ace])
+    board.move("Ace of Spades", "0", 0)
+    assert not board.playerOne.discard[1] and board.field[0] == bytearray([ace, ace + DECK_SIZE, ace])
+
+
+def test_unknown_or_unreachable_cards_change_nothing():
+    board = seated([card_code("Hearts", "King")], discard=[card_code("Clubs", "3")])
+    before = [bytes(pile) for pile in board.piles()]
+    board.move("Joker of Hearts", "0", 0)
+    board.discard("3 of Clubs", "0", 0)
+    board.move("King of Hearts", "0", 1)
+    board.discard("Queen of Hearts", "0", 0)
+    assert [bytes(pile) for pile in board.piles()] == before
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+PyTest for negotiated reply compression: the size threshold, framing round trips and the handshake.
+"""
+import os
+import pickle
+import zlib
+
+import pytest
+
+from Lobby import Lobby, Session
+from Network import Network
+from Protocol import (FLAG_COMPRESSED, FLAG_PUSH, Compressor, FrameDecoder, ProtocolError, negotiate, pack_frame,
+                      parse_greeting)
+from conftest import send_turn
+
+
+def test_large_replies_are_compressed_and_small_ones_are_not():
+    compressor = Compressor(level=1, minSize=256)
+    large = b"Hearts Spades Clubs Diamonds " * 100
+    frame = compressor.pack(large, FLAG_PUSH)
+    assert len(frame) < len(large) // 5
+    assert FrameDecoder().feed(frame) == [(FLAG_PUSH | FLAG_COMPRESSED, large)]
+
+    assert compressor.pack(b"x" * 255) == pack_frame(b"x" * 255)
+    # Random bytes don't shrink, so they are sent as they are
+    noise = os.urandom(1000)
+    assert compressor.pack(noise) == pack_frame(noise)
+
+    stats = compressor.stats()
+    assert (stats["compressed"], stats["skipped"]) == (2, 1)
+    assert stats["bytes_in"] == len(large) + len(noise)
+    assert stats["bytes_saved"] == len(large) - (len(frame) - 5)
+
+
+def test_decoder_refuses_frames_that_inflate_past_the_limit():
+    bomb = pack_frame(zlib.compress(b"\0" * 5000), FLAG_COMPRESSED)
+    assert len(bomb) < 1000
+    with pytest.raises(ProtocolError):
+        FrameDecoder(max_frame=4096).feed(bomb)
+    with pytest.raises(ProtocolError):
+        FrameDecoder().feed(pack_frame(b"not zlib", FLAG_COMPRESSED))
+
+
+def test_compression_is_negotiated():
+    assert negotiate({"format": "binary", "compress": "zlib"}) == {"format": "binary", "compress": "zlib"}
+    assert negotiate({"format": "binary", "compress": "zlib"}, compression=False) == {"format": "binary"}
+    assert negotiate({"format": "binary", "compress": "brotli"}) == {"format": "binary"}
+
+
+def test_session_compresses_only_for_clients_that_asked():
+    lobby = Lobby(compressor=Compressor())
+    asking, plain = Session(lobby), Session(lobby)
+    for session, hello in ((asking, "hello:format=pickle,compress=zlib:"), (plain, "hello:format=pickle:")):
+        session.respond(hello)
+    assert (asking.compress, plain.compress) == (True, False)
+
+    flags, payload = FrameDecoder().feed(asking.respond("get"))[0]
+    assert flags & FLAG_COMPRESSED and pickle.loads(payload).id == asking.gameId
+    flags, payload = FrameDecoder().feed(plain.respond("get"))[0]
+    assert not flags & FLAG_COMPRESSED and pickle.loads(payload).id == asking.gameId
+
+    # A server without a Compressor declines
+    declined = Session(Lobby())
+    _, options = parse_greeting(declined.hello("hello:format=pickle,compress=zlib:").decode())
+    assert "compress" not in options and not declined.compress
+
+
+def test_client_with_compression_plays_normally(any_server):
+    _, port = any_server
+    clients = [Network(max_retries=20, retry_delay=0.05, port=port, wire_format="pickle", compress=True)
+               for _ in range(2)]
+    try:
+        assert all(c.options["compress"] == "zlib" for c in clients)
+        board = clients[0].sync()
+        moved = send_turn(clients)
+        assert board.id == moved.id
+        assert clients[0].sync().version == moved.version
+    finally:
+        for c in clients:
+            c.client.close()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Stress tests for length-prefixed framing: fragmented, pipelined and oversized frames.
+"""
+import random
+import socket
+import time
+
+import pytest
+
+from Network import Network
+from Protocol import FRAME_HEADER, FrameDecoder, ProtocolError, decode_reply, pack_frame
+
+
+def test_decoder_reassembles_byte_by_byte():
+    payload = bytes(random.Random(0).getrandbits(8) for _ in range(20000))
+    decoder = FrameDecoder()
+    frames = []
+    for byte in pack_frame(payload):
+        frames += decoder.feed(bytes([byte]))
+    assert frames == [(0, payload)]
+
+
+def test_decoder_returns_every_frame_in_one_chunk():
+    stream = b"".join(pack_frame(f"get{i}") for i in range(5))
+    # Split mid-header and mid-payload on top of carrying several frames per chunk
+    decoder = FrameDecoder()
+    frames = decoder.feed(stream[:7]) + decoder.feed(stream[7:23]) + decoder.feed(stream[23:])
+    assert [payload for _, payload in frames] == [f"get{i}".encode() for i in range(5)]
+
+
+def test_decoder_handles_replies_larger_than_old_recv_buffer():
+    rng = random.Random(1)
+    payloads = [bytes(rng.getrandbits(8) for _ in range(size)) for size in (9000, 70000, 3)]
+    stream = b"".join(pack_frame(p) for p in payloads)
+    decoder = FrameDecoder()
+    frames, offset = [], 0
+    while offset < len(stream):
+        step = rng.randint(1, 3000)
+        frames += decoder.feed(stream[offset:offset + step])
+        offset += step
+    assert [payload for _, payload in frames] == payloads
+
+
+def test_decoder_rejects_oversized_frame():
+    decoder = FrameDecoder(max_frame=1024)
+    with pytest.raises(ProtocolError):
+        decoder.feed(FRAME_HEADER.pack(4096, 0))
+
+
+def read_frames(sock, count):
+    decoder, frames = FrameDecoder(), []
+    while len(frames) < count:
+        data = sock.recv(65536)
+        assert data, 'server closed the connection early'
+        frames += decoder.feed(data)
+    return [payload for _, payload in frames]
+
+
+def test_server_answers_fragmented_and_pipelined_frames(any_server):
+    _, port = any_server
+    with socket.create_connection(('127.0.0.1', port)) as sock:
+        # Hello plus three pipelined requests, dribbled out one byte at a time
+        stream = pack_frame("hello:format=pickle:") + b"".join(pack_frame("get") for _ in range(3))
+        for byte in stream:
+            sock.sendall(bytes([byte]))
+            time.sleep(0.0005)
+        frames = read_frames(sock, 4)
+        assert frames[0].startswith(b"0:")
+        boards = [decode_reply(frame, "pickle") for frame in frames[1:]]
+        assert all(board.id == boards[0].id for board in boards)
+
+
+def test_server_drops_connection_on_oversized_frame(any_server):
+    _, port = any_server
+    with socket.create_connection(('127.0.0.1', port)) as sock:
+        sock.settimeout(5)
+        sock.sendall(FRAME_HEADER.pack(64 << 20, 0) + b"x" * 1024)
+        assert sock.recv(1024) == b''
+
+
+def test_network_pipelines_requests(any_server):
+    _, port = any_server
+    c1 = Network(max_retries=20, retry_delay=0.05, port=port)
+    c2 = Network(max_retries=20, retry_delay=0.05, port=port)
+    try:
+        boards = c1.send_many(["get", "sync:-1:", "get"])
+        assert len(boards) == 3
+        assert all(board is not None and board.ready for board in boards)
+    finally:
+        c1.client.close()
+        c2.client.close()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+PyTest for the move journal: replaying seeds and commands rebuilds live games after a crash.
+"""
+import os
+import signal
+
+from Game import CARD_NAMES, encode_board
+from Journal import Journal
+from Lobby import Lobby
+from Network import Network
+from conftest import play_turn, running_server, seat_game
+
+
+def play_turns(players, turns):
+    """Discard a hand card for whoever's turn it is, turns times."""
+    for _ in range(turns):
+        board = players[0].room.board
+        hand = (board.playerOne if board.currentTurn == 0 else board.playerTwo).hand
+        players[board.currentTurn].handle(f"discard:{CARD_NAMES[hand[0]]}:{board.version % 4}")
+
+
+def encoded_games(lobby):
+    return {room.board.id: encode_board(room.board) for room in lobby.games.rooms()}
+
+
+def test_replay_rebuilds_identical_boards(tmp_path):
+    lobby = Lobby(journal=Journal(str(tmp_path), flushInterval=0))
+    games = [seat_game(lobby) for _ in range(3)]
+    for players in games:
+        play_turns(players, 10)
+    board = games[1][0].room.board
+    while board.winner is None:
+        play_turn(games[1])
+    # Once the game is won a reset deals the next one
+    games[1][0].handle("reset")
+    assert board.winner is None
+    play_turns(games[1], 3)
+    before = encoded_games(lobby)
+
+    recovered = Lobby(journal=Journal(str(tmp_path)))
+    assert recovered.recover() == 3
+    assert encoded_games(recovered) == before
+
+
+def test_snapshot_bounds_replay_and_keeps_later_moves(tmp_path):
+    journal = Journal(str(tmp_path), flushInterval=0)
+    journal.recover()
+    lobby = Lobby(journal=journal)
+    players = seat_game(lobby)
+    play_turns(players, 5)
+    journal.snapshot(lobby.capture)
+    play_turns(players, 5)
+    before = encoded_games(lobby)
+
+    # Only the snapshot and the segment written since it are left
+    assert sorted(os.listdir(tmp_path)) == ['journal-00000002.log', 'snapshot-00000002.bin']
+    recovered = Lobby(journal=Journal(str(tmp_path)))
+    recovered.recover()
+    assert encoded_games(recovered) == before
+    # The shuffle generator was restored too, so the next reset deals the same cards in both
+    players[0].room.board.reset()
+    replica = recovered.games.get(players[0].gameId)
+    replica.board.reset()
+    assert encode_board(replica.board)[9:] == encode_board(players[0].room.board)[9:]
+
+
+def test_closed_games_and_torn_tail(tmp_path):
+    journal = Journal(str(tmp_path), flushInterval=0)
+    journal.recover()
+    lobby = Lobby(journal=journal)
+    gone = seat_game(lobby)
+    kept = seat_game(lobby)
+    play_turns(kept, 4)
+    for session in gone:
+        session.close()
+    before = encoded_games(lobby)
+    journal.close()
+    with open(os.path.join(tmp_path, 'journal-00000001.log'), 'ab') as f:
+        f.write(b'\x00\x00\x01')
+
+    recovered = Lobby(journal=Journal(str(tmp_path)))
+    assert recovered.recover() == 1
+    assert encoded_games(recovered) == before
+
+
+def test_recovered_game_resumes_for_the_next_players(tmp_path):
+    lobby = Lobby(journal=Journal(str(tmp_path), flushInterval=0))
+    players = seat_game(lobby)
+    play_turns(players, 6)
+    before = encode_board(players[0].room.board)
+
+    recovered = Lobby(journal=Journal(str(tmp_path)))
+    recovered.recover()
+    again = seat_game(recovered)
+    assert [s.gameId for s in again] == [players[0].gameId] * 2
+    assert encode_board(again[0].room.board) == before
+    # New games get fresh ids
+    assert seat_game(recovered)[0].gameId != players[0].gameId
+
+
+def test_server_recovers_games_after_a_kill(tmp_path):
+    journal = str(tmp_path / 'journal')
+    with running_server('--journal', journal, '--journal-flush', '0') as (process, port):
+        clients = [Network(max_retries=20, retry_delay=0.05, port=port) for _ in range(2)]
+        for _ in range(6):
+            board = clients[0].sync()
+            hand = (board.playerOne if board.currentTurn == 0 else board.playerTwo).hand
+            clients[board.currentTurn].send(f"discard:{CARD_NAMES[hand[0]]}:0")
+        before = clients[0].sync()
+        os.kill(process.pid, signal.SIGKILL)
+        process.wait()
+        for c in clients:
+            c.client.close()
+
+    with running_server('--journal', journal) as (process, port):
+        clients = [Network(max_retries=20, retry_delay=0.05, port=port) for _ in range(2)]
+        try:
+            after = clients[0].sync()
+            assert after.ready is True
+            assert (after.id, after.version, after.currentTurn) == (before.id, before.version, before.currentTurn)
+            assert after.playerOne.hand == before.playerOne.hand
+            assert after.deck.cards == before.deck.cards
+        finally:
+            for c in clients:
+                c.client.close()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+PyTest for the split between the rules and the screen: the core runs without pygame, Layout places and drops cards.
+"""
+import subprocess
+import sys
+
+import pytest
+
+from Game import Board, Card, card_code, decode_state, encode_board
+from conftest import ROOT
+
+
+def dealt_board():
+    board = Board(3, seed=11)
+    board.startGame()
+    return board
+
+
+def test_server_side_modules_do_not_import_pygame():
+    code = ("import sys; import Game, Lobby, Network, Agent, AsyncServer, Workers, Reaper, Spectators; "
+            "print('pygame' in sys.modules)")
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == 'False'
+
+
+def test_cards_carry_no_geometry():
+    board = Board(1, seed=5)
+    board.startGame()
+    assert all(isinstance(pile, bytearray) for pile in board.piles())
+    assert vars(Card('Hearts', 'Ace')) == {'code': card_code('Hearts', 'Ace')}
+
+
+def test_layout_places_cards_where_the_client_draws_them():
+    pygame = pytest.importorskip('pygame')
+    from Layout import layout
+
+    view = decode_state(encode_board(dealt_board())).view()
+    assert layout(view) is view
+    board = view
+    player, (y, _) = ((board.playerOne, (50, 155)), (board.playerTwo, (470, 365)))[board.currentTurn]
+    assert [card.rect.topleft for card in player.hand] == [(140 + 81 * i, y) for i in range(5)]
+    assert board.playerTwo.goal[0].rect.topleft == (25, 470)
+    assert isinstance(board.playerOne.goal[0].rect, pygame.Rect)
+
+
+def test_dropping_a_card_turns_into_a_command():
+    pytest.importorskip('pygame')
+    from Layout import discard_x, field_x, layout, play_card, FIELD_Y, PLAYER_ROWS
+
+    board = layout(dealt_board().view())
+    player = board.playerOne if board.currentTurn == 0 else board.playerTwo
+    card = player.hand[0]
+
+    card.rect.topleft = (discard_x(2), PLAYER_ROWS[board.currentTurn][1])
+    assert play_card(board, card) == f"discard:{card}:2"
+
+    card.rect.topleft = (field_x(1), FIELD_Y)
+    expected = f"move:{card}:1" if card.rank in ("Ace", "King") else None
+    assert play_card(board, card) == expected
+
+    card.rect.topleft = (0, 0)
+    assert play_card(board, card) is None
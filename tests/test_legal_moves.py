@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+PyTest for Board.legal_moves, Board.legal and Board.allows: one set of rules for the server, agents and tests.
+"""
+import os
+import sys
+
+from conftest import ROOT, play_turn, seat_game
+
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from Game import (CARD_NAMES, DECK_SIZE, DISCARD_PILE, FIELD_PILE, GOAL_PILE, HAND_PILE, Board, Move, card_code,
+                  fits)
+from Lobby import Lobby, Session
+from loadgen import mid_game
+
+
+def every_command():
+    for action in ("move", "discard"):
+        for name in CARD_NAMES[:DECK_SIZE]:
+            for location in range(4):
+                yield f"{action}:{name}:{location}"
+
+
+def test_generator_and_check_agree_on_every_command():
+    for seed in range(8):
+        board = mid_game(seed, 20)
+        seat = board.currentTurn
+        moves = list(board.legal_moves(seat))
+        assert len({str(move) for move in moves}) == len(moves)
+        accepted = {command: board.legal(command, seat) for command in every_command()}
+        assert {command for command, move in accepted.items() if move is not None} == {str(move) for move in moves}
+        for move in moves:
+            assert accepted[str(move)] == move
+        # Only the player whose turn it is may play
+        assert all(board.legal(str(move), 1 - seat) is None for move in moves)
+
+
+def test_moves_describe_what_play_does():
+    board = mid_game(3, 20)
+    seat = board.currentTurn
+    for move in board.legal_moves(seat):
+        played = board.copy()
+        source, target = played.piles()[move.source], played.piles()[move.target]
+        before = len(target)
+        # Board.move or Board.discard: the rules play() runs for the command
+        getattr(played, move.action)(CARD_NAMES[move.card], move.location, seat)
+        assert len(target) == before + 1 and target[-1] == move.card
+        assert source.count(move.card) == board.piles()[move.source].count(move.card) - 1
+
+
+def test_field_moves_follow_the_rules():
+    board = Board(0, decks=0)
+    ace, two, king = card_code("Hearts", "Ace"), card_code("Clubs", "2"), card_code("Spades", "King")
+    board.playerOne.hand = bytearray([two, king])
+    board.playerOne.goal = bytearray([ace])
+    board.field[2].append(card_code("Diamonds", "Ace"))
+    moves = list(board.legal_moves(0))
+    field = [move for move in moves if move.action == "move"]
+    # The goal comes first; a King goes anywhere, a 2 only on the Ace
+    assert field[0] == Move("move", ace, GOAL_PILE[0], FIELD_PILE)
+    assert {move.target for move in field if move.card == king} == set(range(FIELD_PILE, FIELD_PILE + 4))
+    assert [move.target for move in field if move.card == two] == [FIELD_PILE + 2]
+    assert all(fits(move.card, board.field[move.location]) for move in field)
+    discards = [move for move in moves if move.action == "discard"]
+    assert len(discards) == 8 and {move.source for move in discards} == {HAND_PILE[0]}
+    assert str(discards[-1]) == "discard:King of Spades:3" and discards[-1].target == DISCARD_PILE[0] + 3
+
+
+def test_goal_card_also_in_hand_is_played_from_the_hand():
+    board = Board(0, decks=0)
+    ace = card_code("Hearts", "Ace")
+    board.playerTwo.hand = bytearray([card_code("Clubs", "9"), ace + DECK_SIZE])
+    board.playerTwo.goal = bytearray([ace])
+    first = next(board.legal_moves(1))
+    assert (str(first), first.source, first.card) == ("move:Ace of Hearts:0", HAND_PILE[1], ace + DECK_SIZE)
+
+
+def test_server_refuses_illegal_plays():
+    lobby = Lobby()
+    players = seat_game(lobby)
+    board = players[0].room.board
+    seat = board.currentTurn
+    waiting = board.playerTwo if seat == 0 else board.playerOne
+    version = board.version
+
+    players[1 - seat].handle("discard:Ace of Hearts:0")
+    players[1 - seat].handle(f"discard:{CARD_NAMES[waiting.goal[0]]}:0")
+    players[seat].handle("discard:Ace of Hearts:7")
+    players[seat].handle("move:Joker of Hearts:0")
+    assert board.version == version and lobby.rejected == 4
+
+    move = next(board.legal_moves(seat))
+    players[seat].handle(str(move))
+    assert board.version == version + 1
+
+
+def test_start_deal_and_reset_are_allowed_only_where_they_fit():
+    board = Board(0, seed=0)
+    assert board.allows("reset", 1)
+    # Only the lobby deals a game, once both seats are filled
+    assert not board.allows("start::", 0)
+    assert not board.allows("deal::", 0)
+    board.startGame()
+    seat = board.currentTurn
+    player = board.playerTwo if seat else board.playerOne
+    assert not board.allows("start::", seat) and not board.allows("reset", seat)
+    # Only the player whose turn it is, once their hand is played out
+    assert not board.allows("deal::", seat)
+    player.hand = bytearray()
+    assert board.allows("deal::", seat) and not board.allows("deal::", 1 - seat)
+    board.winner = seat
+    assert board.allows("reset", 1 - seat) and not board.allows("deal::", seat)
+    assert not board.allows("shuffle::", seat) and not board.allows("deal::", "x")
+
+
+def test_lone_player_cannot_start_the_game():
+    lobby = Lobby()
+    waiting = Session(lobby)
+    waiting.hello("hello:format=binary:")
+    board = waiting.room.board
+    version = board.version
+    waiting.handle("start::0")
+    assert not board.ready and board.version == version and lobby.rejected == 1
+
+    # The opponent taking the other seat is what deals it
+    Session(lobby).hello("hello:format=binary:")
+    assert board.ready
+
+
+def test_server_refuses_start_deal_and_reset_mid_game():
+    lobby = Lobby()
+    players = seat_game(lobby)
+    board = players[0].room.board
+    seat = board.currentTurn
+    player = board.playerTwo if seat else board.playerOne
+    version, cards = board.version, bytes(board.deck.cards)
+
+    for session in players:
+        session.handle("start::")
+        session.handle("reset")
+    # Out of turn, and a hand that still has cards in it
+    players[1 - seat].handle("deal::")
+    players[seat].handle("deal::")
+    assert board.version == version and bytes(board.deck.cards) == cards and lobby.rejected == 6
+
+    player.hand = bytearray()
+    players[seat].handle("deal::")
+    assert len(player.hand) == 5 and board.version == version + 1
+
+    while board.winner is None:
+        play_turn(players)
+    # A finished game may be thrown away for the next one
+    players[1 - board.winner].handle("reset")
+    assert board.winner is None and board.ready and lobby.rejected == 6
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+PyTest for benchmarks/loadgen.py: the built-in policy and a short mass-disconnect run.
+"""
+import os
+import subprocess
+import sys
+
+from conftest import ROOT
+
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from Game import Board, card_code, fits
+from loadgen import choose
+
+
+def test_policy_follows_the_field_rules():
+    assert fits(card_code("Hearts", "Ace"), [])
+    assert fits(card_code("Hearts", "King"), [])
+    assert not fits(card_code("Hearts", "2"), [])
+    assert fits(card_code("Hearts", "2"), [card_code("Clubs", "Ace")])
+    assert not fits(card_code("Hearts", "3"), [card_code("Clubs", "Ace")])
+
+
+def test_policy_prefers_the_goal_card():
+    board = Board(0, decks=0)
+    board.playerOne.goal = bytearray([card_code("Spades", "Ace")])
+    board.playerOne.hand = bytearray([card_code("Hearts", "King"), card_code("Hearts", "7")])
+    assert choose(board, 0, None) == "move:Ace of Spades:0"
+    board.playerOne.goal = bytearray([card_code("Spades", "5")])
+    assert choose(board, 0, None) == "move:King of Hearts:0"
+
+
+def test_disconnect_scenario_runs_clean():
+    result = subprocess.run([sys.executable, os.path.join(ROOT, 'benchmarks', 'loadgen.py'), '--scenario', 'disconnect',
+                             '--pairs', '6', '--procs', '1', '--seconds', '3'],
+                            cwd=ROOT, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert "games finished" in result.stdout
+    assert "reconnects:" in result.stdout
+    assert "player errors" not in result.stdout
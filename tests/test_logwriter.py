@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+PyTest for the queued log writer: bounded queue, batched writes, size rotation, and move sampling.
+"""
+import io
+import logging
+import os
+
+import pytest
+
+from Lobby import Lobby
+from LogWriter import LogWriter, QueueLogHandler, RotatingFile
+
+
+@pytest.fixture
+def queued_logger():
+    logger = logging.getLogger("test_logwriter")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    handler = QueueLogHandler(capacity=500)
+    logger.addHandler(handler)
+    yield logger, handler
+    logger.removeHandler(handler)
+
+
+def test_queue_is_bounded_and_batches_are_written_together(queued_logger):
+    logger, handler = queued_logger
+    out = io.StringIO()
+    writer = LogWriter(handler, [out], logging.Formatter('%(message)s'), batch=200)
+    for i in range(600):
+        logger.info(f"line {i}")
+    # Nothing is written by the logging thread itself
+    assert out.getvalue() == ""
+    assert handler.dropped == 100
+
+    writer.drain()
+    assert out.getvalue().splitlines() == [f"line {i}" for i in range(500)]
+    assert writer.stats() == {"written": 500, "batches": 3, "queued": 0, "dropped": 100}
+
+
+def test_writer_thread_and_shutdown_flush(queued_logger, tmp_path):
+    logger, handler = queued_logger
+    out = RotatingFile(str(tmp_path / 'server.log'))
+    writer = LogWriter(handler, [out], logging.Formatter('%(message)s'), interval=60).start()
+    logger.info("before stop")
+    # flush() is what logging.shutdown() calls at exit
+    handler.flush()
+    assert (tmp_path / 'server.log').read_text() == "before stop\n"
+    logger.info("at stop")
+    writer.stop()
+    assert (tmp_path / 'server.log').read_text() == "before stop\nat stop\n"
+
+
+def test_rotating_file_keeps_backups_and_follows_other_processes(tmp_path):
+    path = str(tmp_path / 'server.log')
+    log = RotatingFile(path, maxBytes=100, backups=2)
+    for i in range(12):
+        log.write(f"{i:02d}" + "x" * 27 + "\n")
+    assert sorted(os.listdir(tmp_path)) == ['server.log', 'server.log.1', 'server.log.2']
+    assert all(os.path.getsize(tmp_path / name) <= 100 for name in os.listdir(tmp_path))
+    assert open(path).read().startswith("09")
+
+    # Another worker rotated the file away: the next write goes to the new LOG_PATH
+    os.replace(path, path + '.1')
+    log.write("after\n")
+    assert open(path).read() == "after\n"
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork()')
+def test_forked_child_gets_its_own_writer(queued_logger, tmp_path):
+    logger, handler = queued_logger
+    path = str(tmp_path / 'server.log')
+    writer = LogWriter(handler, [RotatingFile(path)], logging.Formatter('%(message)s'), interval=60).start()
+    logger.info("parent")
+    pid = os.fork()
+    if pid == 0:
+        logger.info("child")
+        logging.shutdown()
+        os._exit(0)
+    os.waitpid(pid, 0)
+    writer.stop()
+    # The parent's queued line is written once, by the parent
+    assert sorted(open(path).read().splitlines()) == ["child", "parent"]
+
+
+def test_move_sampling():
+    assert [Lobby(moveLogEvery=1).logMove() for _ in range(3)] == [True] * 3
+    assert not any(Lobby(moveLogEvery=0).logMove() for _ in range(3))
+    lobby = Lobby(moveLogEvery=3)
+    assert [lobby.logMove() for _ in range(6)] == [True, False, False, True, False, False]
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+PyTest for Matchmaker: pairing on arrival, requeueing abandoned seats, rating buckets and batch pairing.
+"""
+import threading
+import time
+
+from Game import CARD_NAMES
+from Lobby import Lobby, Session
+from Matchmaker import Matchmaker
+
+
+def test_arrivals_are_paired_in_order():
+    mm = Matchmaker()
+    assert mm.join() == (0, 0)
+    assert mm.queueDepth() == 1
+    assert mm.join() == (1, 0)
+    assert mm.join() == (0, 1)
+    assert mm.join() == (1, 1)
+    assert mm.queueDepth() == 0
+    assert mm.stats()["matches"] == 2
+
+
+def test_waiting_player_leaving_does_not_strand_the_next_arrival():
+    mm = Matchmaker()
+    p, gameId = mm.join()
+    assert mm.leave(gameId, p) is True
+    assert mm.queueDepth() == 0
+    # The next player opens a fresh game instead of landing in the deleted one
+    assert mm.join() == (0, 1)
+
+
+def test_abandoned_seat_is_requeued():
+    mm = Matchmaker()
+    mm.join()
+    mm.join()
+    assert mm.leave(0, 1) is False
+    assert mm.stats()["requeued"] == 1
+    assert mm.join() == (1, 0)
+    assert mm.leave(0, 0) is False
+    assert mm.leave(0, 1) is True
+    assert mm.queueDepth() == 0
+
+
+def test_rating_buckets_and_widening():
+    mm = Matchmaker(bucketWidth=100, widenAfter=0.05)
+    assert mm.join(rating=1050) == (0, 0)
+    # Different band: opens its own game rather than joining game 0
+    assert mm.join(rating=1250) == (0, 1)
+    assert mm.join(rating=1090) == (1, 0)
+    # After widenAfter, a neighbouring band may take the waiting seat
+    time.sleep(0.06)
+    assert mm.join(rating=1130) == (1, 1)
+
+
+def test_batch_pairs_in_rating_order():
+    mm = Matchmaker(batchSize=4, batchWindow=5.0)
+    ratings = [1500, 100, 1400, 200]
+    seats = {}
+
+    def arrive(rating):
+        seats[rating] = mm.join(rating)
+
+    threads = [threading.Thread(target=arrive, args=(rating,)) for rating in ratings]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join(timeout=2)
+
+    assert seats[100][1] == seats[200][1]
+    assert seats[1400][1] == seats[1500][1]
+    assert seats[100][1] != seats[1400][1]
+    stats = mm.stats()
+    assert stats["matches"] == 2 and stats["queue_depth"] == 0
+
+
+def test_batch_window_flushes_a_partial_batch():
+    mm = Matchmaker(batchSize=10, batchWindow=0.05)
+    start = time.monotonic()
+    assert mm.join() == (0, 0)
+    assert time.monotonic() - start >= 0.05
+    # The odd player out waits in the normal queue
+    assert mm.queueDepth() == 1
+
+
+def test_lobby_restarts_a_requeued_game_for_the_new_opponent():
+    lobby = Lobby()
+    one, two = Session(lobby), Session(lobby)
+    one.hello("hello:format=binary:")
+    two.hello("hello:format=binary:")
+    room = one.room
+
+    two.close()
+    assert room.board.ready is False
+    assert lobby.games.get(one.gameId) is room
+
+    three = Session(lobby)
+    three.hello("hello:format=binary,rating=1200:")
+    assert (three.gameId, three.p) == (one.gameId, two.p)
+    assert room.board.ready is True
+
+
+def test_stale_move_after_a_requeue_does_not_break_the_game():
+    lobby = Lobby()
+    one, two = Session(lobby), Session(lobby)
+    one.hello("hello:format=binary:")
+    two.hello("hello:format=binary:")
+    goal = CARD_NAMES[one.room.board.playerOne.goal[0]]
+
+    # The opponent leaves; the board is reset with empty goals before player 0 hears about it
+    two.close()
+    assert one.handle(f"move:{goal}:0") is not None
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+PyTest for Metrics: per-command latency histograms, reply bytes, gauges and the HTTP endpoint.
+"""
+import urllib.request
+
+import pytest
+
+from Lobby import Lobby, Session
+from Metrics import LATENCY_BUCKETS, Metrics, command_name
+from Network import Network
+from conftest import free_port, running_server
+
+
+def test_command_names_have_a_bounded_label_set():
+    assert command_name("get") == "get"
+    assert command_name("sync:12:") == "sync"
+    assert command_name("move:5 of Hearts:2") == "move"
+    assert command_name("hello:format=binary:") == "hello"
+    assert command_name("drop table") == "other"
+
+
+def test_latency_buckets():
+    metrics = Metrics()
+    for seconds in (0.00001, 0.00005, 0.003, 2.0):
+        metrics.observe("get", seconds, 10)
+    series = metrics.series["get"]
+    assert series.counts[0] == 2 and series.counts[LATENCY_BUCKETS.index(0.005)] == 1 and series.counts[-1] == 1
+    assert series.count == 4 and series.bytes == 40
+    assert series.sum == pytest.approx(2.00306)
+
+
+def test_sessions_record_commands_and_gauges():
+    metrics = Metrics()
+    lobby = Lobby(metrics=metrics)
+    one, two = Session(lobby), Session(lobby)
+    one.respond("hello:format=binary:")
+    two.respond("hello:format=binary:")
+    frames = [one.respond("get") for _ in range(3)]
+
+    text = metrics.render()
+    assert 'cards_command_duration_seconds_count{command="get"} 3' in text
+    assert 'cards_command_duration_seconds_count{command="hello"} 2' in text
+    assert 'cards_command_duration_seconds_bucket{command="get",le="+Inf"} 3' in text
+    assert f'cards_reply_bytes_total{{command="get"}} {sum(map(len, frames))}' in text
+    assert "cards_active_games 1" in text
+    assert "cards_connected_seats 2" in text
+    assert "# TYPE cards_snapshot_cache_hits_total counter" in text
+
+
+def test_lobby_without_metrics_skips_instrumentation():
+    lobby = Lobby()
+    session = Session(lobby)
+    assert session.respond("hello:format=binary:") is not None
+    assert lobby.metrics is None
+
+
+@pytest.mark.parametrize('mode', ['threaded', 'asyncio'])
+def test_metrics_endpoint(mode):
+    metrics_port = free_port()
+    with running_server('--mode', mode, '--metrics-port', str(metrics_port)) as (_, port):
+        clients = [Network(max_retries=20, retry_delay=0.05, port=port) for _ in range(2)]
+        try:
+            clients[0].send('reset')
+            clients[1].send('get')
+            with urllib.request.urlopen(f'http://127.0.0.1:{metrics_port}/metrics', timeout=5) as response:
+                assert response.headers['Content-Type'].startswith('text/plain')
+                text = response.read().decode()
+        finally:
+            for c in clients:
+                c.client.close()
+
+    assert 'cards_command_duration_seconds_count{command="reset"} 1' in text
+    assert 'cards_command_duration_seconds_count{command="get"}' in text
+    assert 'cards_replies_total{command="hello"} 2' in text
+    assert "cards_connected_seats 2" in text
+    assert "cards_threads " in text
+    if mode == 'asyncio':
+        assert "cards_asyncio_tasks " in text
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+PyTest for server push: subscribed clients get changes without asking, and "wait:" long-polls.
+"""
+import threading
+import time
+
+from Network import Network
+from conftest import give_turn, send_turn, turn_command
+
+
+def connect_pair(port):
+    c1 = Network(max_retries=20, retry_delay=0.05, port=port)
+    time.sleep(0.1)
+    c2 = Network(max_retries=20, retry_delay=0.05, port=port)
+    return c1, c2
+
+
+def poll_until(client, predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        board = client.poll()
+        if board is not None and predicate(board):
+            return board
+        time.sleep(0.01)
+    return client.board
+
+
+def test_subscriber_receives_pushed_changes(any_server):
+    _, port = any_server
+    c1, c2 = connect_pair(port)
+    try:
+        board = c1.subscribe()
+        assert board.ready is True
+
+        moved = send_turn([c1, c2])
+        pushed = poll_until(c1, lambda b: b.version == moved.version)
+        assert pushed.version == moved.version
+        assert len(pushed.deck.cards) == len(moved.deck.cards)
+
+        # A subscriber's own requests still get ordinary replies
+        assert c1.sync().version == moved.version
+    finally:
+        c1.client.close()
+        c2.client.close()
+
+
+def test_wait_returns_when_board_changes(any_server):
+    _, port = any_server
+    c1, c2 = connect_pair(port)
+    try:
+        board = give_turn([c1, c2], c2)
+        version = c1.sync().version
+        woken = []
+
+        def wait():
+            start = time.monotonic()
+            board = c1.wait(timeout=5)
+            woken.append((board, time.monotonic() - start))
+
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        # The long-poll is parked on the server before the other player changes anything
+        time.sleep(0.3)
+        assert not woken
+        c2.send(turn_command(board))
+        waiter.join(timeout=5)
+        board, elapsed = woken[0]
+        assert board.version > version
+        # Woken by the change, well before the timeout
+        assert elapsed < 2
+    finally:
+        c1.client.close()
+        c2.client.close()
+
+
+def test_wait_times_out_without_changes(any_server):
+    _, port = any_server
+    c1, c2 = connect_pair(port)
+    try:
+        version = c1.sync().version
+        start = time.time()
+        board = c1.wait(timeout=0.3)
+        assert 0.25 <= time.time() - start < 3
+        assert board.version == version
+    finally:
+        c1.client.close()
+        c2.client.close()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+PyTest for per-connection and per-game rate limits: over-budget commands are slowed down, never dropped.
+"""
+import time
+
+import pytest
+
+from Lobby import Lobby
+from Network import Network
+from RateLimit import RateLimiter, TokenBucket
+from conftest import running_server, seat_game
+
+
+def test_token_bucket_allows_a_burst_then_paces_to_rate():
+    bucket = TokenBucket(rate=10, burst=3, now=0.0)
+    assert [bucket.reserve(0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve(0.0) == pytest.approx(0.1)
+    # Waiting out the delay before the next command keeps the caller at exactly rate
+    assert bucket.reserve(0.1) == pytest.approx(0.1)
+    assert bucket.reserve(0.2) == pytest.approx(0.1)
+    # A quiet spell refills the bucket, but only up to burst
+    assert [bucket.reserve(10.0) for _ in range(4)][-1] == pytest.approx(0.1)
+
+
+def test_reads_and_moves_have_separate_connection_budgets():
+    limiter = RateLimiter(readRate=5, mutationRate=5, burst=1)
+    lobby = Lobby(limiter=limiter)
+    players = seat_game(lobby)
+    # The hello itself is never limited
+    assert players[0].throttled == 0
+
+    delays = [players[0].throttle("get") for _ in range(6)]
+    assert delays[:5] == [0.0] * 5 and delays[5] > 0
+    # Polling too fast did not use up the moves
+    assert players[0].throttle("discard:5 of Hearts:0") == 0.0
+    # Nor the other connection's reads
+    assert players[1].throttle("get") == 0.0
+    assert limiter.stats()["limited_reads"] == 1
+    assert limiter.stats()["limited_mutations"] == 0
+    assert players[0].throttled == 1
+
+
+def test_game_budget_is_shared_by_its_connections_only():
+    limiter = RateLimiter(gameMutationRate=2, burst=1)
+    lobby = Lobby(limiter=limiter)
+    game, other = seat_game(lobby), seat_game(lobby)
+    assert game[0].throttle("reset") == 0.0
+    assert game[1].throttle("reset") == 0.0
+    assert game[0].throttle("reset") > 0
+    assert other[0].throttle("reset") == 0.0
+    # Reads are unlimited here
+    assert all(game[0].throttle("sync:0:") == 0.0 for _ in range(50))
+
+
+@pytest.mark.parametrize("mode", ["threaded", "asyncio"])
+def test_server_slows_a_flooding_client_but_answers_everything(mode):
+    with running_server('--mode', mode, '--read-rate', '20', '--rate-burst', '0.25') as (_, port):
+        noisy = Network(max_retries=20, retry_delay=0.05, port=port)
+        quiet = [Network(max_retries=20, retry_delay=0.05, port=port) for _ in range(3)]
+        try:
+            start = time.monotonic()
+            for _ in range(25):
+                assert noisy.send('get') is not None
+            # 5 in the burst, then 20 at 20/s
+            assert time.monotonic() - start >= 0.9
+
+            # Other connections still have their whole budget
+            start = time.monotonic()
+            for _ in range(5):
+                assert quiet[1].send('get') is not None
+            assert time.monotonic() - start < 0.5
+        finally:
+            for c in [noisy] + quiet:
+                c.client.close()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+PyTest for the idle reaper: the timer wheel, evicting idle and finished games, and server timeouts.
+"""
+import time
+
+import pytest
+
+from Lobby import Lobby, Session
+from Network import Network
+from Reaper import Reaper, TimerWheel
+from conftest import running_server, seat_game
+
+
+def test_timer_wheel_expires_keys_when_due():
+    wheel = TimerWheel(tick=1.0, slots=8, now=0.0)
+    wheel.schedule("soon", 2.5)
+    wheel.schedule("later", 5.0)
+    # Further out than one turn of the wheel
+    wheel.schedule("far", 20.0)
+    assert len(wheel) == 3
+
+    assert wheel.advance(2.9) == []
+    assert wheel.advance(3.0) == ["soon"]
+    assert wheel.advance(12.0) == ["later"]
+    assert wheel.advance(19.5) == []
+    assert wheel.advance(100.0) == ["far"]
+    assert len(wheel) == 0
+    # Deadlines already in the past go off on the next tick
+    wheel.schedule("late", 50.0)
+    assert wheel.advance(101.0) == ["late"]
+
+
+def test_idle_game_is_evicted_and_its_players_kicked():
+    lobby = Lobby()
+    reaper = lobby.reaper = Reaper(lobby, idleTimeout=10, finishedTimeout=0)
+    players = seat_game(lobby)
+    kicked = []
+    for session in players:
+        session.kick = lambda session=session: kicked.append(session.p)
+    gameId = players[0].gameId
+    start = players[0].room.lastActive
+
+    assert reaper.reap(start + 5) == 0
+    # A command pushes the deadline back; the reaper reschedules instead of evicting
+    players[0].room.lastActive = start + 8
+    assert reaper.reap(start + 11) == 0
+    assert gameId in lobby.games
+
+    assert reaper.reap(start + 19) == 1
+    assert gameId not in lobby.games
+    assert sorted(kicked) == [0, 1]
+    assert players[0].handle("get") is None
+    assert reaper.stats()["evicted_idle"] == 1
+    assert reaper.stats()["reclaimed_bytes"] > 0
+
+    # The evicted game's seats are not offered again; closing the kicked sessions is harmless
+    for session in players:
+        session.close()
+    assert Session(lobby).hello("hello:format=binary:") and lobby.matchmaker.queueDepth() == 1
+    assert gameId not in lobby.games
+
+
+def test_finished_game_goes_sooner_than_idle():
+    lobby = Lobby()
+    reaper = lobby.reaper = Reaper(lobby, idleTimeout=100, finishedTimeout=5)
+    playing = seat_game(lobby)
+    finished = seat_game(lobby)
+    finished[0].room.board.winner = 0
+    start = max(playing[0].room.lastActive, finished[0].room.lastActive)
+
+    assert reaper.reap(start + 6) == 1
+    assert finished[0].gameId not in lobby.games
+    assert playing[0].gameId in lobby.games
+    assert reaper.stats()["evicted_finished"] == 1
+    assert reaper.reap(start + 101) == 1
+    assert len(lobby.games) == 0
+
+
+def test_recovered_games_are_tracked():
+    lobby = Lobby()
+    seat_game(lobby)
+    reaper = Reaper(lobby, idleTimeout=1, finishedTimeout=0)
+    assert reaper.stats()["tracked"] == 1
+    assert reaper.reap(time.monotonic() + 2) == 1
+
+
+@pytest.mark.parametrize("mode", ["threaded", "asyncio"])
+def test_server_evicts_idle_game_and_closes_its_connections(mode):
+    with running_server('--mode', mode, '--idle-timeout', '0.5', '--reap-interval', '0.1') as (_, port):
+        clients = [Network(max_retries=20, retry_delay=0.05, port=port) for _ in range(2)]
+        try:
+            for c in clients:
+                c.client.settimeout(5)
+                assert c.client.recv(1) == b''
+        finally:
+            for c in clients:
+                c.client.close()
+
+
+@pytest.mark.parametrize("mode", ["threaded", "asyncio"])
+def test_server_read_timeout_drops_silent_connection(mode):
+    with running_server('--mode', mode, '--read-timeout', '0.5', '--idle-timeout', '0') as (_, port):
+        client = Network(max_retries=20, retry_delay=0.05, port=port)
+        try:
+            assert client.send('get') is not None
+            client.client.settimeout(5)
+            started = time.monotonic()
+            assert client.client.recv(1) == b''
+            assert time.monotonic() - started < 4
+        finally:
+            client.client.close()
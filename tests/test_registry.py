@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+PyTest for the sharded GameRegistry and per-game locking in Lobby/Session.
+"""
+import threading
+
+from Game import decode_state
+from Lobby import Lobby
+from Registry import GameRegistry
+from conftest import play_turn, seat_game
+
+
+def test_registry_get_setdefault_pop():
+    registry = GameRegistry(shards=4)
+    made = []
+    room = registry.setdefault(7, lambda: made.append(1) or 'room7')
+    assert room == 'room7'
+    assert registry.setdefault(7, lambda: made.append(1) or 'other') == 'room7'
+    assert made == [1]
+
+    assert 7 in registry and 3 not in registry
+    assert registry.get(7) == 'room7'
+    assert len(registry) == 1
+    assert registry.rooms() == ['room7']
+
+    assert registry.pop(7) == 'room7'
+    assert registry.pop(7) is None
+    assert len(registry) == 0
+
+
+def test_lobby_pairs_players_into_registry_rooms():
+    lobby = Lobby()
+    one, two = seat_game(lobby)
+    room = lobby.games.get(one.gameId)
+    assert room is one.room is two.room
+    assert room.board.ready is True
+
+    # The game outlives one player (their seat is requeued) and closes with the last
+    one.close()
+    assert lobby.games.get(one.gameId) is room
+    two.close()
+    assert lobby.games.get(one.gameId) is None
+
+
+def test_snapshots_are_consistent_while_the_other_player_mutates():
+    lobby = Lobby()
+    writer, reader = seat_game(lobby)
+    stop = threading.Event()
+
+    def mutate():
+        while not stop.is_set():
+            play_turn((writer, reader))
+
+    thread = threading.Thread(target=mutate)
+    thread.start()
+    try:
+        for _ in range(300):
+            board = decode_state(reader.handle("get"))
+            # Every card is in exactly one pile at any version a client can see
+            assert sum(len(pile) for pile in board.piles()) == 104
+    finally:
+        stop.set()
+        thread.join()
+
+
+def test_snapshot_cache_reuses_encoding_until_the_board_changes():
+    lobby = Lobby()
+    one, two = seat_game(lobby)
+    room = one.room
+
+    first = one.handle("get")
+    assert two.handle("get") is first
+    assert (room.hits, room.misses) == (1, 1)
+
+    play_turn((one, two))
+    after = two.handle("get")
+    assert after is not first
+    assert decode_state(after).version == room.board.version
+    assert lobby.snapshotStats() == (2, 2)
+
+    # Counters survive the room closing
+    one.close()
+    assert lobby.snapshotStats() == (2, 2)
+
+
+def test_snapshot_cache_can_be_disabled():
+    lobby = Lobby(snapshotCache=False)
+    one, two = seat_game(lobby)
+    assert one.handle("get") == two.handle("get")
+    assert lobby.snapshotStats() == (0, 2)
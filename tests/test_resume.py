@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+PyTest for resume tokens: a dropped player gets their seat and Board back within the grace window.
+"""
+import pytest
+
+from Agent import Agent
+from Game import Board, decode_state
+from Lobby import Lobby, Session
+from Network import Network, NewGame
+from Protocol import parse_greeting
+from Reaper import Reaper
+from conftest import give_turn, play_turn, running_server, seat_game, turn_command
+from test_push import connect_pair, poll_until
+
+
+def test_no_tokens_without_a_grace_window():
+    lobby = Lobby()
+    players = seat_game(lobby)
+    tokens = [session.token for session in players]
+    assert tokens == [None, None]
+    players[0].close()
+    # The seat goes straight back to the matchmaker, as before
+    assert players[1].room.seats == {1} and lobby.matchmaker.queueDepth() == 1
+
+
+def test_dropped_player_resumes_the_same_board():
+    lobby = Lobby(resumeGrace=30)
+    players = seat_game(lobby)
+    tokens = [session.token for session in players]
+    assert all(tokens) and tokens[0] != tokens[1]
+    room = players[0].room
+    board = room.board
+    # Played up to the opponent's turn
+    play_turn(players)
+    while board.currentTurn != 1:
+        play_turn(players)
+    version = board.version
+
+    players[0].close()
+    assert room.seats == {1} and lobby.matchmaker.queueDepth() == 0
+    # The opponent keeps playing while they are away
+    players[1].handle(turn_command(board))
+
+    back = Session(lobby)
+    playerId, options = parse_greeting(back.hello(f"hello:format=binary,resume={tokens[0]}:").decode())
+    assert (playerId, options["token"]) == ("0", tokens[0])
+    assert back.room is room and room.board is board and room.seats == {0, 1}
+    # Syncing from the version it had sends only what it missed
+    delta = decode_state(back.handle(f"sync:{version}:"))
+    assert delta.base == version and delta.version == board.version
+    assert lobby.resumed == 1
+
+
+def test_seat_is_freed_when_the_grace_window_runs_out():
+    lobby = Lobby(resumeGrace=30)
+    lobby.reaper = Reaper(lobby, idleTimeout=0, finishedTimeout=0)
+    players = seat_game(lobby)
+    tokens = [session.token for session in players]
+    room = players[0].room
+    players[0].close()
+    deadline = lobby.resumable[tokens[0]].deadline
+
+    lobby.reaper.reap(deadline - 1)
+    assert room.seats == {1} and tokens[0] in lobby.resumable
+    lobby.reaper.reap(deadline)
+    # Now it is an abandoned seat like any other: requeued, and the token is void
+    assert tokens[0] not in lobby.resumable and lobby.matchmaker.queueDepth() == 1
+    assert not room.board.ready
+
+    late = Session(lobby)
+    playerId, options = parse_greeting(late.hello(f"hello:format=binary,resume={tokens[0]}:").decode())
+    assert options["token"] != tokens[0]
+    assert late.room is room and playerId == "0"
+
+
+def test_resume_into_a_refilled_game_deals_it():
+    lobby = Lobby(resumeGrace=30)
+    players = seat_game(lobby)
+    tokens = [session.token for session in players]
+    room = players[0].room
+    for session in players:
+        session.close()
+    # Player 0's grace runs out first; a newcomer takes that seat of the reset board
+    lobby.resumable[tokens[1]].deadline += 10
+    lobby.expireSeats(lobby.resumable[tokens[0]].deadline)
+    newcomer = Session(lobby)
+    newcomer.hello("hello:format=binary:")
+    assert newcomer.room is room and newcomer.p == 0 and not room.board.ready
+    woken = []
+    room.watch(woken.append)
+
+    back = Session(lobby)
+    playerId, _ = parse_greeting(back.hello(f"hello:format=binary,resume={tokens[1]}:").decode())
+    # Both seats are filled again, so the game is dealt and the newcomer hears of it
+    assert playerId == "1" and room.seats == {0, 1}
+    assert room.board.ready and len(room.board.playerOne.goal) + len(room.board.playerTwo.goal) > 0
+    assert woken
+
+
+def test_resume_takes_over_a_half_open_connection():
+    lobby = Lobby(resumeGrace=30)
+    players = seat_game(lobby)
+    tokens = [session.token for session in players]
+    kicked = []
+    players[0].kick = lambda: kicked.append(True)
+
+    # The server hasn't noticed the old connection is dead when the player comes back
+    back = Session(lobby)
+    assert back.hello(f"hello:format=binary,resume={tokens[0]}:") is not None
+    assert kicked == [True]
+    players[0].close()
+    assert lobby.resumable[tokens[0]].session is back and players[0].room.seats == {0, 1}
+
+
+def test_waiting_player_is_not_held_and_abandoned_games_close():
+    lobby = Lobby(resumeGrace=30)
+    waiting = Session(lobby)
+    token = parse_greeting(waiting.hello("hello:format=binary:").decode())[1]["token"]
+    gameId = waiting.gameId
+    # No game under way yet, so nothing to come back to
+    waiting.close()
+    assert gameId not in lobby.games and token not in lobby.resumable
+
+    players = seat_game(lobby)
+
+    tokens = [session.token for session in players]
+    gameId = players[0].gameId
+    for session in players:
+        session.close()
+    lobby.expireSeats(lobby.resumable[tokens[1]].deadline)
+    assert gameId not in lobby.games and not lobby.resumable
+
+
+def test_client_reconnects_to_its_game_after_a_drop(any_server):
+    _, port = any_server
+    c1, c2 = connect_pair(port)
+    try:
+        give_turn([c1, c2], c2)
+        board = c1.sync()
+        # A network blip: the socket is gone, but the player hasn't left
+        c1.client.close()
+        moved = c2.send(turn_command(c2.board))
+
+        resumed = c1.sync()
+        assert c1.getId() == '0'
+        assert resumed.id == board.id and resumed.version == moved.version
+        assert c2.sync().ready
+    finally:
+        c1.client.close()
+        c2.client.close()
+
+
+def test_expired_token_gets_a_new_game(any_server):
+    _, port = any_server
+    client = Network(max_retries=20, retry_delay=0.05, port=port)
+    try:
+        client.token = "999999.deadbeef"
+        client.client.close()
+        with pytest.raises(NewGame) as signal:
+            client.sync()
+        assert signal.value.board is not None and client.token != "999999.deadbeef"
+    finally:
+        client.client.close()
+
+
+def test_new_game_after_a_drop_can_be_in_the_other_seat(any_server):
+    _, port = any_server
+    c1, c2 = connect_pair(port)
+    waiting = Network(max_retries=20, retry_delay=0.05, port=port)
+    try:
+        assert c1.getId() == '0' and waiting.getId() == '0'
+        c1.token = "999999.deadbeef"
+        c1.client.close()
+        # Seated opposite the player already waiting for a game
+        with pytest.raises(NewGame) as signal:
+            c1.sync()
+        assert signal.value.playerId == c1.getId() == '1'
+        assert signal.value.board.id == waiting.sync().id and signal.value.board.ready
+        # After the signal the client carries on in its new game
+        assert c1.sync().id == signal.value.board.id
+    finally:
+        for client in (c1, c2, waiting):
+            client.client.close()
+
+
+def test_agent_takes_its_new_seat_after_a_new_game():
+    board = Board(3)
+
+    class Reseated:
+        def sync(self):
+            raise NewGame('1', board)
+
+    agent = Agent.__new__(Agent)
+    agent.player_id, agent.n = '0', Reseated()
+    assert agent.get_board() is board
+    assert agent.player_id == '1'
+
+
+@pytest.mark.parametrize('mode', ['threaded', 'asyncio'])
+def test_subscriber_hears_when_a_held_seat_expires(mode):
+    # The Reaper thread frees the seat, and its push must reach the subscriber from off the event loop too
+    with running_server('--mode', mode, '--resume-grace', '0.3', '--reap-interval', '0.1') as (_, port):
+        c1, c2 = connect_pair(port)
+        try:
+            assert c1.subscribe().ready
+            c2.client.close()
+            board = poll_until(c1, lambda b: not b.ready, timeout=5)
+            # The game was abandoned: reset and waiting for a new opponent
+            assert not board.ready and board.version > 0
+        finally:
+            c1.client.close()
@@ -28,8 +28,6 @@ def server_process():
 
     env = os.environ.copy()
     env['LOG_PATH'] = log_path
-    # Use a dummy video driver to avoid opening windows when pygame is imported by the Server process
-    env['SDL_VIDEODRIVER'] = env.get('SDL_VIDEODRIVER', 'dummy')
     # Use the same python interpreter to run the server script
     python_exec = sys.executable
 
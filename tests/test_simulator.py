@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+PyTest for the batched simulator: every game plays exactly as it would on a Board.
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from Game import PILE_NAMES, Board
+from Simulator import EXHAUSTED, GOAL_SOURCE, MOVE_ACTIONS, PLAYING, BatchSimulator, greedy_policy, random_policy
+
+
+def replayed(sim, policy, plays=200):
+    """Play sim with policy, replaying every play on Boards and checking they agree throughout."""
+    boards = []
+    for seed in sim.seeds:
+        board = Board(seed, seed=seed)
+        board.startGame()
+        boards.append(board)
+    for _ in range(plays):
+        for game, board in enumerate(boards):
+            # A Board that ran out of cards is left half dealt; there is nothing to compare
+            if sim.winner[game] != EXHAUSTED:
+                assert sim.piles(game) == [bytes(pile) for pile in board.piles()]
+                assert board.winner == (sim.winner[game] or None) and board.currentTurn == sim.turn[game]
+        games = sim.active()
+        if not len(games):
+            break
+        mask = sim.legal(games)
+        for row, game in enumerate(games):
+            board = boards[game]
+            commands = {sim.command(game, action) for action in np.flatnonzero(mask[row])}
+            assert commands == {str(move) for move in board.legal_moves(board.currentTurn)}
+        actions = policy(sim, mask)
+        commands = [(boards[game], sim.command(game, action)) for game, action in zip(games, actions)]
+        sim.step(actions, games)
+        for game, (board, command) in zip(games, commands):
+            if sim.winner[game] == EXHAUSTED:
+                # The deck ran dry mid-deal: the Board cannot play on either
+                with pytest.raises(IndexError):
+                    board.play(command, board.currentTurn)
+            else:
+                board.play(command, board.currentTurn)
+    return boards
+
+
+def test_deals_as_a_board_does():
+    sim = BatchSimulator(range(50))
+    for game in range(50):
+        board = Board(game, seed=game)
+        board.startGame()
+        assert sim.piles(game) == [bytes(pile) for pile in board.piles()]
+        assert sim.turn[game] == board.currentTurn
+    assert len(sim.piles(0)) == len(PILE_NAMES)
+
+
+def test_random_games_match_the_board():
+    sim = BatchSimulator(range(40))
+    replayed(sim, random_policy(np.random.default_rng(1)))
+    # Random play runs most games out of cards; some must still be won
+    assert (sim.winner == EXHAUSTED).any() and (sim.winner > 0).any()
+
+
+def test_greedy_games_match_the_board():
+    sim = BatchSimulator(range(100, 140))
+    replayed(sim, greedy_policy(np.random.default_rng(2)))
+    assert (sim.winner > 0).all()
+
+
+def test_long_games_reshuffle_as_the_board_does():
+    # Never playing the goal keeps a game going through dozens of reshuffles, past the reseeding
+    def stalling(sim, mask):
+        mask = mask.copy()
+        mask[:, GOAL_SOURCE * 4:GOAL_SOURCE * 4 + 4] = False
+        moves = mask[:, :MOVE_ACTIONS]
+        return np.where(moves.any(axis=1), moves.argmax(axis=1), MOVE_ACTIONS + mask[:, MOVE_ACTIONS:].argmax(axis=1))
+    sim = BatchSimulator([144, 54])
+    replayed(sim, stalling, plays=1000)
+    assert (sim.winner == EXHAUSTED).all() and (sim.plays > 400).all()
+
+
+def test_run_plays_every_game_out():
+    sim = BatchSimulator(range(200))
+    winner = sim.run(greedy_policy(np.random.default_rng(3)))
+    assert (winner != PLAYING).all() and (sim.plays > 0).all()
+    assert not sim.legal().any()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+PyTest for spectator mode: the redacted public view, encode-once fan-out, and slow spectators.
+"""
+from Game import CARD_NAMES, HIDDEN_CODE, decode_state, encode_board, public_board
+from Lobby import Lobby, Session
+from Network import Network
+from Protocol import FLAG_PUSH, FrameDecoder
+from conftest import play_turn, seat_game, send_turn
+from test_push import connect_pair, poll_until
+
+
+def spectator(lobby, gameId, frames=None):
+    session = Session(lobby)
+    greeting = session.hello(f"hello:format=binary,spectate={gameId}:")
+    if frames is not None:
+        session.offer = lambda frame: frames.append(frame) or True
+    return session, greeting
+
+
+def hidden(cards):
+    return all(card == HIDDEN_CODE for card in cards)
+
+
+def test_public_view_hides_hands_deck_and_goal_but_keeps_counts():
+    lobby = Lobby()
+    players = seat_game(lobby)
+    board = players[0].room.board
+    view = decode_state(encode_board(public_board(board)))
+
+    for source, seen in ((board.playerOne, view.playerOne), (board.playerTwo, view.playerTwo)):
+        assert len(seen.hand) == len(source.hand) and hidden(seen.hand)
+        assert len(seen.goal) == len(source.goal)
+        assert CARD_NAMES[seen.goal[0]] == CARD_NAMES[source.goal[0]] and hidden(seen.goal[1:])
+    assert len(view.deck.cards) == len(board.deck.cards) and hidden(view.deck.cards)
+    assert (view.id, view.version, view.ready, view.currentTurn) == (board.id, board.version, True, board.currentTurn)
+
+
+def test_spectator_gets_public_view_and_cannot_play():
+    lobby = Lobby()
+    players = seat_game(lobby)
+    gameId = players[0].gameId
+    watcher, greeting = spectator(lobby, gameId)
+    assert greeting.decode() == f"spectator:format=binary,spectate={gameId}"
+
+    view = decode_state(watcher.handle("get"))
+    assert hidden(view.playerOne.hand) and hidden(view.playerTwo.hand)
+    version = players[0].room.board.version
+    watcher.handle("reset")
+    assert players[0].room.board.version == version
+    # Spectators take no seat: leaving doesn't touch the game
+    watcher.close()
+    assert players[0].room.seats == {0, 1}
+
+    assert spectator(lobby, 999)[1] is None
+    assert spectator(lobby, "nope")[1] is None
+
+
+def test_each_change_is_encoded_once_for_every_spectator():
+    lobby = Lobby()
+    players = seat_game(lobby)
+    room = players[0].room
+    frames = []
+    watchers = [spectator(lobby, players[0].gameId, frames)[0] for _ in range(50)]
+    for session in watchers:
+        session.handle("subscribe:-1:")
+
+    play_turn(players)
+    players[0].publish()
+    broadcaster = lobby.broadcaster
+    broadcaster.fanOut(room)
+    assert len(frames) == 50
+    # One frame object shared by all of them
+    assert all(frame is frames[0] for frame in frames)
+    assert broadcaster.frames == 1 and broadcaster.sent == 50
+    flags, payload = FrameDecoder().feed(frames[0])[0]
+    assert flags & FLAG_PUSH
+    assert decode_state(payload).version == room.board.version
+
+    # Nothing new: nothing sent
+    broadcaster.fanOut(room)
+    assert len(frames) == 50
+
+
+def test_slow_spectator_is_skipped_then_dropped_without_holding_others():
+    lobby = Lobby(spectatorDropAfter=5)
+    players = seat_game(lobby)
+    room = players[0].room
+    frames = []
+    fast, _ = spectator(lobby, players[0].gameId, frames)
+    slow, _ = spectator(lobby, players[0].gameId)
+    slow.offer = lambda frame: False
+    kicked = []
+    slow.kick = lambda: kicked.append(slow)
+    for session in (fast, slow):
+        session.handle("subscribe:-1:")
+
+    play_turn(players)
+    assert lobby.broadcaster.fanOut(room, now=100.0) is True
+    assert len(frames) == 1 and lobby.broadcaster.skipped == 1
+    assert lobby.broadcaster.fanOut(room, now=103.0) is True
+    assert not kicked
+    assert lobby.broadcaster.fanOut(room, now=105.0) is False
+    assert kicked == [slow] and slow not in room.spectators
+    assert lobby.broadcaster.stats()["dropped"] == 1
+
+
+def test_spectators_limit_and_closing_game_disconnects_them():
+    lobby = Lobby(maxSpectators=2)
+    players = seat_game(lobby)
+    gameId = players[0].gameId
+    kicked = []
+    for _ in range(2):
+        session, greeting = spectator(lobby, gameId)
+        assert greeting is not None
+        session.kick = lambda: kicked.append(True)
+    assert spectator(lobby, gameId)[1] is None
+
+    for session in players:
+        session.close()
+    assert gameId not in lobby.games
+    assert kicked == [True, True]
+
+
+def test_server_pushes_public_view_to_spectators(any_server):
+    _, port = any_server
+    c1, c2 = connect_pair(port)
+    watchers = []
+    try:
+        gameId = c1.sync().id
+        watchers = [Network(max_retries=20, retry_delay=0.05, port=port, spectate=gameId) for _ in range(3)]
+        for watcher in watchers:
+            assert watcher.getId() == 'spectator'
+            board = watcher.subscribe()
+            assert board.id == gameId and hidden(board.playerOne.hand)
+
+        moved = send_turn([c1, c2])
+        for watcher in watchers:
+            pushed = poll_until(watcher, lambda b: b.version == moved.version)
+            assert pushed.version == moved.version
+            assert hidden(pushed.deck.cards)
+        # The players' own boards are untouched by all this
+        deck = c1.sync().deck.cards
+        assert deck and not hidden(deck)
+    finally:
+        for c in [c1, c2] + watchers:
+            c.client.close()
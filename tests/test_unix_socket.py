@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+PyTest for the Unix domain socket transport: `Server.py --unix PATH` next to TCP, and Network("unix:PATH").
+"""
+import asyncio
+import errno
+import os
+import shutil
+import socket
+import tempfile
+
+import pytest
+
+from AsyncServer import serve
+from Lobby import Lobby
+from Network import Network
+from Protocol import unix_listener
+from conftest import free_port, running_server, send_turn
+
+
+@pytest.fixture(params=[('threaded',), ('asyncio',), ('threaded', '--workers', '2')],
+                ids=['threaded', 'asyncio', 'workers'])
+def unix_server(request):
+    # Kept short: socket paths are limited to about 100 bytes
+    directory = tempfile.mkdtemp(prefix='cards_')
+    path = os.path.join(directory, 'cards.sock')
+    # A socket file left behind by a crashed server must not stop the next one
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+    try:
+        with running_server('--mode', *request.param, '--unix', path) as (process, port):
+            yield path, port
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_agents_play_over_the_unix_socket(unix_server):
+    path, _ = unix_server
+    clients = [Network(max_retries=20, retry_delay=0.05, server=f"unix:{path}") for _ in range(2)]
+    try:
+        assert [c.getId() for c in clients] == ['0', '1']
+        boards = [c.sync() for c in clients]
+        assert boards[0].id == boards[1].id and boards[0].ready
+        moved = send_turn(clients)
+        assert clients[1].sync().version == moved.version
+    finally:
+        for c in clients:
+            c.client.close()
+
+
+def test_second_server_leaves_a_live_socket_alone(unix_server):
+    path, _ = unix_server
+    with pytest.raises(RuntimeError, match="exited early"):
+        with running_server('--unix', path):
+            pass
+    # The first server still owns the path: it survived the other one exiting too
+    client = Network(max_retries=20, retry_delay=0.05, server=f"unix:{path}")
+    try:
+        assert client.getId() == '0' and client.sync() is not None
+    finally:
+        client.client.close()
+
+
+def test_unix_listener_replaces_only_a_stale_socket():
+    directory = tempfile.mkdtemp(prefix='cards_')
+    path = os.path.join(directory, 'cards.sock')
+    try:
+        live = unix_listener(path, 8)
+        with pytest.raises(OSError) as refused:
+            unix_listener(path, 8)
+        assert refused.value.errno == errno.EADDRINUSE
+        live.close()
+        # Closed without unlinking, as after a crash: nobody answers, so the file is stale
+        unix_listener(path, 8).close()
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_unix_and_tcp_players_share_one_lobby(unix_server):
+    path, port = unix_server
+    local = Network(max_retries=20, retry_delay=0.05, server=f"unix:{path}")
+    remote = Network(max_retries=20, retry_delay=0.05, port=port)
+    try:
+        assert local.sync().id == remote.sync().id
+        assert remote.board.ready
+    finally:
+        local.client.close()
+        remote.client.close()
+
+
+def test_asyncio_serve_closes_both_listeners_when_stopped():
+    directory = tempfile.mkdtemp(prefix='cards_')
+    path = os.path.join(directory, 'cards.sock')
+    port = free_port()
+
+    async def main():
+        task = asyncio.ensure_future(serve('127.0.0.1', port, Lobby(), unix_path=path))
+        while not os.path.exists(path):
+            await asyncio.sleep(0.01)
+        _, writer = await asyncio.open_unix_connection(path)
+        writer.close()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # Neither listener is left accepting connections
+        with pytest.raises(OSError):
+            await asyncio.open_unix_connection(path)
+        with pytest.raises(OSError):
+            await asyncio.open_connection('127.0.0.1', port)
+
+    try:
+        asyncio.run(main())
+    finally:
+        shutil.rmtree(directory)
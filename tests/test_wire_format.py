@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+PyTest for the binary wire format: snapshots and deltas must round-trip and be smaller than pickle.
+"""
+import pickle
+import random
+import sys
+from os.path import abspath, dirname, join
+sys.path.insert(0, abspath(join(dirname(__file__), '..')))
+
+from Game import CARD_NAMES, Board, BoardDelta, decode_state, encode_board, encode_delta
+from Protocol import make_hello, negotiate, parse_greeting, parse_hello
+
+
+def pile_strings(board):
+    return [[CARD_NAMES[card] for card in pile] for pile in board.piles()]
+
+
+def mid_game_board(turns=12, seed=3):
+    rng = random.Random(seed)
+    board = Board(7)
+    board.startGame()
+    for _ in range(turns):
+        player = board.playerOne if board.currentTurn == 0 else board.playerTwo
+        board.play(f"discard:{CARD_NAMES[rng.choice(player.hand)]}:{rng.randrange(4)}", board.currentTurn)
+    return board
+
+
+def test_snapshot_round_trip():
+    board = mid_game_board()
+    decoded = decode_state(encode_board(board))
+    assert isinstance(decoded, Board)
+    assert (decoded.id, decoded.version, decoded.ready, decoded.currentTurn, decoded.winner) == \
+           (board.id, board.version, board.ready, board.currentTurn, board.winner)
+    assert pile_strings(decoded) == pile_strings(board)
+
+
+def test_delta_round_trip_applies_to_decoded_snapshot():
+    board = mid_game_board(turns=2)
+    client = decode_state(encode_board(board))
+    for _ in range(3):
+        player = board.playerOne if board.currentTurn == 0 else board.playerTwo
+        board.play(f"discard:{CARD_NAMES[player.hand[0]]}:1", board.currentTurn)
+
+    delta = decode_state(encode_delta(board.delta_since(client.version)))
+    assert isinstance(delta, BoardDelta)
+    client.apply_delta(delta)
+    assert client.version == board.version
+    assert pile_strings(client) == pile_strings(board)
+
+
+def test_binary_snapshot_is_much_smaller_than_pickle():
+    board = mid_game_board()
+    # Pickled piles are bytearrays of card codes too, so this is down to pickle's framing
+    assert len(encode_board(board)) * 3 < len(pickle.dumps(board))
+
+
+def test_handshake_negotiates_known_formats_only():
+    assert parse_hello(make_hello({'format': 'binary'})) == {'format': 'binary'}
+    assert negotiate({'format': 'binary'}) == {'format': 'binary'}
+    assert negotiate({'format': 'msgpack'}) == {'format': 'pickle'}
+    assert parse_hello('get') is None
+    assert parse_greeting('1:format=binary') == ('1', {'format': 'binary'})
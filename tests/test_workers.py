@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+PyTest for `Server.py --workers N`: games are spread over worker processes but both seats of a game share one.
+"""
+import socket
+import time
+
+import pytest
+
+from Network import Network
+from conftest import running_server, send_turn
+
+
+@pytest.fixture(scope='module', params=['threaded', 'asyncio'])
+def workers_server(request):
+    with running_server('--mode', request.param, '--workers', '2') as (process, port):
+        yield process, port
+
+
+def test_pairs_share_a_board_across_workers(workers_server):
+    _, port = workers_server
+    clients = [Network(max_retries=20, retry_delay=0.05, port=port) for _ in range(4)]
+    try:
+        assert [c.getId() for c in clients] == ['0', '1', '0', '1']
+        boards = [c.sync() for c in clients]
+        assert [b.id for b in boards] == [boards[0].id, boards[0].id, boards[2].id, boards[2].id]
+        assert boards[0].id != boards[2].id
+        assert all(b.ready for b in boards)
+
+        # A change by one seat is visible to the other seat of the same game only
+        other = clients[2].board.version
+        moved = send_turn(clients[:2])
+        assert clients[0].sync().version == clients[1].sync().version == moved.version
+        assert clients[3].sync().version == other
+    finally:
+        for c in clients:
+            c.client.close()
+
+
+def test_connection_without_hello_does_not_take_a_seat(workers_server):
+    _, port = workers_server
+    # Let the previous test's disconnects settle so nobody lands in a requeued seat
+    time.sleep(0.2)
+    probe = socket.create_connection(('127.0.0.1', port))
+    probe.close()
+    clients = [Network(max_retries=20, retry_delay=0.05, port=port) for _ in range(2)]
+    try:
+        assert [c.sync().id for c in clients] == [clients[0].board.id] * 2
+    finally:
+        for c in clients:
+            c.client.close()
+
+
+def test_resume_goes_back_to_the_worker_that_owns_the_game(workers_server):
+    _, port = workers_server
+    time.sleep(0.2)
+    clients = [Network(max_retries=20, retry_delay=0.05, port=port) for _ in range(4)]
+    try:
+        boards = [c.sync() for c in clients]
+        # Drop one player of each game; the dispatcher must not treat them as new seats
+        for c in clients[1::2]:
+            c.client.close()
+        for c, board in zip(clients, boards):
+            assert c.sync().id == board.id
+    finally:
+        for c in clients:
+            c.client.close()